@@ -4,7 +4,6 @@ import cv2
 from PIL import Image
 from ultralytics import YOLO
 from io import BytesIO
-import sqlite3
 from datetime import datetime
 import json
 import smtplib
@@ -18,6 +17,24 @@ import base64
 import pandas as pd
 from fpdf import FPDF
 import time
+from detection_results import boxes_from_prediction, boxes_from_blob, box_lengths, box_heights
+from severity import assess_severity_batch
+from brain_mask import brain_pixel_count, image_hash
+from dedup import perceptual_hash
+from rendering import draw_detections, RenderedImage
+from image_io import buffer_view, image_size, preview_reduction, decode_image
+from volumes import is_volume_upload, open_volume, iter_slice_batches
+from study import assess_study
+from followup import patient_followup
+from search import search_detections
+from retention import run_retention, list_archives
+from database import connect, detection_record, search_patients
+from storage import get_store
+from snapshots import read_manifest, load_snapshot, snapshot_is_current, snapshot_stats
+from static_assets import stylesheet_tag
+from chatbot_index import load_or_build_index
+from chatbot_history import answer_from_history
+from semantic_index import MIN_ANSWER_SCORE, MODEL_ERRORS, shared_semantic_index
 
 
 # Load environment variables
@@ -27,74 +44,15 @@ load_dotenv()
 MODEL_PATH = "./model/brain_tumor_detection_model.pt"
 model = YOLO(MODEL_PATH)
 
-# Database initialization function - Fix for the database schema issue
-def initialize_database():
-    conn = sqlite3.connect("tumor_detection.db")
-    cursor = conn.cursor()
-    
-    # Check if detections table exists and get its structure
-    cursor.execute("PRAGMA table_info(detections)")
-    columns = [column[1] for column in cursor.fetchall()]
-    
-    if not columns:
-        # Table doesn't exist, create it with all necessary columns
-        cursor.execute('''
-        CREATE TABLE detections (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            patient_name TEXT,
-            patient_age INTEGER,
-            patient_gender TEXT,
-            tumor_count INTEGER,
-            tumor_lengths TEXT,
-            detection_time TIMESTAMP,
-            processed_image BLOB,
-            severity TEXT,
-            recommendation TEXT
-        )''')
-    else:
-        # Table exists but might be missing columns - add them if needed
-        needed_columns = [
-            'patient_age INTEGER',
-            'patient_gender TEXT',
-            'tumor_count INTEGER',
-            'tumor_lengths TEXT',
-            'detection_time TIMESTAMP',
-            'processed_image BLOB',
-            'severity TEXT',
-            'recommendation TEXT'
-        ]
-        
-        for column_def in needed_columns:
-            column_name = column_def.split(' ')[0]
-            if column_name not in columns:
-                try:
-                    cursor.execute(f"ALTER TABLE detections ADD COLUMN {column_def}")
-                except sqlite3.OperationalError:
-                    # Column might already exist or there might be other issues
-                    pass
-    
-    conn.commit()
-    conn.close()
-
 # Tumor severity assessment
-def assess_tumor_severity(tumor_lengths, image_dimensions):
+def assess_tumor_severity(boxes, image):
     """Assess tumor severity based on size relative to brain area"""
-    # Calculate brain area (approximation)
-    height, width = image_dimensions[:2]
-    brain_area = height * width
-    
-    # Calculate total tumor area
-    total_tumor_area = sum([length**2 for length in tumor_lengths])
-    
-    # Calculate percentage of brain occupied by tumor
-    percentage = (total_tumor_area / brain_area) * 100
-    
-    if percentage < 1:
-        return "Low Severity", "Regular follow-up recommended in 6 months"
-    elif percentage < 5:
-        return "Moderate Severity", "Follow-up within 3 months recommended"
-    else:
-        return "High Severity", "Immediate medical consultation advised"
+    # Brain area is the pixel count of the extracted brain mask, so black borders don't count
+    brain_area = brain_pixel_count(image)
+    
+    # Single-scan call into the vectorized severity engine
+    severities, recommendations = assess_severity_batch([boxes], [brain_area])
+    return severities[0], recommendations[0]
 
 def resize_image(image, max_width=400):
     """Resize image while maintaining aspect ratio"""
@@ -105,7 +63,82 @@ def resize_image(image, max_width=400):
         return cv2.resize(image, (max_width, new_height))
     return image
 
-def create_pdf_report(patient_name, tumor_lengths, processed_image, detection_time, severity, recommendation):
+def load_uploaded_scan(uploaded_file):
+    """Decode an upload once per session, keeping a single full-resolution array"""
+    key = getattr(uploaded_file, "file_id", (uploaded_file.name, uploaded_file.size))
+    cached = st.session_state.get("scan_image")
+    if cached is None or cached["key"] != key:
+        # Release the previous scan before decoding the new one
+        st.session_state["scan_image"] = None
+        data = buffer_view(uploaded_file)
+        image = decode_image(data)
+        reduction = preview_reduction(image_size(uploaded_file)[0])
+        preview = image if reduction == 1 else decode_image(data, reduction)
+        cached = {"key": key, "image": image, "preview": preview}
+        st.session_state["scan_image"] = cached
+    return cached["image"], cached["preview"]
+
+def load_uploaded_volume(volume_files):
+    """Open a DICOM series or NIfTI volume once per session"""
+    key = tuple(getattr(f, "file_id", (f.name, f.size)) for f in volume_files)
+    cached = st.session_state.get("scan_volume")
+    if cached is None or cached["key"] != key:
+        if cached is not None:
+            cached["volume"].close()
+        cached = {"key": key, "volume": open_volume(volume_files), "study": None}
+        st.session_state["scan_volume"] = cached
+    return cached
+
+def display_volume_detection(volume_files, patient_name):
+    """Slice browser and batched YOLO detection for multi-slice studies"""
+    cached = load_uploaded_volume(volume_files)
+    volume = cached["volume"]
+    
+    st.markdown('<div class="hover-card">', unsafe_allow_html=True)
+    st.subheader(f"MRI Volume ({len(volume)} slices)")
+    slice_index = st.slider("Slice", 0, len(volume) - 1, len(volume) // 2)
+    st.image(volume.slice_image(slice_index), caption=f"Patient: {patient_name if patient_name else 'Unknown'} | Slice {slice_index + 1}", channels="BGR", use_container_width=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    if st.button("🔍 Detect Tumors Across All Slices", use_container_width=True):
+        progress_bar = st.progress(0)
+        slice_boxes, brain_areas = detect_tumors_in_volume(volume, progress_callback=lambda done: progress_bar.progress(done / len(volume)))
+        cached["study"] = assess_study(slice_boxes, brain_areas, volume.spacing)
+        progress_bar.empty()
+    
+    study = cached["study"]
+    if study is not None:
+        # One answer for the whole study, built from lesions linked across slices
+        metric_col1, metric_col2, metric_col3 = st.columns(3)
+        metric_col1.metric("Lesions (3D)", study["lesion_count"])
+        metric_col2.metric("Study Severity", study["severity"])
+        metric_col3.metric("Est. Lesion Volume", f"{study['total_volume_ml']:.2f} mL")
+        st.info(f"**Recommendation:** {study['recommendation']}")
+        
+        if study["lesion_count"]:
+            tracks = study["tracks"]
+            st.dataframe(pd.DataFrame({
+                "Lesion": tracks["track_id"] + 1,
+                "Slices": [f"{first + 1}-{last + 1}" for first, last in zip(tracks["first_slice"], tracks["last_slice"])],
+                "Slice Count": tracks["num_slices"],
+                "Max Area (px)": tracks["max_area"].round(1),
+                "Volume (mm³)": tracks["volume_mm3"].round(1),
+            }), use_container_width=True)
+
+def build_report_text(patient_name, boxes, detection_time, severity, recommendation):
+    """Plain-text version of the report, stored for full-text search"""
+    lines = [
+        f"Brain Tumor Detection Report for {patient_name}",
+        f"Date: {detection_time.strftime('%Y-%m-%d %H:%M:%S')}",
+        f"Number of Tumors Detected: {len(boxes)}",
+    ]
+    for i, (length, height, box) in enumerate(zip(box_lengths(boxes), box_heights(boxes), boxes)):
+        lines.append(f"Tumor {i+1}: {length:.2f} x {height:.2f} pixels, area {box['area']:.1f} px")
+    lines.append(f"Assessment: {severity}")
+    lines.append(f"Recommendation: {recommendation}")
+    return "\n".join(lines)
+
+def create_pdf_report(patient_name, boxes, rendered_image, detection_time, severity, recommendation):
     """Create a detailed PDF report for the patient"""
     pdf = FPDF()
     pdf.add_page()
@@ -121,14 +154,14 @@ def create_pdf_report(patient_name, tumor_lengths, processed_image, detection_ti
     
     # Add tumor information
     pdf.set_font('Arial', '', 12)
-    pdf.cell(190, 10, f'Number of Tumors Detected: {len(tumor_lengths)}', 0, 1)
+    pdf.cell(190, 10, f'Number of Tumors Detected: {len(boxes)}', 0, 1)
     
     pdf.set_font('Arial', 'B', 12)
     pdf.cell(190, 10, 'Tumor Measurements:', 0, 1)
     
     pdf.set_font('Arial', '', 12)
-    for i, length in enumerate(tumor_lengths):
-        pdf.cell(190, 10, f'Tumor {i+1}: {length:.2f} pixels', 0, 1)
+    for i, (length, height, box) in enumerate(zip(box_lengths(boxes), box_heights(boxes), boxes)):
+        pdf.cell(190, 10, f'Tumor {i+1}: {length:.2f} x {height:.2f} pixels, area {box["area"]:.1f} px, confidence {box["confidence"]:.2f}', 0, 1)
     
     # Add severity assessment
     pdf.set_font('Arial', 'B', 12)
@@ -138,13 +171,10 @@ def create_pdf_report(patient_name, tumor_lengths, processed_image, detection_ti
     pdf.cell(190, 10, f'Assessment: {severity}', 0, 1)
     pdf.cell(190, 10, f'Recommendation: {recommendation}', 0, 1)
     
-    # Add processed image
-    temp_img_path = 'temp_report_image.jpg'
-    cv2.imwrite(temp_img_path, processed_image)
+    # Add processed image from the cached JPEG encoding
     pdf.add_page()
     pdf.cell(190, 10, 'Processed Image:', 0, 1)
-    pdf.image(temp_img_path, x=10, y=40, w=180)
-    os.remove(temp_img_path)
+    pdf.image(BytesIO(rendered_image.jpeg), x=10, y=40, w=180)
     
     # Add disclaimer
     pdf.add_page()
@@ -159,9 +189,26 @@ def create_pdf_report(patient_name, tumor_lengths, processed_image, detection_ti
     
     return pdf_output.getvalue()
 
+@st.cache_resource
+def detection_store():
+    # SQLite by default; set DETECTION_STORE_URL to a postgresql:// URL to share one database between replicas
+    store = get_store()
+    store.initialize()
+    return store
+
+@st.cache_resource
+def chatbot_index():
+    # Posting arrays are memory-mapped; the index is rebuilt when the answers file changes
+    return load_or_build_index()
+
+@st.cache_resource
+def history_snapshot(exported_at):
+    # Memory-mapped Arrow partitions; a new export changes exported_at and reloads them
+    return load_snapshot(columns=["tumor_count", "severity"])
+
 def main():
     # Initialize database with correct schema
-    initialize_database()
+    detection_store()
     
     # Page configuration
     st.set_page_config(page_title="Brain Tumor Detection", layout="wide")
@@ -183,401 +230,8 @@ def main():
 
 def display_home_page():
     # Add custom CSS for styling and more advanced animations
+    st.markdown(stylesheet_tag("home"), unsafe_allow_html=True)
     st.markdown("""
-    <style>
-        .stApp::before {
-            content: "";
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: url('https://media.istockphoto.com/id/1254631358/photo/hospital-covid-ward-with-a-medical-ventilators-monitor.jpg?s=1024x1024&w=is&k=20&c=QArkgUL94PZDSnMs1pAxQsbJ3QF-Sx-zFZNxSosMv8c=') no-repeat center center fixed;
-            background-size: cover;
-            filter: blur(0px);
-            z-index: -1;
-        }
-
-        /* Optional: make text more readable */
-        .stApp {
-            background-color: rgba(255, 255, 255, 0.3); /* translucent overlay */
-        }
-        
-        /* Improve readability with a semi-transparent container for content */
-        .css-1d391kg, .css-1v3fvcr {
-            background-color: rgba(255, 255, 255, 0.85) !important;
-            padding: 20px;
-            border-radius: 10px;
-        }
-        
-        /* Floating brain animations in background */
-        .background-brains {
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            overflow: hidden;
-            z-index: -1;
-        }
-   
-        
-        /* Floating brain animations in background */
-        .background-brains {
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            overflow: hidden;
-            z-index: -1;
-        }
-        
-        .brain {
-            position: absolute;
-            width: 60px;
-            height: 60px;
-            background-image: url('https://images.unsplash.com/photo-1583911860205-72f8ac8ddcbe?q=80&w=2070');
-            background-size: contain;
-            background-repeat: no-repeat;
-            opacity: 0.15;
-            animation-name: float;
-            animation-timing-function: ease-in-out;
-            animation-iteration-count: infinite;
-            animation-direction: alternate;
-        }
-        
-        .brain:nth-child(1) {
-            top: 10%;
-            left: 10%;
-            animation-duration: 8s;
-        }
-        
-        .brain:nth-child(2) {
-            top: 20%;
-            right: 10%;
-            animation-duration: 9s;
-        }
-        
-        .brain:nth-child(3) {
-            bottom: 30%;
-            left: 15%;
-            animation-duration: 11s;
-        }
-        
-        .brain:nth-child(4) {
-            bottom: 15%;
-            right: 20%;
-            animation-duration: 7s;
-        }
-        
-        .brain:nth-child(5) {
-            top: 50%;
-            left: 5%;
-            animation-duration: 12s;
-        }
-        
-        .brain:nth-child(6) {
-            top: 60%;
-            right: 5%;
-            animation-duration: 10s;
-        }
-        
-        @keyframes float {
-            0% {
-                transform: translateY(0) rotate(0deg);
-                opacity: 0.1;
-            }
-            50% {
-                transform: translateY(-20px) rotate(10deg);
-                opacity: 0.2;
-            }
-            100% {
-                transform: translateY(0) rotate(0deg);
-                opacity: 0.1;
-            }
-        }
-        
-        /* Glass-like container for content */
-        .glass-card {
-            background-color: rgba(255, 255, 255, 0.25);
-                
-            backdrop-filter: blur(5px);
-            -webkit-backdrop-filter: blur(5px);
-            border-radius: 10px;
-            border: 1px solid rgba(255, 255, 255, 0.18);
-            box-shadow: 0 8px 32px 0 rgba(31, 38, 135, 0.37);
-            padding: 25px;
-            margin-bottom: 30px;
-        }
-        
-        /* Header animation with brain logos */
-        .header-container {
-            text-align: center;
-            margin-bottom: 30px;
-            position: relative;
-        }
-        
-        .main-brain-logo {
-            width: 150px;
-            height: 150px;
-            animation: pulse-glow 3s infinite ease-in-out;
-        }
-        
-        .small-brain {
-            position: absolute;
-            width: 40px;
-            height: 40px;
-            animation: orbit 12s infinite linear;
-        }
-        
-        .small-brain:nth-child(2) {
-            animation-delay: -2s;
-        }
-        
-        .small-brain:nth-child(3) {
-            animation-delay: -4s;
-        }
-        
-        .small-brain:nth-child(4) {
-            animation-delay: -6s;
-        }
-        
-        .small-brain:nth-child(5) {
-            animation-delay: -8s;
-        }
-        
-        @keyframes orbit {
-            0% {
-                transform: rotate(0deg) translateX(100px) rotate(0deg);
-            }
-            100% {
-                transform: rotate(360deg) translateX(100px) rotate(-360deg);
-            }
-        }
-        
-        @keyframes pulse-glow {
-            0% {
-                transform: scale(1);
-                filter: drop-shadow(0 0 5px rgba(0, 200, 255, 0.7));
-            }
-            50% {
-                transform: scale(1.1);
-                filter: drop-shadow(0 0 20px rgba(0, 200, 255, 1));
-            }
-            100% {
-                transform: scale(1);
-                filter: drop-shadow(0 0 5px rgba(0, 200, 255, 0.7));
-            }
-        }
-        
-        /* Neon text effect */
-       .neon-title {
-    color: #fff;
-    text-shadow: 0 0 5px #fff,
-                 0 0 10px #fff,
-                 0 0 20px #87ceeb,
-                 0 0 30px #87ceeb,
-                 0 0 40px #87ceeb;
-                
-                }
-
-        
-        @keyframes neon-flicker {
-            0%, 19%, 21%, 23%, 25%, 54%, 56%, 100% {
-                text-shadow: 0 0 5px #fff, 
-                             0 0 10px #fff, 
-                             0 0 20px #ff00de, 
-                             0 0 30px #ff00de, 
-                             0 0 40px #ff00de;
-            }
-            20%, 24%, 55% {
-                text-shadow: none;
-            }
-        }
-        
-        /* Feature box animation */
-        .feature-box {
-            background-color: rgba(255, 255, 255, 0.15);
-            backdrop-filter: blur(5px);
-            border-left: 4px solid #00eeff;
-            padding: 15px;
-            margin: 15px 0;
-            border-radius: 10px;
-            transition: all 0.5s ease;
-            position: relative;
-                
-            overflow: hidden;
-        }
-        
-        .feature-box:hover {
-            transform: translateY(-5px);
-            box-shadow: 0 10px 20px rgba(0, 0, 0, 0.2);
-            border-left: 4px solid #ff00de;
-        }
-        
-        .feature-box:hover::before {
-            opacity: 1;
-            transform: translateX(0);
-        }
-        
-        .feature-box::before {
-            content: '';
-            position: absolute;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: linear-gradient(90deg, transparent, rgba(255, 255, 255, 0.2), transparent);
-            transform: translateX(-100%);
-            transition: 0.5s;
-            opacity: 0;
-        }
-        
-        /* 3D Button styling */
-        .btn-3d {
-            display: inline-block;
-            background: linear-gradient(to right, #00c6ff, #0072ff);
-            color: white;
-            padding: 12px 25px;
-            text-align: center;
-            text-decoration: none;
-            font-size: 18px;
-            font-weight: bold;
-            border-radius: 50px;
-            margin: 15px 10px;
-            transition: all 0.3s ease;
-            position: relative;
-            overflow: hidden;
-            box-shadow: 0 6px 10px rgba(0, 0, 0, 0.3);
-            transform: perspective(100px) translateZ(0);
-        }
-        
-        .btn-3d:hover {
-            transform: perspective(100px) translateZ(5px);
-            box-shadow: 0 10px 20px rgba(0, 0, 0, 0.4);
-        }
-        
-        .btn-3d::before {
-            content: '';
-            position: absolute;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: linear-gradient(90deg, transparent, rgba(255, 255, 255, 0.4), transparent);
-            transform: translateX(-100%);
-            transition: 0.5s;
-        }
-        
-        .btn-3d:hover::before {
-            transform: translateX(100%);
-        }
-        
-        /* Glowing counter animation */
-        .glowing-counter {
-            font-size: 48px;
-            font-weight: bold;
-            background: -webkit-linear-gradient(#00c6ff, #0072ff);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            display: inline-block;
-            position: relative;
-            animation: countUp 3s forwards, glow 2s ease-in-out infinite alternate;
-        }
-        
-        @keyframes glow {
-            from {
-                text-shadow: 0 0 10px #00c6ff, 0 0 20px #00c6ff, 0 0 30px #00c6ff;
-            }
-            to {
-                text-shadow: 0 0 20px #0072ff, 0 0 30px #0072ff, 0 0 40px #0072ff;
-            }
-        }
-        
-        @keyframes countUp {
-            from { opacity: 0; transform: translateY(20px); }
-            to { opacity: 1; transform: translateY(0); }
-        }
-        
-        /* Team members with rotating border */
-        .team-member {
-            text-align: center;
-            width: 180px;
-            margin: 15px;
-            padding: 20px;
-            background-color: rgba(255, 255, 255, 0.2);
-            backdrop-filter: blur(5px);
-            border-radius: 15px;
-            position: relative;
-            transition: transform 0.3s ease;
-        }
-        
-        .team-member:hover {
-            transform: translateY(-10px);
-        }
-        
-        .team-member::before {
-            content: '';
-            position: absolute;
-            top: -2px;
-            left: -2px;
-            right: -2px;
-            bottom: -2px;
-            z-index: -1;
-            border-radius: 16px;
-            background: linear-gradient(45deg, #ff0000, #ff7300, #fffb00, #48ff00, #00ffd5, #002bff, #7a00ff, #ff00c8, #ff0000);
-            background-size: 400%;
-            animation: borderglow 20s linear infinite;
-        }
-        
-        @keyframes borderglow {
-            0% { background-position: 0% 0%; }
-            100% { background-position: 400% 0%; }
-        }
-        
-        .team-member img {
-            width: 90px;
-            height: 90px;
-            border-radius: 50%;
-            object-fit: cover;
-            border: 3px solid white;
-            box-shadow: 0 0 15px rgba(0, 200, 255, 0.8);
-        }
-        
-        /* Brain scan effect */
-        .brain-scan {
-            position: relative;
-            overflow: hidden;
-            border-radius: 10px;
-        }
-        
-        .brain-scan::after {
-            content: '';
-            position: absolute;
-            top: -100%;
-            left: 0;
-            width: 100%;
-            height: 10px;
-            background: linear-gradient(90deg, transparent, #00ff99, transparent);
-            animation: scan 3s linear infinite;
-        }
-        
-        @keyframes scan {
-            0% { top: -5%; }
-            100% { top: 105%; }
-        }
-        
-        /* Text styling */
-        h1, h2, h3, h4 {
-            color: white;
-        }
-        
-        p {
-            color: rgba(255, 255, 255, 0.9);
-        }
-    </style>
-    
     <!-- Background floating brains -->
     <div class="background-brains">
         <div class="brain"></div>
@@ -769,241 +423,7 @@ def display_home_page():
 
 def display_detection_page():
     # Advanced CSS with animations and better styling
-    st.markdown("""
-     <style>
-        .stApp::before {
-            content: "";
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: url('https://images.unsplash.com/photo-1512678080530-7760d81faba6?q=80&w=1474&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D') no-repeat center center fixed;
-            background-size: cover;
-            filter: blur(8px);
-            z-index: -1;
-        }
-
-        /* Optional: make text more readable */
-        .stApp {
-            background-color: rgba(255, 255, 255, 0.3); /* translucent overlay */
-        }
-            
-        /* Card styling */
-        .css-1d391kg, .css-1v3fvcr {
-            background-color: rgba(255, 255, 255, 0.9) !important;
-            padding: 25px;
-            border-radius: 5px;
-            box-shadow: 0 4px 12px rgba(0, 0, 0, 0.15);
-            backdrop-filter: blur(5px);
-            transition: all 0.3s ease;
-        }
-        
-        /* Main title with animation */
-        .main-title {
-            font-size: 2.5rem;
-            background: linear-gradient(90deg, #1A2A6C, #B21F1F, #FDBB2D);
-            background-size: 200% auto;
-            color: transparent;
-            -webkit-background-clip: text;
-            background-clip: text;
-            animation: shine 3s linear infinite;
-            text-align: center;
-            font-weight: 800;
-            margin-bottom: 1rem;
-        }
-        
-        @keyframes shine {
-            to {
-                background-position: 200% center;
-            }
-        }
-        
-        /* Bounce animation for buttons */
-        .stButton>button {
-            transition: all 0.2s ease;
-            border-radius: 8px !important;
-            font-weight: 600 !important;
-        }
-        
-        .stButton>button:hover {
-            transform: translateY(-3px);
-            box-shadow: 0 7px 14px rgba(50, 50, 93, 0.1), 0 3px 6px rgba(0, 0, 0, 0.08);
-        }
-        
-        .stButton>button:active {
-            transform: translateY(1px);
-        }
-        
-        /* Card hover effects */
-        .hover-card {
-            transition: all 0.3s ease;
-        }
-        
-        .hover-card:hover {
-            transform: translateY(-5px);
-            box-shadow: 0 10px 20px rgba(0, 0, 0, 0.1);
-        }
-        
-        /* Progress bar styling */
-        .stProgress > div > div {
-            background-color: #1A2A6C !important;
-        }
-        
-        /* Sidebar styling */
-        .css-1d391kg {
-            border-right: 1px solid rgba(200, 200, 200, 0.3);
-        }
-        
-        /* Results card styling */
-        .results-card {
-            border-left: 5px solid #4CAF50;
-            padding-left: 15px;
-            background-color: rgba(76, 175, 80, 0.1);
-            border-radius: 5px;
-            padding: 15px;
-            margin-top: 20px;
-        }
-        
-        /* Custom file uploader */
-        .stFileUploader label {
-            background-color: rgba(26, 42, 108, 0.1) !important;
-            border: 2px dashed #1A2A6C !important;
-            border-radius: 10px !important;
-            padding: 20px !important;
-            text-align: center !important;
-            transition: all 0.3s ease !important;
-        }
-        
-        .stFileUploader label:hover {
-            background-color: rgba(26, 42, 108, 0.2) !important;
-        }
-        
-        /* Loading animation */
-        @keyframes pulse {
-            0% { opacity: 0.6; }
-            50% { opacity: 1; }
-            100% { opacity: 0.6; }
-        }
-        
-        .loading-pulse {
-            animation: pulse 1.5s infinite ease-in-out;
-        }
-        
-        /* Logo container */
-        .logo-container {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 20px;
-        }
-        
-        .logo-container img {
-            max-height: 60px;
-            transition: all 0.3s ease;
-        }
-        
-        .logo-container img:hover {
-            transform: scale(1.05);
-        }
-        
-        /* Step container */
-        .step-container {
-            background-color: rgba(255,255,255,0.8);
-            border-radius: 10px;
-            padding: 15px;
-            margin: 10px 0;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.05);
-            transition: all 0.3s ease;
-            display: flex;
-            align-items: center;
-        }
-        
-        .step-container:hover {
-            transform: translateX(5px);
-            box-shadow: 0 5px 15px rgba(0,0,0,0.08);
-        }
-        
-        .step-number {
-            background-color: #1A2A6C;
-            color: white;
-            width: 30px;
-            height: 30px;
-            border-radius: 50%;
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            margin-right: 15px;
-            font-weight: bold;
-        }
-        
-        /* Information tabs */
-        .info-tab {
-            border-bottom: 1px solid rgba(0,0,0,0.1);
-            padding-bottom: 10px;
-            margin-bottom: 10px;
-            cursor: pointer;
-        }
-        
-        /* Severity indicators */
-        .severity-low {
-            color: #4CAF50;
-            font-weight: bold;
-        }
-        
-        .severity-medium {
-            color: #FF9800;
-            font-weight: bold;
-        }
-        
-        .severity-high {
-            color: #F44336;
-            font-weight: bold;
-        }
-        
-        /* Notification badge */
-        .notification-badge {
-            background-color: #F44336;
-            color: white;
-            border-radius: 50%;
-            width: 20px;
-            height: 20px;
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            font-size: 12px;
-            position: absolute;
-            top: -5px;
-            right: -5px;
-        }
-        
-        /* Processing button animation */
-        @keyframes processing {
-            0% { background-position: 0% 50%; }
-            50% { background-position: 100% 50%; }
-            100% { background-position: 0% 50%; }
-        }
-        
-        .processing-button {
-            background: linear-gradient(270deg, #1A2A6C, #B21F1F, #FDBB2D, #1A2A6C);
-            background-size: 300% 300%;
-            animation: processing 3s ease infinite;
-            color: white !important;
-            border: none !important;
-        }
-        
-        /* Pulsing dot */
-        .pulsing-dot {
-            display: inline-block;
-            width: 10px;
-            height: 10px;
-            background-color: #F44336;
-            border-radius: 50%;
-            margin-left: 5px;
-            animation: pulse 1s infinite;
-        }
-    </style>
-    """, unsafe_allow_html=True)
+    st.markdown(stylesheet_tag("detection"), unsafe_allow_html=True)
     
     # Logo and header section
     st.markdown("""
@@ -1035,16 +455,45 @@ def display_detection_page():
             
             # File upload with better styling
             st.markdown('<p style="font-weight: bold; margin-bottom: 5px;">Upload Brain MRI Scan</p>', unsafe_allow_html=True)
-            uploaded_file = st.file_uploader("", type=["png", "jpg", "jpeg"])
+            uploaded_files = st.file_uploader("", type=["png", "jpg", "jpeg", "dcm", "nii", "gz"], accept_multiple_files=True)
+            st.caption("Upload a single image, a DICOM series (.dcm files) or a NIfTI volume (.nii / .nii.gz)")
+            
+            # DICOM series and NIfTI volumes take the slice-by-slice path; ".gz" is accepted only as .nii.gz
+            volume_files = [f for f in uploaded_files if is_volume_upload(f.name)]
+            other_archives = [f.name for f in uploaded_files if f.name.lower().endswith(".gz") and not is_volume_upload(f.name)]
+            if other_archives:
+                st.error(f"Only .nii.gz archives are supported; ignoring {', '.join(other_archives)}")
+            image_files = [f for f in uploaded_files if not is_volume_upload(f.name) and not f.name.lower().endswith(".gz")]
+            uploaded_file = image_files[0] if image_files and not volume_files else None
+            
+            # Typeahead over registered patients (prefix seek on the patients identity index)
+            # Patient lookup, full-text search, follow-up and archival use SQLite-specific indexes
+            sqlite_store = detection_store().backend == "sqlite"
+            patient_query = st.text_input("Find Existing Patient", placeholder="Start typing a name...") if sqlite_store else ""
+            existing_patient = None
+            if patient_query:
+                conn = connect()
+                matches = search_patients(conn, patient_query)
+                conn.close()
+                patient_options = {f"{name} (DOB: {dob or 'unknown'})": (name, dob, gender) for _, name, dob, gender in matches}
+                selected_patient = st.selectbox("Matching Patients", ["New patient"] + list(patient_options))
+                existing_patient = patient_options.get(selected_patient)
             
-            # Form for patient details
+            # Form for patient details, prefilled when an existing patient is selected
+            gender_options = ["Male", "Female", "Other"]
             with st.form(key="patient_form"):
-                patient_name = st.text_input("Patient Name", placeholder="dattatray paitwar")
+                patient_name = st.text_input("Patient Name", value=existing_patient[0] if existing_patient else "", placeholder="dattatray paitwar")
+                date_of_birth = st.date_input(
+                    "Date of Birth (optional)",
+                    value=datetime.strptime(existing_patient[1], "%Y-%m-%d").date() if existing_patient and existing_patient[1] else None,
+                    min_value=datetime(1900, 1, 1).date(),
+                    max_value=datetime.now().date(),
+                )
                 col1, col2 = st.columns(2)
                 with col1:
                     patient_age = st.number_input("Age", min_value=0, max_value=120, value=30)
                 with col2:
-                    patient_gender = st.selectbox("Gender", ["Male", "Female", "Other"])
+                    patient_gender = st.selectbox("Gender", gender_options, index=gender_options.index(existing_patient[2]) if existing_patient and existing_patient[2] in gender_options else 0)
                 
                 email = st.text_input("Email Address (for report)", placeholder="aditimagar@gmail.com")
                 
@@ -1074,14 +523,17 @@ def display_detection_page():
         image = None
         tumor_detected = False
         
+        if volume_files:
+            display_volume_detection(volume_files, patient_name)
+        
         if uploaded_file is not None:
-            file_bytes = np.asarray(bytearray(uploaded_file.read()), dtype=np.uint8)
-            image = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
+            # Full-resolution array for detection, reduced decode for on-screen previews
+            image, preview = load_uploaded_scan(uploaded_file)
             
             with col1:
                 st.markdown('<div class="hover-card">', unsafe_allow_html=True)
                 st.subheader("Original MRI Scan")
-                st.image(image, caption=f"Patient: {patient_name if patient_name else 'Unknown'}", use_container_width=True)
+                st.image(preview, caption=f"Patient: {patient_name if patient_name else 'Unknown'}", channels="BGR", use_container_width=True)
                 st.markdown('</div>', unsafe_allow_html=True)
                 
                 # Processing options with improved UI
@@ -1106,23 +558,23 @@ def display_detection_page():
                         with tab:
                             option = processing_options[i]
                             if "Denoise" in option:
-                                denoised_img = denoise_image(image)
+                                denoised_img = denoise_image(preview)
                                 st.image(denoised_img, caption="Noise Reduction Applied", use_container_width=True)
                             
                             elif "CLAHE" in option:
-                                clahe_img = apply_clahe(image)
+                                clahe_img = apply_clahe(preview)
                                 st.image(clahe_img, caption="Contrast Limited Adaptive Histogram Equalization", use_container_width=True)
                             
                             elif "Thresholding" in option:
-                                threshold_img = adaptive_thresholding(image)
+                                threshold_img = adaptive_thresholding(preview)
                                 st.image(threshold_img, caption="Adaptive Thresholding Result", use_container_width=True)
                             
                             elif "Edge" in option:
-                                edge_img = canny_edge_detection(image)
+                                edge_img = canny_edge_detection(preview)
                                 st.image(edge_img, caption="Edge Detection Result", use_container_width=True)
                             
                             elif "Contour" in option:
-                                contour_img = find_and_filter_contours(image)
+                                contour_img = find_and_filter_contours(preview)
                                 st.image(contour_img, caption="Contour Detection", use_container_width=True)
                     
                     st.markdown('</div>', unsafe_allow_html=True)
@@ -1136,7 +588,7 @@ def display_detection_page():
                 
             
             if detection_btn and image is not None:
-                if not patient_name:
+                if not patient_name or not patient_name.strip():
                     st.warning("⚠️ Please enter the patient's name in the sidebar.")
                 elif not email:
                     st.warning("⚠️ Please enter an email address to receive the report.")
@@ -1170,8 +622,20 @@ def display_detection_page():
                     time.sleep(0.5)
                     progress_bar.progress(40)
                     
-                    # Perform actual detection
-                    yolo_img, tumor_lengths = detect_tumor_with_yolo(image)
+                    # Perform actual detection, unless this patient's exact scan was analyzed before
+                    stage_timings = {}
+                    scan_hash, scan_phash = image_hash(image), perceptual_hash(image)
+                    patient_id = detection_store().register_patient(patient_name, date_of_birth, patient_gender)
+                    prior = detection_store().find_duplicate(scan_hash, scan_phash, patient_id)
+                    duplicate_of = prior["id"] if prior else None
+                    if prior and prior["exact"] and prior["processed_image"]:
+                        st.info(f"Same scan as this patient's record #{duplicate_of}; showing its result instead of re-running detection.")
+                        rendered = RenderedImage.from_encoded(prior["processed_image"], timings=stage_timings)
+                        boxes = boxes_from_blob(prior["tumor_boxes"])
+                    else:
+                        if prior:
+                            st.info(f"This looks similar to this patient's record #{duplicate_of} (re-encoded or slightly altered); detection was run again.")
+                        rendered, boxes = detect_tumor_with_yolo(image, stage_timings)
                     
                     # Stage 3
                     progress_placeholder.markdown("""
@@ -1189,17 +653,15 @@ def display_detection_page():
                     with col2:
                         st.markdown('<div class="hover-card">', unsafe_allow_html=True)
                         st.subheader("Detection Results")
-                        st.image(yolo_img, caption="YOLO Tumor Detection Result", use_container_width=True)
+                        st.image(rendered.image, caption="YOLO Tumor Detection Result", use_container_width=True)
                         st.markdown('</div>', unsafe_allow_html=True)
     
-                    if tumor_lengths:
+                    if len(boxes):
                         tumor_detected = True
-                        
-                        # Convert tensor values to Python floats
-                        tumor_lengths = [float(length) for length in tumor_lengths]
+                        tumor_lengths = box_lengths(boxes)
                         
                         # Assess tumor severity
-                        severity, recommendation = assess_tumor_severity(tumor_lengths, image.shape)
+                        severity, recommendation = assess_tumor_severity(boxes, image)
                         
                         # Select appropriate severity class for styling
                         severity_class = "severity-low"
@@ -1239,7 +701,7 @@ def display_detection_page():
                             st.markdown(f"""
                             <div style="background-color: rgba(26, 42, 108, 0.1); padding: 15px; border-radius: 10px; text-align: center;">
                                 <h3 style="margin-bottom: 5px;">Largest (px)</h3>
-                                <p style="font-size: 2rem; font-weight: bold; margin: 0;">{round(max(tumor_lengths), 2)}</p>
+                                <p style="font-size: 2rem; font-weight: bold; margin: 0;">{round(float(tumor_lengths.max()), 2)}</p>
                             </div>
                             """, unsafe_allow_html=True)
                         
@@ -1247,7 +709,7 @@ def display_detection_page():
                             st.markdown(f"""
                             <div style="background-color: rgba() padding: 15px; border-radius: 10px; text-align: center;">
                                 <h3 style="margin-bottom: 5px;">Avg Size</h3>
-                                <p style="font-size: 2rem; font-weight: bold; margin: 0;">{round(sum(tumor_lengths)/len(tumor_lengths), 2)}</p>
+                                <p style="font-size: 2rem; font-weight: bold; margin: 0;">{round(float(tumor_lengths.mean()), 2)}</p>
                             </div>
                             """, unsafe_allow_html=True)
                         
@@ -1265,9 +727,8 @@ def display_detection_page():
                         </div>
                         """, unsafe_allow_html=True)
                         
-                        # Convert the processed image to PNG format
-                        _, buffer = cv2.imencode('.png', yolo_img)
-                        processed_image = buffer.tobytes()
+                        # Encode the processed image to PNG once for the database, email and download
+                        processed_image = rendered.png
                         
                         # Stage 4
                         progress_placeholder.markdown("""
@@ -1283,17 +744,22 @@ def display_detection_page():
                         
                 # Create PDF report
                 detection_time = datetime.now()
-                pdf_report = create_pdf_report(patient_name, tumor_lengths, yolo_img, detection_time, severity, recommendation)
+                pdf_report = create_pdf_report(patient_name, boxes, rendered, detection_time, severity, recommendation)
                 
-                # Store results in database with additional patient info
-                store_in_database(patient_name, patient_age, patient_gender, tumor_lengths, processed_image, severity, recommendation)
+                # Store results in database, linked to the patient record
+                store = detection_store()
+                patient_id = store.register_patient(patient_name, date_of_birth, patient_gender)
+                store.insert(detection_record(patient_id, patient_name, patient_age, patient_gender, boxes, processed_image, severity, recommendation, brain_pixel_count(image), build_report_text(patient_name, boxes, detection_time, severity, recommendation), detection_time,
+                                              scan_hash, scan_phash, duplicate_of))
+                # The chatbot answers "my last scan" questions for this patient
+                st.session_state["chat_patient"] = (patient_id, patient_name)
                 
                 # Prepare email data
                 email_data = {
                     "patient_name": patient_name,
                     "patient_age": patient_age,
                     "patient_gender": patient_gender,
-                    "tumor_lengths": tumor_lengths,
+                    "tumor_boxes": boxes,
                     "detection_time": detection_time,
                     "severity": severity,
                     "recommendation": recommendation
@@ -1322,7 +788,7 @@ def display_detection_page():
                 with col1:
                     st.download_button(
                         label="Download Processed Image",
-                        data=BytesIO(cv2.imencode('.png', yolo_img)[1]).getvalue(),
+                        data=processed_image,
                         file_name=f"{patient_name}_processed_image.png",
                         mime="image/png",
                     )
@@ -1335,6 +801,14 @@ def display_detection_page():
                         mime="application/pdf",
                     )
                 
+                # Per-stage processing cost, including image encoding
+                with st.expander("⏱️ Processing timings"):
+                    for stage, seconds in stage_timings.items():
+                        st.write(f"**{stage.capitalize()}:** {seconds * 1000:.1f} ms")
+                
+                # Compare against the patient's earlier scans
+                display_patient_followup(patient_id, patient_name)
+                
                 # Display the chatbot link
                 st.markdown(
     '<div style="background-color:#f0f2f6; padding:15px; border-radius:10px;">'
@@ -1349,7 +823,7 @@ def display_detection_page():
                 progress_placeholder.empty()
 
     # If no image uploaded, show message
-    if image is None:
+    if image is None and not volume_files:
         st.markdown(
         """
         <div style="color: black; font-weight: bold;font-size :22px">
@@ -1368,6 +842,33 @@ def display_detection_page():
     )
 
 
+def display_patient_followup(patient_id, patient_name):
+    """Trend and latest-vs-prior deltas for a patient, read without image BLOBs"""
+    conn = connect()
+    try:
+        metrics, comparison = patient_followup(conn, patient_id)
+    finally:
+        conn.close()
+    
+    if comparison is None:
+        st.info(f"No earlier scans on record for {patient_name} to compare against.")
+        return
+    
+    st.markdown("<h3>📈 Follow-up Comparison</h3>", unsafe_allow_html=True)
+    followup_col1, followup_col2, followup_col3 = st.columns(3)
+    # Growth is bad news, so increases are shown in red
+    followup_col1.metric("Tumor Count", int(metrics["tumor_count"][-1]), delta=comparison["tumor_count_delta"], delta_color="inverse")
+    followup_col2.metric("Largest (px)", f"{metrics['max_length'][-1]:.1f}", delta=f"{comparison['max_length_delta']:+.1f}", delta_color="inverse")
+    followup_col3.metric("Severity", metrics["severity"][-1] or "N/A", delta=comparison["severity_delta"], delta_color="inverse")
+    st.caption(f"Compared with record #{comparison['prior_id']} from {comparison['prior_time']}")
+    
+    trend = pd.DataFrame({
+        "Tumor Count": metrics["tumor_count"],
+        "Largest (px)": metrics["max_length"],
+        "Severity Level": metrics["severity_level"],
+    }, index=pd.to_datetime(metrics["detection_time"]))
+    st.line_chart(trend)
+
 # Enhanced email sending function
 def send_tumor_report(recipient_email, email_data, image_data, pdf_report):
     sender_email = os.getenv('EMAIL_ADDRESS')
@@ -1430,7 +931,7 @@ def send_tumor_report(recipient_email, email_data, image_data, pdf_report):
                     <table>
                         <tr>
                             <th>Number of Tumors</th>
-                            <td>{len(email_data["tumor_lengths"])}</td>
+                            <td>{len(email_data["tumor_boxes"])}</td>
                         </tr>
                         <tr>
                             <th>Severity</th>
@@ -1441,7 +942,7 @@ def send_tumor_report(recipient_email, email_data, image_data, pdf_report):
                     <div class="info-box">
                         <p><strong>Tumor Sizes:</strong></p>
                         <ul>
-                            {"".join(f"<li>Tumor {i+1}: {length:.2f} pixels</li>" for i, length in enumerate(email_data["tumor_lengths"]))}
+                            {"".join(f"<li>Tumor {i+1}: {length:.2f} x {height:.2f} pixels (area {box['area']:.1f} px, confidence {box['confidence']:.2f})</li>" for i, (length, height, box) in enumerate(zip(box_lengths(email_data["tumor_boxes"]), box_heights(email_data["tumor_boxes"]), email_data["tumor_boxes"])))}
                         </ul>
                     </div>
                     
@@ -1488,142 +989,8 @@ def send_tumor_report(recipient_email, email_data, image_data, pdf_report):
     except Exception as e:
         return False, f"Failed to send report: {str(e)}"
 
-# Enhanced database function with more patient info
-def store_in_database(patient_name, patient_age, patient_gender, tumor_lengths, processed_image, severity, recommendation):
-    # Make sure tumor_lengths contains Python float values
-    tumor_lengths = [float(length) for length in tumor_lengths]
-    
-    conn = sqlite3.connect("tumor_detection.db")
-    cursor = conn.cursor()
-    
-    # Insert record with all fields
-    cursor.execute('''
-    INSERT INTO detections (patient_name, patient_age, patient_gender, tumor_count, tumor_lengths, detection_time, processed_image, severity, recommendation)
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (patient_name, patient_age, patient_gender, len(tumor_lengths), json.dumps(tumor_lengths), datetime.now(), processed_image, severity, recommendation))
-    
-    conn.commit()
-    conn.close()
-
 def display_history():
-    st.markdown("""
-    <style>
-        /* Background with parallax effect */
-        .stApp::before {
-            content: "";
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            background: url('https://plus.unsplash.com/premium_photo-1661767897334-bbfbdfdc4d1a?q=80&w=1470&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D') no-repeat center center fixed;
-            background-size: cover;
-            filter: blur(8px);
-            z-index: -1;
-            transform: scale(1.1);  /* Slight zoom for parallax effect */
-            transition: transform 0.5s ease;
-        }
-
-        /* Glass morphism effect for better readability */
-        .stApp {
-            background-color: rgba(255, 255, 255, 0.4);
-            backdrop-filter: blur(10px);
-        }
-
-        /* Text styling */
-        .stMarkdown, .stTitle, .stHeader, .stSubheader, .stExpander {
-            color: #0d2339 !important;
-            font-size: 22px !important;
-            font-weight: 500 !important;
-        }
-
-        /* Title with gradient */
-        .stTitle {
-            background: linear-gradient(45deg, #0d2339, #1e88e5);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            font-size: 40px !important;
-            font-weight: 700 !important;
-            margin-bottom: 30px !important;
-        }
-        
-        /* Subheader styling */
-        .stSubheader {
-            border-left: 4px solid #1e88e5;
-            padding-left: 10px;
-            font-size: 26px !important;
-        }
-
-        /* Labels, metrics, buttons styling */
-        label, .stMetricLabel, .stButton > button {
-            font-size: 20px !important;
-            color: #0d2339 !important;
-        }
-        
-        /* Metric value styling */
-        .stMetricValue {
-            font-size: 28px !important;
-            color: #1e88e5 !important;
-            font-weight: 700 !important;
-        }
-
-        /* Expander styling */
-        .stExpander {
-            border-radius: 12px !important;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.1) !important;
-            margin-bottom: 15px !important;
-            border: none !important;
-            overflow: hidden !important;
-            transition: all 0.3s ease !important;
-        }
-        
-        .stExpander:hover {
-            transform: translateY(-5px) !important;
-            box-shadow: 0 6px 16px rgba(0,0,0,0.15) !important;
-        }
-        
-        /* Button styling */
-        .stButton > button {
-            border-radius: 8px !important;
-            border: none !important;
-            background: linear-gradient(45deg, #1e88e5, #64b5f6) !important;
-            color: white !important;
-            transition: all 0.3s ease !important;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.1) !important;
-        }
-        
-        .stButton > button:hover {
-            transform: translateY(-2px) !important;
-            box-shadow: 0 4px 8px rgba(0,0,0,0.2) !important;
-        }
-        
-        /* Animation for elements */
-        @keyframes fadeIn {
-            from { opacity: 0; transform: translateY(20px); }
-            to { opacity: 1; transform: translateY(0); }
-        }
-        
-        .stExpander, .stMetric, .stButton {
-            animation: fadeIn 0.6s ease-out forwards;
-        }
-        .stMarkdown, .stTitle, .stHeader, .stSubheader, .stExpander, .stText, .stDataFrame {
-    color: #0d2339 !important;
-    font-size: 22px !important;
-    font-weight: bold !important;
-}
-
-        
-        /* Stagger animations */
-        .stExpander:nth-child(1) { animation-delay: 0.1s; }
-        .stExpander:nth-child(2) { animation-delay: 0.2s; }
-        .stExpander:nth-child(3) { animation-delay: 0.3s; }
-        
-        /* Date picker styling */
-        .stDateInput {
-            border-radius: 8px !important;
-        }
-    </style>
-    """, unsafe_allow_html=True)
+    st.markdown(stylesheet_tag("history"), unsafe_allow_html=True)
     
     # Create a header with logo and title
     col1, col2 = st.columns([1, 4])
@@ -1642,11 +1009,46 @@ def display_history():
     </div>
     """, unsafe_allow_html=True)
     
-    conn = sqlite3.connect("tumor_detection.db")
+    # Search, follow-up and archival rely on SQLite-specific indexes
+    store = detection_store()
+    sqlite_store = store.backend == "sqlite"
+    
+    # Full-text search across patient names, recommendations and reports
+    search_query = ""
+    if sqlite_store:
+        st.subheader("Search Records")
+        search_query = st.text_input("Search", placeholder="e.g. high severity age>60 name:pat", help="Keywords match names, severity, recommendations and report text. Filters: age>60, age<=30, severity:high, name:pat")
+    if search_query:
+        if st.session_state.get("history_search") != search_query:
+            st.session_state["history_search"] = search_query
+            st.session_state["history_search_page"] = 0
+        page = st.session_state.get("history_search_page", 0)
+        
+        conn = connect()
+        hits, has_more = search_detections(conn, search_query, page=page)
+        conn.close()
+        
+        if hits:
+            for record_id, hit_name, hit_age, hit_severity, hit_time, hit_snippet in hits:
+                st.markdown(f"**#{record_id} {hit_name}** (age {hit_age if hit_age is not None else 'N/A'}) | {hit_severity} | {hit_time}  \n{hit_snippet}")
+        else:
+            st.info("No records match your search.")
+        
+        page_col1, page_col2, page_col3 = st.columns([1, 1, 3])
+        with page_col1:
+            if page > 0 and st.button("← Previous"):
+                st.session_state["history_search_page"] = page - 1
+                st.experimental_rerun()
+        with page_col2:
+            if has_more and st.button("Next →"):
+                st.session_state["history_search_page"] = page + 1
+                st.experimental_rerun()
+        with page_col3:
+            st.caption(f"Page {page + 1}")
     
     # Get all records
     try:
-        df = pd.read_sql_query("SELECT * FROM detections ORDER BY detection_time DESC", conn)
+        df = pd.DataFrame(store.query())
         
         if not df.empty:
             # Show filters
@@ -1704,6 +1106,14 @@ def display_history():
                     st.metric("High Severity Cases", high_severity_count)
             
             # Display records
+            # Longitudinal trend for a single patient
+            if sqlite_store:
+                st.subheader("Patient Follow-up")
+                patient_labels = filtered_df.dropna(subset=['patient_id']).drop_duplicates('patient_id').set_index('patient_id')['patient_name']
+                followup_patient = st.selectbox("Select Patient", list(patient_labels.index), format_func=lambda pid: f"{patient_labels[pid]} (#{int(pid)})")
+                if followup_patient is not None:
+                    display_patient_followup(int(followup_patient), patient_labels[followup_patient])
+            
             st.subheader(f"Patient Records ({len(filtered_df)})")
             
             for idx, record in filtered_df.iterrows():
@@ -1721,6 +1131,9 @@ def display_history():
                         
                         if 'recommendation' in record:
                             st.write(f"**Recommendation:** {record['recommendation']}")
+                        
+                        if pd.notna(record.get('duplicate_of')):
+                            st.caption(f"🔁 Same scan as record #{int(record['duplicate_of'])}")
                     
                     with col2:
                         if 'processed_image' in record and record['processed_image'] is not None:
@@ -1772,8 +1185,6 @@ def display_history():
         </div>
         """, unsafe_allow_html=True)
     
-    conn.close()
-    
     # Add clear history button with confirmation
     st.markdown("<hr style='margin: 30px 0;'>", unsafe_allow_html=True)
     st.subheader("Database Management")
@@ -1789,7 +1200,7 @@ def display_history():
             confirm_col1, confirm_col2 = st.columns([1, 3])
             with confirm_col1:
                 if st.button("Yes, Clear Data"):
-                    clear_history()
+                    store.clear()
                     st.success("Detection history cleared successfully.")
                     st.session_state['show_confirm'] = False
                     st.experimental_rerun()
@@ -1797,6 +1208,26 @@ def display_history():
                 if st.button("Cancel"):
                     st.session_state['show_confirm'] = False
                     st.experimental_rerun()
+    
+    # Retention: move old records and images into monthly compressed archives
+    if sqlite_store:
+        with st.expander("Archive Old Records"):
+            retention_col1, retention_col2 = st.columns(2)
+            with retention_col1:
+                max_age_days = st.number_input("Archive records older than (days)", min_value=1, value=365)
+            with retention_col2:
+                max_rows = st.number_input("Keep at most this many recent records (0 = no limit)", min_value=0, value=0)
+            if st.button("Archive and Compact"):
+                with st.spinner("Archiving records and compacting the database..."):
+                    archived, freed = run_retention(max_age_days=int(max_age_days), max_rows=int(max_rows) or None)
+                if freed is None:
+                    st.success(f"Archived {archived} records.")
+                    st.info("To reclaim disk space, stop the app once and run `python retention.py enable-incremental-vacuum`.")
+                else:
+                    st.success(f"Archived {archived} records and freed {freed} database pages.")
+            archived_months = list_archives()
+            if archived_months:
+                st.caption(f"Archived months: {', '.join(archived_months)}")
 
 def display_about_page():
     # Add custom CSS with animations and improved styling
@@ -2109,28 +1540,8 @@ def display_faq_page():
     """, unsafe_allow_html=True)
     st.title("Frequently Asked Questions")
     
-    faq_data = [
-        {
-            "question": "How accurate is the tumor detection?",
-            "answer": "Our system currently has an accuracy rate of approximately 85-90% based on our validation studies. However, accuracy can vary depending on image quality and tumor characteristics."
-        },
-        {
-            "question": "What type of images should I upload?",
-            "answer": "The system works best with T1 or T2-weighted MRI brain scans in PNG, JPG, or JPEG format. Images should be clear and properly oriented for best results."
-        },
-        {
-            "question": "Is my data secure and private?",
-            "answer": "Yes, all uploaded images and patient data are encrypted and stored securely. We comply with healthcare data protection standards, though this is a demonstration system and should not be used with real patient data without proper approvals."
-        },
-        {
-            "question": "Can I use this system for clinical diagnosis?",
-            "answer": "This system is designed as a supportive tool and should not be used as the sole basis for clinical diagnosis. Always consult with a qualified healthcare professional."
-        },
-        {
-            "question": "What does the severity assessment mean?",
-            "answer": "The severity assessment is based on the size of detected tumors relative to brain area and provides a general indication of urgency. Low severity suggests regular follow-up, moderate severity suggests closer monitoring, and high severity suggests immediate medical consultation."
-        }
-    ]
+    with open("data/faq.json", encoding="utf-8") as f:
+        faq_data = json.load(f)
     
     for i, faq in enumerate(faq_data):
         with st.expander(faq["question"]):
@@ -2181,56 +1592,56 @@ def watershed_segmentation(img):
     return img
 
 # Tumor detection function using YOLO
-def detect_tumor_with_yolo(img):
+def detect_tumor_with_yolo(img, timings=None):
+    timings = timings if timings is not None else {}
+    
+    start = time.perf_counter()
     img_preprocessed = denoise_image(img)
     pred = model.predict(img_preprocessed)[0]
-    img_with_boxes = pred.plot()
-    
-    boxes = pred.boxes.xyxy
-    tumor_lengths = []
+    boxes = boxes_from_prediction(pred)
+    timings["inference"] = time.perf_counter() - start
 
-    for box in boxes:
-        x1, y1, x2, y2 = box
-        length = x2 - x1
-        tumor_lengths.append(length)
-        cv2.rectangle(img_with_boxes, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-        
-        # Add additional metrics like area
-        width = y2 - y1
-        area = length * width
-        cv2.putText(img_with_boxes, f"Area: {area:.1f}", (int(x1), int(y1)-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+    # Draw boxes and labels in a single pass; encodings are cached on the result
+    start = time.perf_counter()
+    rendered = RenderedImage(draw_detections(img_preprocessed, boxes, pred.names), timings)
+    timings["render"] = time.perf_counter() - start
 
-    return img_with_boxes, tumor_lengths
+    return rendered, boxes
 
-def clear_history():
-    conn = sqlite3.connect("tumor_detection.db")
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM detections")
-    conn.commit()
-    conn.close()
+def detect_tumors_in_volume(volume, batch_size=8, progress_callback=None):
+    """Run YOLO over every slice of a volume in batches, returning boxes and brain area per slice"""
+    slice_boxes = []
+    brain_areas = []
+    for start, batch in iter_slice_batches(volume, batch_size):
+        preds = model.predict([denoise_image(slice_img) for slice_img in batch], verbose=False)
+        slice_boxes.extend(boxes_from_prediction(pred) for pred in preds)
+        brain_areas.extend(brain_pixel_count(slice_img) for slice_img in batch)
+        if progress_callback:
+            progress_callback(start + len(batch))
+    return slice_boxes, brain_areas
 
 # Add data visualization for historical data
 def generate_stats_visualization():
-    conn = sqlite3.connect("tumor_detection.db")
-    
     try:
-        # Get data for charts
-        df = pd.read_sql_query("SELECT * FROM detections", conn)
+        # Prefer the columnar snapshot (python snapshots.py export --every 300) while it is fresh; it is
+        # exported from the local SQLite file, so other backends and stale snapshots use the live store
+        manifest = read_manifest()
+        if detection_store().backend == "sqlite" and snapshot_is_current(manifest):
+            stats = snapshot_stats(*history_snapshot(manifest["exported_at"]))
+        else:
+            stats = detection_store().stats()
         
-        if len(df) > 0:
-            # Convert detection_time to datetime
-            df['detection_time'] = pd.to_datetime(df['detection_time'])
-            df['month_year'] = df['detection_time'].dt.strftime('%Y-%m')
-            
+        if stats['total'] > 0:
             # Create a histogram of tumor counts
             fig1, ax1 = plt.subplots(figsize=(10, 6))
-            df['tumor_count'].plot(kind='hist', bins=10, ax=ax1)
+            tumor_counts = {count: n for count, n in stats['tumor_count_counts'].items() if count is not None}
+            ax1.bar(list(tumor_counts), list(tumor_counts.values()))
             ax1.set_title('Distribution of Tumor Counts')
             ax1.set_xlabel('Number of Tumors')
             ax1.set_ylabel('Frequency')
             
             # Create a time series of detections
-            monthly_counts = df.groupby('month_year').size()
+            monthly_counts = pd.Series(stats['monthly_counts'])
             fig2, ax2 = plt.subplots(figsize=(10, 6))
             monthly_counts.plot(kind='line', ax=ax2)
             ax2.set_title('Monthly Detection Counts')
@@ -2238,8 +1649,8 @@ def generate_stats_visualization():
             ax2.set_ylabel('Number of Detections')
             
             # Create a pie chart of severity distribution if available
-            if 'severity' in df.columns:
-                severity_counts = df['severity'].value_counts()
+            if stats['severity_counts']:
+                severity_counts = pd.Series(stats['severity_counts'])
                 fig3, ax3 = plt.subplots(figsize=(8, 8))
                 severity_counts.plot(kind='pie', autopct='%1.1f%%', ax=ax3)
                 ax3.set_title('Distribution of Severity Levels')
@@ -2254,8 +1665,6 @@ def generate_stats_visualization():
     except Exception as e:
         print(f"Error generating visualizations: {str(e)}")
         return None, None, None
-    finally:
-        conn.close()
 
 # Chatbot functionality
 def display_chatbot_page():
@@ -2267,6 +1676,19 @@ def display_chatbot_page():
             {"role": "assistant", "content": "Hello! I'm your Brain Tumor Detection Assistant. You can ask me questions about brain tumors, detection methods, or your results. How can I help you today?"}
         ]
     
+    # Patient whose scans "my results" questions refer to; defaults to the last one scanned
+    if detection_store().backend == "sqlite":
+        patient_query = st.text_input("Patient", placeholder="Type a name to ask about their scans...")
+        if patient_query:
+            conn = connect()
+            matches = search_patients(conn, patient_query)
+            conn.close()
+            patient_options = {f"{name} (DOB: {dob or 'unknown'})": (patient_id, name) for patient_id, name, dob, _ in matches}
+            if patient_options:
+                st.session_state["chat_patient"] = patient_options[st.selectbox("Matching Patients", list(patient_options))]
+        if st.session_state.get("chat_patient"):
+            st.caption(f"Answering questions about {st.session_state['chat_patient'][1]}'s scans")
+    
     # Display chat messages
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
@@ -2292,133 +1714,49 @@ def display_chatbot_page():
             st.markdown(response)
 
 def process_chatbot_query(query):
-    # Simple rule-based responses for common questions
-    query_lower = query.lower()
-    
-    # Brain tumor general information
-    if any(keyword in query_lower for keyword in ["what is", "brain tumor", "definition"]):
-        return """
-        A brain tumor is a mass or growth of abnormal cells in the brain. Brain tumors can be benign (non-cancerous) or malignant (cancerous). Benign tumors grow slowly and typically don't spread to other parts of the body. Malignant tumors grow rapidly and can invade nearby tissues.
-        
-        Brain tumors are classified based on:
-        - Where they originated (primary vs. metastatic)
-        - Their cell type
-        - Their grade (aggressiveness)
-        - Their location in the brain
-        """
-    
-    # Symptoms
-    elif any(keyword in query_lower for keyword in ["symptom", "sign", "indication"]):
-        return """
-        Common symptoms of brain tumors include:
-        
-        - Headaches (especially those that wake you up in the morning)
-        - Seizures
-        - Difficulty thinking, speaking, or finding words
-        - Personality or behavior changes
-        - Weakness or paralysis in one part or side of the body
-        - Loss of balance or coordination
-        - Vision problems
-        - Nausea and vomiting
-        
-        Please note that these symptoms can also be caused by many other conditions. If you're experiencing these symptoms, consult a healthcare professional for proper evaluation.
-        """
-    
-    # About detection methods
-    elif any(keyword in query_lower for keyword in ["detection method", "diagnosis", "test", "yolo", "image processing"]):
-        return """
-        Brain tumors are detected using several methods:
-        
-        1. Imaging tests:
-           - MRI (Magnetic Resonance Imaging) - The primary method used in our system
-           - CT scans
-           - PET scans
-        
-        2. Biopsy - The definitive method to determine if a tumor is cancerous
-        
-        Our system uses advanced image processing techniques and a YOLO (You Only Look Once) deep learning model trained on brain MRI scans to detect and locate potential tumors. The process includes:
-        
-        - Image preprocessing (denoising, contrast enhancement)
-        - Feature extraction
-        - Tumor detection and classification
-        
-        While our system has high accuracy, all results should be confirmed by medical professionals.
-        """
+    # Questions about stored scans are answered from the detections table
+    if detection_store().backend == "sqlite":
+        patient = st.session_state.get("chat_patient")
+        conn = connect()
+        answer = answer_from_history(conn, query, patient[0] if patient else None, st.session_state.setdefault("chat_history_cache", {}))
+        conn.close()
+        if answer:
+            return answer
+    
+    # Best-matching answer from the BM25 index over data/chatbot_answers.json
+    hits = chatbot_index().search(query, k=1)
+    if hits:
+        return hits[0][0]["text"]
+    
+    # Paraphrases sharing no keyword with any answer: closest chatbot answer or FAQ entry by meaning
+    # Built ahead of time with `python semantic_index.py build`; shared with the Patient Corner page
+    index = shared_semantic_index()
+    if index:
+        try:
+            hits = index.search(query, k=3, min_score=MIN_ANSWER_SCORE)
+        except MODEL_ERRORS:
+            # The model loads on the first search and may be unavailable; fall through to the default reply
+            hits = []
+        for document, _ in hits:
+            if document["source"] == "chatbot":
+                return document["answer"]
+            if document["source"] == "faq":
+                return f"**{document['title']}**\n\n{document['answer']}"
     
-    # Treatment options
-    elif any(keyword in query_lower for keyword in ["treatment", "therapy", "surgery", "option"]):
-        return """
-        Treatment options for brain tumors depend on type, size, location, and the patient's overall health. Common treatments include:
-        
-        1. Surgery - To remove as much of the tumor as safely possible
-        
-        2. Radiation Therapy - Uses high-energy beams to kill tumor cells
-        
-        3. Chemotherapy - Uses drugs to kill tumor cells
-        
-        4. Targeted Drug Therapy - Focuses on specific abnormalities in cancer cells
-        
-        5. Immunotherapy - Helps your immune system fight the cancer
-        
-        6. Rehabilitation - May be needed after treatment to regain lost abilities
-        
-        Treatment often involves a combination of these approaches. A team of specialists (neuro-oncologists, neurosurgeons, radiation oncologists) will develop a personalized treatment plan.
-        """
+    # Default response for other queries
+    return """
+    Thank you for your question. As a specialized medical assistant, I can provide information about:
     
-    # Severity levels
-    elif any(keyword in query_lower for keyword in ["severity", "stage", "grade", "seriousness"]):
-        return """
-        Brain tumor severity is typically classified in several ways:
-        
-        1. WHO Grade (I-IV):
-           - Grade I: Slow growing, least malignant
-           - Grade II: Relatively slow growing
-           - Grade III: Actively reproducing abnormal cells
-           - Grade IV: Rapidly reproducing, highly malignant
-        
-        2. In our system, we provide a simplified assessment based on tumor size relative to brain area:
-           - Low Severity: Smaller tumors (<1% of brain area)
-           - Moderate Severity: Medium-sized tumors (1-5% of brain area)
-           - High Severity: Larger tumors (>5% of brain area)
-        
-        These assessments help guide follow-up recommendations but should always be reviewed by medical professionals.
-        """
+    - Brain tumor definitions and types
+    - Symptoms and warning signs
+    - Detection and diagnostic methods
+    - Treatment options
+    - Our detection system's capabilities
     
-    # About our system
-    elif any(keyword in query_lower for keyword in ["system", "app", "application", "accuracy", "reliable"]):
-        return """
-        Our Brain Tumor Detection System:
-        
-        - Uses a YOLO (You Only Look Once) deep learning model trained on thousands of brain MRI scans
-        - Implements multiple image processing techniques to enhance visualization
-        - Provides severity assessment based on tumor size and characteristics
-        - Generates detailed reports with measurements and recommendations
-        - Has approximately 85-90% accuracy in controlled validation studies
-        
-        Limitations:
-        - Should be used as a supportive tool, not for definitive diagnosis
-        - Accuracy depends on image quality
-        - May not detect very small tumors or certain rare types
-        - Works best with T1 and T2-weighted MRI scans
-        
-        Always consult healthcare professionals for proper diagnosis and treatment decisions.
-        """
+    Please feel free to ask about any of these topics or specify your question further.
     
-    # Default response for other queries
-    else:
-        return """
-        Thank you for your question. As a specialized medical assistant, I can provide information about:
-        
-        - Brain tumor definitions and types
-        - Symptoms and warning signs
-        - Detection and diagnostic methods
-        - Treatment options
-        - Our detection system's capabilities
-        
-        Please feel free to ask about any of these topics or specify your question further.
-        
-        Remember that all information provided is educational and should not replace professional medical advice.
-        """
+    Remember that all information provided is educational and should not replace professional medical advice.
+    """
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,157 @@
+import argparse
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import requests
+
+from http_client import shared_client
+
+
+ASSET_CACHE_DIR = "asset_cache"
+# Cached copies older than this are still served, and re-downloaded in the background
+ASSET_MAX_AGE = 7 * 24 * 3600
+ASSET_TIMEOUT = 5.0
+# A URL that failed to download is not tried again for this long
+ASSET_RETRY_DELAY = 10 * 60
+
+
+class AssetManager:
+    """Lottie animations and icons served from memory, backed by a local cache directory
+
+    Lookups go memory -> cache directory -> network. With a warm cache
+    directory no request is made; copies past max_age are still served
+    and refreshed on a background thread. Failed downloads are remembered
+    for retry_delay, so a dead URL costs no request on every rerun.
+    """
+
+    def __init__(self, cache_dir=ASSET_CACHE_DIR, max_age=ASSET_MAX_AGE, timeout=ASSET_TIMEOUT, session=None,
+                 retry_delay=ASSET_RETRY_DELAY):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.session = session or shared_client()
+        self.network_fetches = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        # url -> (bytes, time the bytes were downloaded)
+        self._memory = {}
+        self._parsed = {}
+        self._refreshing = set()
+        # url -> time of the last failed download
+        self._failed = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=6, thread_name_prefix="assets")
+
+    def path(self, url):
+        extension = os.path.splitext(urlparse(url).path)[1] or ".bin"
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + extension)
+
+    def _download(self, url):
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.content
+        path = self.path(url)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+        with self._lock:
+            self.network_fetches += 1
+            self._memory[url] = (data, time.time())
+            self._refreshing.discard(url)
+            self._failed.pop(url, None)
+        return data
+
+    def _refresh_later(self, url):
+        with self._lock:
+            if url in self._refreshing:
+                return
+            self._refreshing.add(url)
+        self._pool.submit(self._download_quietly, url)
+
+    def _download_quietly(self, url):
+        try:
+            return self._download(url)
+        except (requests.RequestException, OSError):
+            with self._lock:
+                self._refreshing.discard(url)
+                self._failed[url] = time.time()
+            return None
+
+    def get(self, url):
+        """Asset bytes, or None when it is neither cached nor downloadable"""
+        with self._lock:
+            cached = self._memory.get(url)
+        if cached is None:
+            path = self.path(url)
+            if not os.path.exists(path):
+                with self._lock:
+                    failed_at = self._failed.get(url)
+                if failed_at is not None and time.time() - failed_at < self.retry_delay:
+                    return None
+                return self._download_quietly(url)
+            with open(path, "rb") as f:
+                cached = (f.read(), os.path.getmtime(path))
+            with self._lock:
+                self._memory[url] = cached
+        if time.time() - cached[1] > self.max_age:
+            self._refresh_later(url)
+        return cached[0]
+
+    def _parallel(self, function, urls):
+        futures = {url: self._pool.submit(function, url) for url in urls}
+        wait(futures.values(), timeout=self.timeout * 2)
+        return {url: future.result() if future.done() else None for url, future in futures.items()}
+
+    def get_many(self, urls):
+        """{url: bytes or None}; anything not cached locally is downloaded in parallel"""
+        return self._parallel(self.get, urls)
+
+    def refresh(self, urls):
+        """Download assets again in parallel, replacing the cached copies"""
+        return self._parallel(self._download_quietly, urls)
+
+    def lottie(self, url):
+        """Parsed Lottie JSON, parsed once per downloaded version"""
+        return self._parse_lottie(url, self.get(url))
+
+    def lottie_many(self, urls):
+        """Parsed Lottie JSON for each URL, in order; missing ones download in parallel"""
+        data = self.get_many(urls)
+        return [self._parse_lottie(url, data[url]) for url in urls]
+
+    def _parse_lottie(self, url, data):
+        if data is None:
+            return None
+        with self._lock:
+            parsed = self._parsed.get(url)
+        if parsed is None or parsed[0] is not data:
+            try:
+                parsed = (data, json.loads(data))
+            except ValueError:
+                return None
+            with self._lock:
+                self._parsed[url] = parsed
+        return parsed[1]
+
+    def base64(self, url):
+        data = self.get(url)
+        return base64.b64encode(data).decode("utf-8") if data is not None else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local asset cache")
+    parser.add_argument("command", choices=["prefetch"], help="Download assets into the cache directory ahead of deployment")
+    parser.add_argument("urls", nargs="+")
+    parser.add_argument("--cache-dir", default=ASSET_CACHE_DIR)
+    args = parser.parse_args()
+
+    manager = AssetManager(args.cache_dir)
+    results = manager.refresh(args.urls)
+    for url, data in results.items():
+        print(f"{'ok' if data is not None else 'FAILED':6} {len(data or b''):>8} bytes  {url}")
@@ -0,0 +1,265 @@
+import re
+from datetime import datetime, timedelta
+
+from followup import patient_followup
+
+
+# Covering index for severity questions: counts and listings over a time range
+# are read from the index alone, never from table rows holding image BLOBs
+SEVERITY_TIME_INDEX = '''
+CREATE INDEX IF NOT EXISTS idx_detections_severity_time
+ON detections (severity, detection_time, tumor_count, patient_name)
+'''
+
+SEVERITY_WORDS = {"high": "High Severity", "moderate": "Moderate Severity", "medium": "Moderate Severity", "low": "Low Severity"}
+SEVERITY_PATTERN = re.compile(r"\b(high|moderate|medium|low)[- ]?(?:severity|severe|risk|grade)\b")
+# A severity word alone is a general question ("what is a low grade tumor?");
+# it is a database query only when cases are asked to be listed or counted
+LISTING_PATTERN = re.compile(r"\b(show|list|display|find|which|how many|count|are there|were there)\b")
+CASES_PATTERN = re.compile(r"\b(cases?|patients?|scans?|detections?)\b")
+TREND_PATTERN = re.compile(r"\b(chang\w*|progress\w*|grow\w*|growth|trend\w*|compar\w*|shrunk|shrink\w*|bigger|smaller|improv\w*|wors\w*)\b")
+LAST_SCAN_PATTERN = re.compile(r"\b(last|latest|most recent|previous|recent)\b.*\b(scan|result|detection|report|mri)s?\b")
+COUNT_PATTERN = re.compile(r"\bhow many\b.*\b(scan|detection|result|test)s?\b")
+# Per-patient intents need the question to be about the patient's own scans
+PATIENT_PATTERN = re.compile(r"\b(my|mine|i have|i had|have i|do i|this patient|the patient)\b")
+SCAN_PATTERN = re.compile(r"\b(tumou?r|scan|result|detection|report|mri)s?\b")
+PERIOD_PATTERN = re.compile(r"\b(today|yesterday|this (?:week|month|year)|last (?:week|month|year)|(?:last|past) (\d+) (day|week|month)s?)\b")
+
+# Cases listed under a severity answer
+CASE_LIMIT = 5
+
+
+def create_chatbot_index(conn):
+    conn.execute(SEVERITY_TIME_INDEX)
+
+
+def parse_period(text, now):
+    """(start, end, label) for a time phrase in text, or None"""
+    match = PERIOD_PATTERN.search(text)
+    if not match:
+        return None
+    phrase = match.group(1)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    month_start = today.replace(day=1)
+    if phrase == "today":
+        return today, today + timedelta(days=1), "today"
+    if phrase == "yesterday":
+        return today - timedelta(days=1), today, "yesterday"
+    if phrase == "this week":
+        return today - timedelta(days=today.weekday()), now, "this week"
+    if phrase == "last week":
+        start = today - timedelta(days=today.weekday() + 7)
+        return start, start + timedelta(days=7), "last week"
+    if phrase == "this month":
+        return month_start, now, "this month"
+    if phrase == "last month":
+        return (month_start - timedelta(days=1)).replace(day=1), month_start, "last month"
+    if phrase == "this year":
+        return today.replace(month=1, day=1), now, "this year"
+    if phrase == "last year":
+        return today.replace(year=today.year - 1, month=1, day=1), today.replace(month=1, day=1), "last year"
+    amount, unit = int(match.group(2)), match.group(3)
+    days = amount * {"day": 1, "week": 7, "month": 30}[unit]
+    return now - timedelta(days=days), now, f"in the last {amount} {unit}{'s' if amount != 1 else ''}"
+
+
+def resolve_intent(query, now=None):
+    """(intent, params) for a question about stored detections, or None for a general question"""
+    text = query.lower()
+    now = now or datetime.now()
+    severity = SEVERITY_PATTERN.search(text)
+    if severity and LISTING_PATTERN.search(text) and CASES_PATTERN.search(text):
+        return "severity_cases", {"severity": SEVERITY_WORDS[severity.group(1)], "period": parse_period(text, now)}
+    if not (PATIENT_PATTERN.search(text) and SCAN_PATTERN.search(text)):
+        return None
+    if TREND_PATTERN.search(text):
+        return "trend", {}
+    if LAST_SCAN_PATTERN.search(text):
+        return "last_scan", {}
+    if COUNT_PATTERN.search(text):
+        return "scan_count", {}
+    return None
+
+
+def _timestamp(value):
+    return value.isoformat(sep=" ") if isinstance(value, datetime) else value
+
+
+def _short_time(value):
+    return str(value)[:16] if value else "unknown time"
+
+
+def run_intent(conn, intent, params, patient_id):
+    """Structured result of an intent; every query is parameterized and index-only"""
+    if intent == "severity_cases":
+        conditions, args = ["severity = ?"], [params["severity"]]
+        if params["period"]:
+            conditions += ["detection_time >= ?", "detection_time < ?"]
+            args += [_timestamp(params["period"][0]), _timestamp(params["period"][1])]
+        where = " AND ".join(conditions)
+        total = conn.execute(f"SELECT COUNT(*) FROM detections WHERE {where}", args).fetchone()[0]
+        cases = conn.execute(
+            f"SELECT patient_name, detection_time, tumor_count FROM detections WHERE {where} ORDER BY detection_time DESC LIMIT ?",
+            args + [CASE_LIMIT],
+        ).fetchall()
+        return {"total": total, "cases": cases}
+    if intent == "last_scan":
+        return conn.execute(
+            "SELECT id, detection_time, tumor_count, severity FROM detections WHERE patient_id = ? ORDER BY detection_time DESC LIMIT 1",
+            (patient_id,),
+        ).fetchone()
+    if intent == "scan_count":
+        return conn.execute(
+            "SELECT COUNT(*), MIN(detection_time), MAX(detection_time) FROM detections WHERE patient_id = ?", (patient_id,)
+        ).fetchone()
+    if intent == "trend":
+        metrics, comparison = patient_followup(conn, patient_id)
+        return {
+            "scans": len(metrics["id"]),
+            "first_time": metrics["detection_time"][0] if len(metrics["id"]) else None,
+            "first_count": int(metrics["tumor_count"][0]) if len(metrics["id"]) else None,
+            "first_length": float(metrics["max_length"][0]) if len(metrics["id"]) else None,
+            "latest_count": int(metrics["tumor_count"][-1]) if len(metrics["id"]) else None,
+            "latest_length": float(metrics["max_length"][-1]) if len(metrics["id"]) else None,
+            "severities": metrics["severity"],
+            "comparison": comparison,
+        }
+    raise ValueError(f"Unknown intent {intent}")
+
+
+def format_answer(intent, params, result):
+    if intent == "severity_cases":
+        period = params["period"][2] if params["period"] else "on record"
+        if not result["total"]:
+            return f"There are no {params['severity'].lower()} cases {period}."
+        lines = [f"There {'is' if result['total'] == 1 else 'are'} **{result['total']}** {params['severity'].lower()} "
+                 f"case{'s' if result['total'] != 1 else ''} {period}."]
+        if result["total"] > len(result["cases"]):
+            lines.append(f"The {len(result['cases'])} most recent:")
+        lines += [f"- {name or 'Unknown patient'}, {_short_time(detection_time)}: {tumor_count or 0} tumor(s)"
+                  for name, detection_time, tumor_count in result["cases"]]
+        return "\n".join(lines)
+    if intent == "last_scan":
+        if result is None:
+            return "I couldn't find any scans for this patient yet."
+        record_id, detection_time, tumor_count, severity = result
+        return (f"Your most recent scan (record #{record_id}) was on {_short_time(detection_time)}. "
+                f"It found **{tumor_count or 0}** tumor(s) and was rated **{severity or 'unrated'}**.")
+    if intent == "scan_count":
+        count, first_time, last_time = result
+        if not count:
+            return "I couldn't find any scans for this patient yet."
+        return (f"You have **{count}** scan{'s' if count != 1 else ''} on record, "
+                f"from {_short_time(first_time)} to {_short_time(last_time)}.")
+    if intent == "trend":
+        if result["scans"] < 2:
+            return "There is only one scan on record so far, so there is nothing to compare yet." if result["scans"] else \
+                "I couldn't find any scans for this patient yet."
+        comparison = result["comparison"]
+        direction = {1: "increased", 0: "stayed the same", -1: "decreased"}
+        severity_change = direction[(comparison["severity_delta"] > 0) - (comparison["severity_delta"] < 0)]
+        return "\n".join([
+            f"Across **{result['scans']}** scans since {_short_time(result['first_time'])}:",
+            f"- Tumor count went from {result['first_count']} to {result['latest_count']}",
+            f"- Largest tumor length went from {result['first_length']:.1f} px to {result['latest_length']:.1f} px",
+            f"- Since the previous scan ({_short_time(comparison['prior_time'])}): count {comparison['tumor_count_delta']:+d}, "
+            f"largest length {comparison['max_length_delta']:+.1f} px, severity {severity_change} "
+            f"({result['severities'][-2]} → {result['severities'][-1]})",
+            "",
+            "Changes between scans should be reviewed with your doctor.",
+        ])
+    raise ValueError(f"Unknown intent {intent}")
+
+
+# Both ends of the rowid range catch inserts, archival and clearing; the
+# id-weighted checksum over severity and tumor count catches in-place updates
+# such as a severity rescore. Every column is in idx_detections_severity_time.
+DATA_VERSION_QUERY = '''
+SELECT MIN(id), MAX(id), SUM((id % 65536) * (ifnull(unicode(severity), 0) + 256 * ifnull(tumor_count, 0)))
+FROM detections
+'''
+
+
+def data_version(conn):
+    return conn.execute(DATA_VERSION_QUERY).fetchone()
+
+
+def answer_from_history(conn, query, patient_id=None, cache=None, now=None):
+    """Markdown answer built from the detections table, or None when the question isn't about it
+
+    cache is a dict kept per session; answers are reused until detections
+    are added, removed or rescored, or the day changes.
+    """
+    now = now or datetime.now()
+    resolved = resolve_intent(query, now)
+    if resolved is None:
+        return None
+    intent, params = resolved
+    if intent != "severity_cases" and patient_id is None:
+        return "Select a patient above so I can look up their scans."
+    # Open-ended periods end at now, so the key uses the period label and the day, not the bounds
+    period = params.get("period")
+    key = (intent, params.get("severity"), period[2] if period else None, now.date(),
+           patient_id if intent != "severity_cases" else None, data_version(conn))
+    if cache is not None and key in cache:
+        return cache[key]
+    answer = format_answer(intent, params, run_intent(conn, intent, params, patient_id))
+    if cache is not None:
+        cache[key] = answer
+    return answer
+
+
+if __name__ == "__main__":
+    # Self-check on a scratch database: intents, index-only plans and the session cache
+    import os
+    import tempfile
+
+    from database import connect, detection_record, initialize_database, insert_detections
+    from detection_results import make_boxes
+
+    db_path = os.path.join(tempfile.mkdtemp(), "chatbot.db")
+    initialize_database(db_path)
+    conn = connect(db_path)
+    now = datetime(2024, 3, 20, 12, 0)
+    conn.execute("INSERT INTO patients (name, normalized_name) VALUES ('Asha Rao', 'asha rao')")
+    severities = ["Low Severity", "Moderate Severity", "High Severity"]
+    with conn:
+        insert_detections(conn, [
+            detection_record(1, "Asha Rao", 50, "Female", make_boxes([[0, 0, 10 * (i + 1), 10]] * (i + 1), [0.9] * (i + 1), [0] * (i + 1)),
+                             b"\x89PNG" + bytes(2000), severities[i], "", detection_time=now - timedelta(days=60 - 25 * i))
+            for i in range(3)
+        ])
+    cache = {}
+    for question in ["What did my last scan show?", "How has my tumor changed?", "Show high-severity cases this month",
+                     "how many scans do I have", "What is a brain tumor?"]:
+        print(f"> {question}\n{answer_from_history(conn, question, 1, cache, now)}\n")
+    assert answer_from_history(conn, "show low severity cases this month", None, cache, now).startswith("There are no")
+    assert len(cache) == 5
+
+    # General questions that share words with the intents must reach the answer index
+    for question in ["How do brain tumors grow?", "What causes tumor growth?", "Can tumors shrink with treatment?",
+                     "How do MRI results compare to CT?", "What is a low grade tumor?", "Is a high risk tumor curable?",
+                     "What are the latest results in tumor research?", "How many scans are needed for a diagnosis?"]:
+        assert resolve_intent(question, now) is None, question
+
+    # Asking again later the same day hits the cache; a rescore invalidates it
+    for minutes in (1, 2):
+        answer_from_history(conn, "Show high-severity cases this month", 1, cache, now + timedelta(minutes=minutes))
+    assert len(cache) == 5
+    assert "**1** high severity case " in answer_from_history(conn, "List high severity cases", 1, cache, now)
+    with conn:
+        conn.execute("UPDATE detections SET severity = 'High Severity' WHERE severity = 'Moderate Severity'")
+    assert "**2** high severity cases" in answer_from_history(conn, "List high severity cases", 1, cache, now)
+
+    # Every intent query must be answered from an index, without reading table rows
+    plans = [
+        ("idx_detections_severity_time", "SELECT patient_name, detection_time, tumor_count FROM detections WHERE severity = ? "
+                                         "AND detection_time >= ? AND detection_time < ? ORDER BY detection_time DESC LIMIT 5", ("x", "a", "b")),
+        ("idx_detections_patient_followup", "SELECT id, detection_time, tumor_count, severity FROM detections WHERE patient_id = ? "
+                                            "ORDER BY detection_time DESC LIMIT 1", (1,)),
+        ("idx_detections_severity_time", DATA_VERSION_QUERY, ()),
+    ]
+    for index_name, sql, args in plans:
+        plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, args))
+        assert f"COVERING INDEX {index_name}" in plan, plan
+    print("intent queries use covering indexes; repeated questions are served from the session cache")
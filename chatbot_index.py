@@ -0,0 +1,196 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+
+ANSWERS_PATH = "data/chatbot_answers.json"
+INDEX_DIR = "chatbot_index"
+MANIFEST = "manifest.json"
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Titles and keywords count this many times as often as body text
+FIELD_BOOST = 2
+
+STOPWORDS = set("""
+a about an and any are as at be by can could do does for from how i if in into is it its me my of on or our
+please should so tell than that the their them then there these they this to was what when where which who
+why will with would you your
+""".split())
+
+
+def stem(token):
+    # Plural folding only: enough for "symptoms" to match "symptom"
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def analyze(text):
+    return [stem(token) for token in re.findall(r"[0-9a-z]+", text.lower()) if token not in STOPWORDS]
+
+
+def document_terms(document):
+    fields = " ".join([document.get("title", "")] + document.get("keywords", []))
+    return analyze(fields) * FIELD_BOOST + analyze(document["text"])
+
+
+def corpus_hash(documents):
+    return hashlib.blake2b(json.dumps(documents, sort_keys=True).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def build_index(documents, index_dir=INDEX_DIR):
+    """Write a BM25 inverted index for documents into index_dir
+
+    Postings are stored as CSR arrays: term t owns doc_ids[offsets[t]:offsets[t + 1]]
+    and the matching precomputed BM25 weights, so a query only sums slices.
+    """
+    term_ids, postings = {}, []
+    lengths = np.zeros(len(documents), dtype=np.float32)
+    for doc_id, document in enumerate(documents):
+        terms = document_terms(document)
+        lengths[doc_id] = len(terms)
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            postings.append((term_ids.setdefault(term, len(term_ids)), doc_id, count))
+
+    postings.sort()
+    term_column = np.array([p[0] for p in postings], dtype=np.int64)
+    doc_ids = np.array([p[1] for p in postings], dtype=np.int32)
+    tf = np.array([p[2] for p in postings], dtype=np.float32)
+    offsets = np.searchsorted(term_column, np.arange(len(term_ids) + 1)).astype(np.int64)
+
+    document_frequency = np.diff(offsets).astype(np.float32)
+    idf = np.log(1 + (len(documents) - document_frequency + 0.5) / (document_frequency + 0.5))
+    average_length = max(float(lengths.mean()), 1.0) if len(documents) else 1.0
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[doc_ids] / average_length)
+    weights = (idf[term_column] * tf * (BM25_K1 + 1) / (tf + norm)).astype(np.float32)
+
+    # Write to a scratch directory and swap it in, so readers never see half an index
+    os.makedirs(os.path.dirname(os.path.abspath(index_dir)), exist_ok=True)
+    temp_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(index_dir)))
+    np.save(os.path.join(temp_dir, "offsets.npy"), offsets)
+    np.save(os.path.join(temp_dir, "doc_ids.npy"), doc_ids)
+    np.save(os.path.join(temp_dir, "weights.npy"), weights)
+    with open(os.path.join(temp_dir, "terms.json"), "w", encoding="utf-8") as f:
+        json.dump(term_ids, f)
+    with open(os.path.join(temp_dir, "documents.json"), "w", encoding="utf-8") as f:
+        json.dump(documents, f, ensure_ascii=False)
+    with open(os.path.join(temp_dir, MANIFEST), "w") as f:
+        json.dump({"corpus_hash": corpus_hash(documents), "documents": len(documents), "terms": len(term_ids),
+                   "postings": len(doc_ids), "k1": BM25_K1, "b": BM25_B}, f)
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.replace(temp_dir, index_dir)
+
+
+class ChatbotIndex:
+    """A BM25 index written by build_index, with the posting arrays memory-mapped"""
+
+    def __init__(self, index_dir=INDEX_DIR):
+        with open(os.path.join(index_dir, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        self.offsets = np.load(os.path.join(index_dir, "offsets.npy"), mmap_mode="r")
+        self.doc_ids = np.load(os.path.join(index_dir, "doc_ids.npy"), mmap_mode="r")
+        self.weights = np.load(os.path.join(index_dir, "weights.npy"), mmap_mode="r")
+        with open(os.path.join(index_dir, "terms.json"), encoding="utf-8") as f:
+            self.term_ids = json.load(f)
+        with open(os.path.join(index_dir, "documents.json"), encoding="utf-8") as f:
+            self.documents = json.load(f)
+
+    def search(self, query, k=3):
+        """[(document, score)] best first; documents sharing no term with the query are left out"""
+        slices = []
+        for term in set(analyze(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is not None:
+                slices.append(slice(self.offsets[term_id], self.offsets[term_id + 1]))
+        if not slices:
+            return []
+        if len(slices) == 1:
+            ids, weights = self.doc_ids[slices[0]], self.weights[slices[0]]
+        else:
+            ids = np.concatenate([self.doc_ids[s] for s in slices])
+            weights = np.concatenate([self.weights[s] for s in slices])
+        scores = np.bincount(ids, weights=weights, minlength=len(self.documents))
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.documents[i], float(scores[i])) for i in ranked]
+
+
+def load_answers(path=ANSWERS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_or_build_index(answers_path=ANSWERS_PATH, index_dir=INDEX_DIR):
+    """The index for the answers file, rebuilt first when the answers changed"""
+    documents = load_answers(answers_path)
+    try:
+        with open(os.path.join(index_dir, MANIFEST)) as f:
+            current = json.load(f)["corpus_hash"] == corpus_hash(documents)
+    except (FileNotFoundError, ValueError, KeyError):
+        current = False
+    if not current:
+        build_index(documents, index_dir)
+    return ChatbotIndex(index_dir)
+
+
+def benchmark(passages=10000, queries=500):
+    """Build an index over synthetic passages and time top-5 queries"""
+    rng = np.random.default_rng(0)
+    vocabulary = [f"term{i}" for i in range(30000)]
+    # Zipf-like word frequencies, as in natural text
+    probabilities = 1 / np.arange(1, len(vocabulary) + 1)
+    probabilities /= probabilities.sum()
+    documents = [{"id": str(i), "title": f"Passage {i}", "keywords": [],
+                  "text": " ".join(rng.choice(vocabulary, int(rng.integers(40, 120)), p=probabilities))}
+                 for i in range(passages)]
+    index_dir = tempfile.mkdtemp()
+    start = time.perf_counter()
+    build_index(documents, index_dir)
+    build_seconds = time.perf_counter() - start
+    index = ChatbotIndex(index_dir)
+
+    questions = [" ".join(rng.choice(vocabulary[:5000], int(rng.integers(3, 8)))) for _ in range(queries)]
+    timings = []
+    for question in questions:
+        start = time.perf_counter()
+        index.search(question, k=5)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"{passages:,} passages, {index.manifest['postings']:,} postings, built in {build_seconds:.1f}s")
+    print(f"top-5 query: p50 {timings[len(timings) // 2]:.3f} ms, p95 {timings[int(len(timings) * 0.95)]:.3f} ms, "
+          f"max {timings[-1]:.3f} ms")
+    shutil.rmtree(index_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BM25 retrieval index for the chatbot answers")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("build", help="Rebuild the index from the answers file")
+    query = subparsers.add_parser("query", help="Show the top answers for a question")
+    query.add_argument("question")
+    bench = subparsers.add_parser("benchmark", help="Time queries over a synthetic corpus")
+    bench.add_argument("--passages", type=int, default=10000)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_index(load_answers())
+        print(f"Indexed {len(load_answers())} answers into {INDEX_DIR}/")
+    elif args.command == "query":
+        for document, score in load_or_build_index().search(args.question):
+            print(f"{score:6.2f}  {document['title']}")
+    else:
+        benchmark(args.passages)
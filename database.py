@@ -0,0 +1,384 @@
+import argparse
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+from datetime import datetime
+
+import numpy as np
+
+from dedup import content_hash, create_dedup_schema, store_images
+from detection_results import boxes_to_blob, make_boxes
+from chatbot_history import create_chatbot_index
+from followup import create_followup_index
+from search import create_search_index
+
+
+DB_PATH = "tumor_detection.db"
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_name(name):
+    """Case-, accent- and whitespace-insensitive form of a patient name, in any script"""
+    if name is None:
+        return None
+    folded = unicodedata.normalize("NFD", unicodedata.normalize("NFKC", name).casefold())
+    # Only nonspacing combining marks are dropped, so Devanagari and other scripts keep their letters
+    folded = unicodedata.normalize("NFC", "".join(c for c in folded if unicodedata.category(c) != "Mn"))
+    return re.sub(r"\s+", " ", folded).strip()
+
+
+# Column order of the tuples built by detection_record, shared by every storage backend
+DETECTION_COLUMNS = ("patient_id", "patient_name", "patient_age", "patient_gender", "tumor_count", "tumor_boxes",
+                     "brain_area", "detection_time", "processed_image", "severity", "recommendation", "report_text",
+                     "image_hash", "scan_hash", "scan_phash", "duplicate_of")
+
+INSERT_DETECTION = f'''
+INSERT INTO detections ({", ".join(DETECTION_COLUMNS)})
+VALUES ({", ".join("?" * len(DETECTION_COLUMNS))})
+'''
+
+
+def connect(db_path=None, check_same_thread=True):
+    """Open the detections database with the helpers our queries rely on"""
+    conn = sqlite3.connect(db_path or DB_PATH, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.create_function("normalize_name", 1, normalize_name, deterministic=True)
+    return conn
+
+
+# Database initialization function - Fix for the database schema issue
+def initialize_database(db_path=None):
+    conn = connect(db_path)
+    cursor = conn.cursor()
+
+    # Only takes effect on a new file; retention.enable_incremental_vacuum converts older ones
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+    # WAL lets readers continue during writes and keeps batched commits crash-safe
+    cursor.execute("PRAGMA journal_mode = WAL")
+
+    # Patients are identified by normalized name plus date of birth
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS patients (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        normalized_name TEXT NOT NULL,
+        date_of_birth DATE,
+        gender TEXT,
+        created_at TIMESTAMP
+    )''')
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_patients_identity
+    ON patients (normalized_name, ifnull(date_of_birth, ''))
+    ''')
+
+    # Check if detections table exists and get its structure
+    cursor.execute("PRAGMA table_info(detections)")
+    columns = [column[1] for column in cursor.fetchall()]
+
+    if not columns:
+        # Table doesn't exist, create it with all necessary columns
+        cursor.execute('''
+        CREATE TABLE detections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_id INTEGER REFERENCES patients(id),
+            patient_name TEXT,
+            patient_age INTEGER,
+            patient_gender TEXT,
+            tumor_count INTEGER,
+            tumor_lengths TEXT,
+            tumor_boxes BLOB,
+            brain_area INTEGER,
+            detection_time TIMESTAMP,
+            processed_image BLOB,
+            severity TEXT,
+            recommendation TEXT,
+            report_text TEXT,
+            image_hash TEXT,
+            scan_hash TEXT,
+            scan_phash INTEGER,
+            duplicate_of INTEGER
+        )''')
+    else:
+        # Table exists but might be missing columns - add them if needed
+        needed_columns = [
+            'patient_id INTEGER REFERENCES patients(id)',
+            'patient_age INTEGER',
+            'patient_gender TEXT',
+            'tumor_count INTEGER',
+            'tumor_lengths TEXT',
+            'tumor_boxes BLOB',
+            'brain_area INTEGER',
+            'detection_time TIMESTAMP',
+            'processed_image BLOB',
+            'severity TEXT',
+            'recommendation TEXT',
+            'report_text TEXT',
+            'image_hash TEXT',
+            'scan_hash TEXT',
+            'scan_phash INTEGER',
+            'duplicate_of INTEGER'
+        ]
+
+        for column_def in needed_columns:
+            column_name = column_def.split(' ')[0]
+            if column_name not in columns:
+                try:
+                    cursor.execute(f"ALTER TABLE detections ADD COLUMN {column_def}")
+                except sqlite3.OperationalError:
+                    # Column might already exist or there might be other issues
+                    pass
+
+    # Retention jobs and the History page select by detection time
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_detections_time ON detections (detection_time)")
+
+    # Link legacy free-text rows to patient records
+    renormalize_patients(conn)
+    migrate_patients(conn)
+
+    # Index used by follow-up comparisons to read patient history without image BLOBs
+    create_followup_index(conn)
+
+    # Full-text search over names, recommendations and report text
+    create_search_index(conn)
+
+    # Content-addressed processed images and the first detection of each distinct scan
+    create_dedup_schema(conn)
+
+    # Severity and time range questions from the chatbot
+    create_chatbot_index(conn)
+
+    conn.commit()
+    conn.close()
+
+
+def migrate_patients(conn):
+    """Create one patient per distinct normalized name for rows without a patient_id"""
+    # Legacy rows carry no date of birth, so they dedupe on name alone
+    conn.execute('''
+    INSERT OR IGNORE INTO patients (name, normalized_name, gender, created_at)
+    SELECT patient_name, normalize_name(patient_name), patient_gender, MIN(detection_time)
+    FROM detections
+    WHERE patient_id IS NULL AND trim(ifnull(patient_name, '')) != ''
+    GROUP BY normalize_name(patient_name)
+    ''')
+    conn.execute('''
+    UPDATE detections SET patient_id = (
+        SELECT id FROM patients
+        WHERE normalized_name = normalize_name(detections.patient_name) AND ifnull(date_of_birth, '') = ''
+    )
+    WHERE patient_id IS NULL AND trim(ifnull(patient_name, '')) != ''
+    ''')
+
+
+def renormalize_patients(conn):
+    """Bring normalized names written by an earlier normalize_name up to date
+
+    The earlier version dropped every non-Latin character, so names in other
+    scripts were stored as '' and merged into one patient. Detections whose
+    own name differs from their patient's are unlinked so migrate_patients
+    gives them patients of their own.
+    """
+    stale = conn.execute("SELECT id, name FROM patients WHERE normalized_name != normalize_name(name)").fetchall()
+    if not stale:
+        return
+    conn.executemany(
+        "UPDATE detections SET patient_id = NULL WHERE patient_id = ? AND normalize_name(patient_name) != normalize_name(?)",
+        stale,
+    )
+    conn.executemany("UPDATE OR IGNORE patients SET normalized_name = normalize_name(name) WHERE id = ?", ((id_,) for id_, _ in stale))
+
+
+def get_or_create_patient(conn, name, date_of_birth=None, gender=None):
+    """ID of the patient with this name and date of birth, registering them if new"""
+    normalized = normalize_name(name)
+    if not normalized:
+        raise ValueError("Patient name is required")
+    dob = date_of_birth.isoformat() if date_of_birth else None
+    row = conn.execute(
+        "SELECT id FROM patients WHERE normalized_name = ? AND ifnull(date_of_birth, '') = ifnull(?, '')",
+        (normalized, dob),
+    ).fetchone()
+    if row:
+        return row[0]
+    cursor = conn.execute(
+        "INSERT INTO patients (name, normalized_name, date_of_birth, gender, created_at) VALUES (?, ?, ?, ?, ?)",
+        (name.strip(), normalized, dob, gender, datetime.now()),
+    )
+    return cursor.lastrowid
+
+
+def search_patients(conn, query, limit=10):
+    """Patients whose normalized name starts with the query, via a range seek on the identity index"""
+    prefix = normalize_name(query)
+    if not prefix:
+        return []
+    return conn.execute('''
+    SELECT id, name, date_of_birth, gender FROM patients
+    WHERE normalized_name >= ? AND normalized_name < ?
+    ORDER BY normalized_name LIMIT ?
+    ''', (prefix, prefix + "\uffff", limit)).fetchall()
+
+
+def detection_record(patient_id, patient_name, patient_age, patient_gender, boxes, processed_image, severity, recommendation, brain_area=None, report_text=None, detection_time=None,
+                     scan_hash=None, scan_phash=None, duplicate_of=None):
+    """Parameter tuple for INSERT_DETECTION"""
+    return (patient_id, patient_name, patient_age, patient_gender, len(boxes), boxes_to_blob(boxes), brain_area,
+            detection_time or datetime.now(), processed_image, severity, recommendation, report_text,
+            content_hash(processed_image) if processed_image else None, scan_hash, scan_phash, duplicate_of)
+
+
+IMAGE_INDEX = DETECTION_COLUMNS.index("processed_image")
+IMAGE_HASH_INDEX = DETECTION_COLUMNS.index("image_hash")
+
+
+def content_addressed(records):
+    """Split processed images out of records: (records referencing images by hash, {hash: bytes})"""
+    images = {}
+    stripped = []
+    for record in records:
+        if record[IMAGE_HASH_INDEX] and record[IMAGE_INDEX] is not None:
+            images[record[IMAGE_HASH_INDEX]] = record[IMAGE_INDEX]
+            record = record[:IMAGE_INDEX] + (None,) + record[IMAGE_INDEX + 1:]
+        stripped.append(record)
+    return stripped, images
+
+
+def insert_detections(conn, records):
+    """Insert records built by detection_record, storing each distinct image once; returns the last id"""
+    records, images = content_addressed(records)
+    store_images(conn, images)
+    if len(records) == 1:
+        return conn.execute(INSERT_DETECTION, records[0]).lastrowid
+    conn.executemany(INSERT_DETECTION, records)
+    return None
+
+
+class BulkDetectionWriter:
+    """Buffers detection records and writes them with one transaction per batch
+
+    A batch is flushed once it reaches batch_size records or once its oldest
+    record has waited max_delay seconds, whichever comes first. Use as a
+    context manager so the final partial batch is flushed on exit.
+
+    A failed write keeps the batch buffered for the next attempt. When a
+    time-based flush fails, the error is raised from the next add or flush.
+    """
+
+    def __init__(self, db_path=None, batch_size=1000, max_delay=2.0):
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.rows_written = 0
+        self.write_seconds = 0.0
+        self._conn = connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        # With WAL, NORMAL sync survives application crashes without an fsync per commit
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._buffer = []
+        self._oldest = None
+        self._error = None
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_when_stale, daemon=True)
+        self._timer.start()
+
+    def add(self, record):
+        """Queue one tuple built by detection_record"""
+        with self._lock:
+            self._raise_background_error()
+            if not self._buffer:
+                self._oldest = time.monotonic()
+            self._buffer.append(record)
+            if len(self._buffer) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._raise_background_error()
+            self._flush_locked()
+
+    def _raise_background_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        start = time.perf_counter()
+        with self._conn:
+            insert_detections(self._conn, self._buffer)
+        self.write_seconds += time.perf_counter() - start
+        self.rows_written += len(self._buffer)
+        self._buffer = []
+        self._oldest = None
+
+    def _flush_when_stale(self):
+        while not self._closed.wait(min(self.max_delay, 0.5)):
+            with self._lock:
+                if self._oldest is not None and time.monotonic() - self._oldest >= self.max_delay:
+                    try:
+                        self._flush_locked()
+                    except sqlite3.Error as e:
+                        # The rows stay buffered and are retried on the next tick
+                        logger.warning("Background flush of %d detections failed: %s", len(self._buffer), e)
+                        self._error = e
+
+    @property
+    def rows_per_second(self):
+        return self.rows_written / self.write_seconds if self.write_seconds else 0.0
+
+    def close(self):
+        self._closed.set()
+        self._timer.join()
+        try:
+            with self._lock:
+                # A final write supersedes earlier background failures
+                self._error = None
+                self._flush_locked()
+        finally:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def benchmark_bulk_insert(rows=100000, batch_size=1000):
+    """Insert synthetic detections into a scratch database and report throughput"""
+    db_path = os.path.join(tempfile.mkdtemp(), "bulk_benchmark.db")
+    initialize_database(db_path)
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 255, 4096, dtype=np.uint8).tobytes()
+
+    start = time.perf_counter()
+    with BulkDetectionWriter(db_path, batch_size=batch_size) as writer:
+        for i in range(rows):
+            xy = rng.uniform(0, 400, size=(2, 2))
+            boxes = make_boxes(np.hstack([xy, xy + 40]), [0.9, 0.8], [0, 0])
+            writer.add(detection_record(None, f"Synthetic Patient {i % 5000}", 40, "Other", boxes, image,
+                                        "Low Severity", "Regular follow-up recommended in 6 months"))
+    elapsed = time.perf_counter() - start
+    print(f"{writer.rows_written} rows: {writer.rows_per_second:,.0f} rows/sec in inserts, "
+          f"{writer.rows_written / elapsed:,.0f} rows/sec end to end")
+    os.remove(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detections database maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    bench = subparsers.add_parser("benchmark-bulk", help="Measure BulkDetectionWriter throughput")
+    bench.add_argument("--rows", type=int, default=100000)
+    bench.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.command == "benchmark-bulk":
+        benchmark_bulk_insert(args.rows, args.batch_size)
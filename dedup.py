@@ -0,0 +1,176 @@
+import argparse
+import hashlib
+
+import cv2
+import numpy as np
+
+
+# Scans whose perceptual hashes differ in at most this many bits are the same scan
+PHASH_MAX_DISTANCE = 3
+# 64-bit hashes split into 16-bit bands: two hashes within PHASH_MAX_DISTANCE bits
+# must agree on at least one band, so candidates come from four index seeks
+PHASH_BANDS = 4
+PHASH_BAND_BITS = 16
+
+# Processed images are stored once per content hash. scans remembers the first
+# detection of every distinct upload; the trigger fills it as detections arrive.
+DEDUP_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS images (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scans (
+    hash TEXT PRIMARY KEY,
+    phash INTEGER NOT NULL,
+    detection_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_detections_image_hash ON detections (image_hash);
+CREATE TRIGGER IF NOT EXISTS detections_record_scan AFTER INSERT ON detections
+WHEN new.scan_hash IS NOT NULL BEGIN
+    INSERT OR IGNORE INTO scans (hash, phash, detection_id) VALUES (new.scan_hash, new.scan_phash, new.id);
+END;
+''' + "".join(
+    f"CREATE INDEX IF NOT EXISTS idx_scans_phash_band{band} ON scans (((phash >> {band * PHASH_BAND_BITS}) & 65535));\n"
+    for band in range(PHASH_BANDS)
+)
+
+
+def create_dedup_schema(conn):
+    conn.executescript(DEDUP_SCHEMA)
+
+
+def content_hash(data):
+    """Hash of encoded image bytes, used as the images table key"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def perceptual_hash(img):
+    """64-bit difference hash, stable across re-encoding and small intensity changes
+
+    Returned as a signed integer so it fits an SQLite INTEGER.
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    value = int.from_bytes(np.packbits(bits).tobytes(), "big")
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def hamming_distance(a, b):
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+
+
+def phash_bands(phash):
+    # Same arithmetic as the band index expressions, including for negative hashes
+    return [(phash >> (band * PHASH_BAND_BITS)) & 65535 for band in range(PHASH_BANDS)]
+
+
+def find_scan(conn, scan_hash, phash, patient_id):
+    """(detection_id, exact) of the patient's first detection of this scan, or None
+
+    An identical upload matches by scan_hash; a re-encoded or slightly
+    altered one matches by perceptual hash distance. Only the same
+    patient's detections match: structurally similar MRIs of different
+    patients are different scans.
+    """
+    row = conn.execute(
+        "SELECT detection_id FROM scans JOIN detections d ON d.id = scans.detection_id WHERE hash = ? AND d.patient_id = ?",
+        (scan_hash, patient_id),
+    ).fetchone()
+    if row:
+        return row[0], True
+    candidates = conn.execute(" UNION ".join(
+        f"SELECT phash, detection_id FROM scans WHERE ((phash >> {band * PHASH_BAND_BITS}) & 65535) = ?"
+        for band in range(PHASH_BANDS)
+    ), phash_bands(phash)).fetchall()
+    matches = sorted((hamming_distance(phash, other), detection_id) for other, detection_id in candidates)
+    for distance, detection_id in matches:
+        if distance > PHASH_MAX_DISTANCE:
+            break
+        # The first detection may have been archived since
+        if conn.execute("SELECT 1 FROM detections WHERE id = ? AND patient_id = ?", (detection_id, patient_id)).fetchone():
+            return detection_id, False
+    return None
+
+
+def store_images(conn, images):
+    """Insert {hash: bytes} into images, skipping content that is already stored"""
+    conn.executemany("INSERT OR IGNORE INTO images (hash, data) VALUES (?, ?)", images.items())
+
+
+def collect_garbage(conn):
+    """Drop images and scan entries no detection refers to any more"""
+    conn.execute("DELETE FROM images WHERE NOT EXISTS (SELECT 1 FROM detections WHERE image_hash = images.hash)")
+    conn.execute("DELETE FROM scans WHERE NOT EXISTS (SELECT 1 FROM detections WHERE id = scans.detection_id)")
+
+
+def migrate_inline_images(conn, chunk_size=500):
+    """Move processed_image BLOBs of older rows into the images table"""
+    moved = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, processed_image FROM detections WHERE processed_image IS NOT NULL LIMIT ?", (chunk_size,)
+        ).fetchall()
+        if not rows:
+            return moved
+        hashes = [content_hash(data) for _, data in rows]
+        with conn:
+            store_images(conn, dict(zip(hashes, (data for _, data in rows))))
+            conn.executemany(
+                "UPDATE detections SET image_hash = ?, processed_image = NULL WHERE id = ?",
+                zip(hashes, (record_id for record_id, _ in rows)),
+            )
+        moved += len(rows)
+
+
+def benchmark_storage(rows=2000, duplicate_ratio=0.7, image_bytes=200000):
+    """Database size for a duplicate-heavy workload, with inline vs content-addressed images"""
+    import os
+    import tempfile
+
+    from database import INSERT_DETECTION, detection_record, initialize_database, insert_detections, connect
+    from detection_results import make_boxes
+
+    rng = np.random.default_rng(0)
+    distinct = max(1, int(rows * (1 - duplicate_ratio)))
+    images = [rng.integers(0, 255, image_bytes, dtype=np.uint8).tobytes() for _ in range(distinct)]
+    boxes = make_boxes([[10, 10, 40, 50]], [0.9], [0])
+    records = [detection_record(None, "Synthetic Patient", 40, "Other", boxes, images[i % distinct], "Low Severity",
+                                "Regular follow-up recommended in 6 months") for i in range(rows)]
+    sizes = {}
+    for mode in ("inline", "deduplicated"):
+        db_path = os.path.join(tempfile.mkdtemp(), f"{mode}.db")
+        initialize_database(db_path)
+        conn = connect(db_path)
+        with conn:
+            if mode == "inline":
+                conn.executemany(INSERT_DETECTION, records)
+            else:
+                insert_detections(conn, records)
+        conn.close()
+        sizes[mode] = os.path.getsize(db_path)
+        os.remove(db_path)
+    print(f"{rows} detections, {duplicate_ratio:.0%} duplicates: inline {sizes['inline'] / 1e6:.1f} MB, "
+          f"deduplicated {sizes['deduplicated'] / 1e6:.1f} MB ({1 - sizes['deduplicated'] / sizes['inline']:.0%} smaller)")
+
+
+if __name__ == "__main__":
+    from database import connect
+
+    parser = argparse.ArgumentParser(description="Processed image deduplication")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("migrate", help="Move inline processed images into the images table").add_argument("--db")
+    bench = subparsers.add_parser("benchmark", help="Compare database size with and without deduplication")
+    bench.add_argument("--rows", type=int, default=2000)
+    bench.add_argument("--duplicate-ratio", type=float, default=0.7)
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        benchmark_storage(args.rows, args.duplicate_ratio)
+    else:
+        conn = connect(args.db)
+        moved = migrate_inline_images(conn)
+        with conn:
+            collect_garbage(conn)
+        conn.close()
+        print(f"Moved {moved} inline images; run `python retention.py run` or VACUUM to reclaim the space")
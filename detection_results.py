@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+
+
+# One packed record per detected box (26 bytes): corners, confidence, class and area
+BOX_DTYPE = np.dtype([
+    ("x1", "<f4"),
+    ("y1", "<f4"),
+    ("x2", "<f4"),
+    ("y2", "<f4"),
+    ("confidence", "<f4"),
+    ("class_id", "<i2"),
+    ("area", "<f4"),
+])
+
+
+def make_boxes(xyxy, confidence=None, class_id=None):
+    """Build a structured box array from an (n, 4) xyxy array"""
+    xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+    boxes = np.zeros(len(xyxy), dtype=BOX_DTYPE)
+    boxes["x1"], boxes["y1"], boxes["x2"], boxes["y2"] = xyxy.T
+    if confidence is not None:
+        boxes["confidence"] = confidence
+    if class_id is not None:
+        boxes["class_id"] = class_id
+    boxes["area"] = (boxes["x2"] - boxes["x1"]) * (boxes["y2"] - boxes["y1"])
+    return boxes
+
+
+def boxes_from_prediction(pred):
+    """Convert an ultralytics result into a structured box array in one pass"""
+    result_boxes = pred.boxes
+    return make_boxes(
+        result_boxes.xyxy.cpu().numpy(),
+        result_boxes.conf.cpu().numpy(),
+        result_boxes.cls.cpu().numpy(),
+    )
+
+
+def boxes_from_lengths(tumor_lengths):
+    """Rebuild boxes for legacy rows that only stored widths (assumes square boxes)"""
+    lengths = np.asarray(tumor_lengths, dtype=np.float32)
+    return make_boxes(np.column_stack([np.zeros_like(lengths), np.zeros_like(lengths), lengths, lengths]))
+
+
+def box_lengths(boxes):
+    """Horizontal extent of each box, the measurement previously reported as tumor length"""
+    return boxes["x2"] - boxes["x1"]
+
+
+def box_heights(boxes):
+    return boxes["y2"] - boxes["y1"]
+
+
+def boxes_to_blob(boxes):
+    """Serialize boxes to the compact binary form stored in the database"""
+    return np.ascontiguousarray(boxes, dtype=BOX_DTYPE).tobytes()
+
+
+def boxes_from_blob(blob):
+    """Read boxes back from their stored binary form without copying"""
+    if not blob:
+        return np.zeros(0, dtype=BOX_DTYPE)
+    return np.frombuffer(blob, dtype=BOX_DTYPE)
+
+
+def boxes_from_row(tumor_boxes, tumor_lengths):
+    """Boxes for a detections row, falling back to the legacy JSON lengths column"""
+    if tumor_boxes:
+        return boxes_from_blob(tumor_boxes)
+    if tumor_lengths:
+        return boxes_from_lengths(json.loads(tumor_lengths))
+    return np.zeros(0, dtype=BOX_DTYPE)
@@ -0,0 +1,90 @@
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from detection_results import boxes_from_row, box_lengths, make_boxes, boxes_to_blob
+from severity import SEVERITY_LABELS
+
+
+# Covering index: per-patient history is answered from the index alone, so the
+# table rows (and their processed_image BLOBs) are never read
+PATIENT_HISTORY_INDEX = '''
+CREATE INDEX IF NOT EXISTS idx_detections_patient_followup
+ON detections (patient_id, detection_time, tumor_count, severity, tumor_boxes, tumor_lengths)
+'''
+
+
+def create_followup_index(conn):
+    # Superseded by the patient_id index once patients got their own table
+    conn.execute("DROP INDEX IF EXISTS idx_detections_patient_history")
+    conn.execute(PATIENT_HISTORY_INDEX)
+
+
+def fetch_patient_history(conn, patient_id):
+    """Non-image columns of every detection for a patient, oldest first"""
+    return conn.execute('''
+    SELECT id, detection_time, tumor_count, severity, tumor_boxes, tumor_lengths
+    FROM detections WHERE patient_id = ? ORDER BY detection_time
+    ''', (patient_id,)).fetchall()
+
+
+def history_metrics(rows):
+    """Column arrays of count, largest tumor length and severity level per scan"""
+    boxes_per_scan = [boxes_from_row(row[4], row[5]) for row in rows]
+    return {
+        "id": np.array([row[0] for row in rows], dtype=np.int64),
+        "detection_time": [row[1] for row in rows],
+        "tumor_count": np.array([row[2] or 0 for row in rows], dtype=np.int64),
+        "max_length": np.array([float(box_lengths(b).max()) if len(b) else 0.0 for b in boxes_per_scan]),
+        "severity_level": np.array([SEVERITY_LABELS.index(row[3]) if row[3] in SEVERITY_LABELS else -1 for row in rows]),
+        "severity": [row[3] for row in rows],
+    }
+
+
+def compare_with_prior(metrics):
+    """Growth deltas between the latest scan and the one before it, or None"""
+    if len(metrics["id"]) < 2:
+        return None
+    return {
+        "prior_id": int(metrics["id"][-2]),
+        "prior_time": metrics["detection_time"][-2],
+        "tumor_count_delta": int(metrics["tumor_count"][-1] - metrics["tumor_count"][-2]),
+        "max_length_delta": float(metrics["max_length"][-1] - metrics["max_length"][-2]),
+        "severity_delta": int(metrics["severity_level"][-1] - metrics["severity_level"][-2]),
+    }
+
+
+def patient_followup(conn, patient_id):
+    """History metrics and latest-vs-prior comparison for one patient"""
+    metrics = history_metrics(fetch_patient_history(conn, patient_id))
+    return metrics, compare_with_prior(metrics)
+
+
+if __name__ == "__main__":
+    # Lookup benchmark against one million synthetic detections
+    path = os.path.join(tempfile.mkdtemp(), "followup_bench.db")
+    conn = sqlite3.connect(path)
+    conn.execute('''
+    CREATE TABLE detections (id INTEGER PRIMARY KEY AUTOINCREMENT, patient_id INTEGER, tumor_count INTEGER,
+    tumor_lengths TEXT, tumor_boxes BLOB, detection_time TIMESTAMP, processed_image BLOB, severity TEXT)
+    ''')
+    blob = boxes_to_blob(make_boxes([[10, 10, 40, 50]], [0.9], [0]))
+    start_time = datetime(2020, 1, 1)
+    conn.executemany(
+        "INSERT INTO detections (patient_id, tumor_count, tumor_boxes, detection_time, processed_image, severity) VALUES (?, 1, ?, ?, ?, ?)",
+        ((i % 100000, blob, start_time + timedelta(hours=i), b"\0" * 2048, SEVERITY_LABELS[i % 3]) for i in range(1000000)),
+    )
+    create_followup_index(conn)
+    conn.commit()
+
+    runs = 1000
+    start = time.perf_counter()
+    for i in range(runs):
+        patient_followup(conn, i * 97 % 100000)
+    print(f"patient_followup: {(time.perf_counter() - start) / runs * 1000:.3f} ms per lookup over 1M rows")
+    conn.close()
+    os.remove(path)
@@ -0,0 +1,187 @@
+import argparse
+import json
+import math
+import re
+import time
+from bisect import bisect_left
+
+import numpy as np
+
+
+HOSPITALS_PATH = "data/hospitals.json"
+# Spatial grid cell size in degrees (about 55 km of latitude)
+GRID_DEGREES = 0.5
+KM_PER_DEGREE = 111.195
+EARTH_RADIUS_KM = 6371.0
+# Below this many candidates a direct vectorized distance beats walking grid rings
+DIRECT_RANKING_LIMIT = 256
+
+
+def tokenize(text):
+    return re.findall(r"[0-9a-z]+", text.lower())
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance from one point to arrays of points"""
+    lat, lon, lats, lons = np.radians(lat), np.radians(lon), np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class HospitalDirectory:
+    """Hospitals with inverted indexes for faceted filtering, prefix search and distance ranking
+
+    Hospitals are addressed by their position in the list. Facet indexes
+    map each state, division and specialty to a set of positions; prefix
+    search bisects a sorted list of name and city tokens; a grid of
+    GRID_DEGREES cells answers nearest-hospital queries ring by ring.
+    """
+
+    def __init__(self, hospitals):
+        self.hospitals = hospitals
+        self.all_ids = list(range(len(hospitals)))
+        self.by_state, self.by_division, self.by_specialty = {}, {}, {}
+        tokens = []
+        for i, hospital in enumerate(hospitals):
+            self.by_state.setdefault(hospital["state"], set()).add(i)
+            self.by_division.setdefault(hospital["division"], set()).add(i)
+            for specialty in hospital["specialties"]:
+                self.by_specialty.setdefault(specialty, set()).add(i)
+            tokens.extend((token, i) for token in set(tokenize(hospital["name"] + " " + hospital["city"])))
+        tokens.sort()
+        self._tokens = [token for token, _ in tokens]
+        self._token_ids = [i for _, i in tokens]
+
+        # Option lists for the filter widgets
+        self.states = sorted(self.by_state)
+        self.divisions = sorted(self.by_division)
+        self.specialties = sorted(self.by_specialty)
+
+        # Hospitals without coordinates are left out of distance ranking
+        located = [i for i, hospital in enumerate(hospitals) if hospital.get("lat") is not None and hospital.get("lon") is not None]
+        self.lats = np.full(len(hospitals), np.nan)
+        self.lons = np.full(len(hospitals), np.nan)
+        self.lats[located] = [hospitals[i]["lat"] for i in located]
+        self.lons[located] = [hospitals[i]["lon"] for i in located]
+        self.grid = {}
+        for i in located:
+            self.grid.setdefault(self._cell(self.lats[i], self.lons[i]), []).append(i)
+        cells = list(self.grid) or [(0, 0)]
+        self._grid_bounds = (min(x for x, _ in cells), max(x for x, _ in cells), min(y for _, y in cells), max(y for _, y in cells))
+
+    def _cell(self, lat, lon):
+        return int(math.floor(lat / GRID_DEGREES)), int(math.floor(lon / GRID_DEGREES))
+
+    def prefix_matches(self, query):
+        """Positions whose name or city has a word starting with every word of the query"""
+        result = None
+        # Longest words first: they narrow the set the most
+        for word in sorted(set(tokenize(query)), key=len, reverse=True):
+            start = bisect_left(self._tokens, word)
+            end = bisect_left(self._tokens, word + "\uffff", start)
+            ids = set(self._token_ids[start:end])
+            result = ids if result is None else result & ids
+            if not result:
+                break
+        return result
+
+    def filter(self, state=None, division=None, specialty=None, query=None):
+        """Positions matching every given facet and the name/city prefix query, in list order"""
+        sets = [index.get(value, set()) for index, value in
+                ((self.by_state, state), (self.by_division, division), (self.by_specialty, specialty)) if value]
+        if query and query.strip():
+            matches = self.prefix_matches(query)
+            if matches is not None:
+                sets.append(matches)
+        if not sets:
+            return self.all_ids
+        sets.sort(key=len)
+        result = sets[0].intersection(*sets[1:])
+        return sorted(result)
+
+    def nearest(self, lat, lon, ids=None, limit=None):
+        """[(position, km)] closest first, optionally restricted to ids and cut to limit"""
+        if limit is None or (ids is not None and len(ids) <= DIRECT_RANKING_LIMIT):
+            candidates = np.array(self.all_ids if ids is None else list(ids), dtype=np.int64)
+            candidates = candidates[~np.isnan(self.lats[candidates])]
+            distances = haversine_km(lat, lon, self.lats[candidates], self.lons[candidates])
+            order = np.argsort(distances, kind="stable")[:limit]
+            return [(int(candidates[j]), float(distances[j])) for j in order]
+
+        allowed = None if ids is None else set(ids)
+        cx, cy = self._cell(lat, lon)
+        min_x, max_x, min_y, max_y = self._grid_bounds
+        last_ring = max(abs(cx - min_x), abs(cx - max_x), abs(cy - min_y), abs(cy - max_y))
+        found = []
+        for ring in range(last_ring + 1):
+            ring_ids = [i for x in range(cx - ring, cx + ring + 1) for y in range(cy - ring, cy + ring + 1)
+                        if max(abs(x - cx), abs(y - cy)) == ring for i in self.grid.get((x, y), ())]
+            if allowed is not None:
+                ring_ids = [i for i in ring_ids if i in allowed]
+            if ring_ids:
+                distances = haversine_km(lat, lon, self.lats[ring_ids], self.lons[ring_ids])
+                found.extend(zip(distances.tolist(), ring_ids))
+            if len(found) >= limit:
+                # Anything beyond this ring is at least this far away (longitude degrees shrink towards the poles)
+                edge_km = ring * GRID_DEGREES * KM_PER_DEGREE * math.cos(math.radians(min(89.0, abs(lat) + (ring + 1) * GRID_DEGREES)))
+                found.sort()
+                if found[limit - 1][0] <= edge_km:
+                    break
+        found.sort()
+        return [(i, km) for km, i in found[:limit]]
+
+
+def load_directory(path=HOSPITALS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return HospitalDirectory(json.load(f))
+
+
+def synthetic_hospitals(count, seed=0):
+    rng = np.random.default_rng(seed)
+    words = ["apollo", "city", "care", "general", "memorial", "medical", "sunrise", "lotus", "metro", "national",
+             "global", "unity", "life", "hope", "star", "green", "royal", "prime", "saint", "shanti"]
+    cities = [f"city{i}" for i in range(400)]
+    specialties = [f"Specialty {i}" for i in range(40)]
+    return [{
+        "name": " ".join(rng.choice(words, 3)).title() + f" Hospital {i}",
+        "city": cities[rng.integers(len(cities))].title(),
+        "state": f"State {rng.integers(30)}",
+        "division": ["North", "South", "East", "West", "Central"][rng.integers(5)],
+        "address": "", "phone": "", "website": "",
+        "specialties": list(rng.choice(specialties, 4, replace=False)),
+        "lat": float(rng.uniform(8, 35)), "lon": float(rng.uniform(68, 97)),
+    } for i in range(count)]
+
+
+def benchmark(count=10000, repeat=200):
+    """Time facet filters, prefix search and nearest-hospital ranking on synthetic data"""
+    hospitals = synthetic_hospitals(count)
+    start = time.perf_counter()
+    directory = HospitalDirectory(hospitals)
+    print(f"{count:,} hospitals indexed in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    cases = {
+        "state": lambda: directory.filter(state="State 3"),
+        "state + division + specialty": lambda: directory.filter(state="State 3", division="North", specialty="Specialty 7"),
+        "prefix 'apo'": lambda: directory.filter(query="apo"),
+        "prefix 'sun lot' + division": lambda: directory.filter(division="South", query="sun lot"),
+        "nearest 20": lambda: directory.nearest(19.07, 72.88, limit=20),
+        "nearest 20 within a specialty": lambda: directory.nearest(19.07, 72.88, directory.filter(specialty="Specialty 7"), limit=20),
+    }
+    # Results must match a plain scan over the list
+    expected = [i for i, h in enumerate(hospitals) if h["state"] == "State 3" and h["division"] == "North" and "Specialty 7" in h["specialties"]]
+    assert directory.filter(state="State 3", division="North", specialty="Specialty 7") == expected
+    assert directory.filter(query="apo") == [i for i, h in enumerate(hospitals) if any(t.startswith("apo") for t in tokenize(h["name"] + " " + h["city"]))]
+    assert [i for i, _ in directory.nearest(19.07, 72.88, limit=20)] == [i for i, _ in directory.nearest(19.07, 72.88)[:20]]
+    for name, case in cases.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            case()
+        print(f"{name:32} {(time.perf_counter() - start) * 1000 / repeat:.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hospital directory index")
+    parser.add_argument("--count", type=int, default=10000, help="Synthetic hospitals to benchmark with")
+    args = parser.parse_args()
+    benchmark(args.count)
@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+HTTP_TIMEOUT = 10.0
+# Keep-alive connections kept open per host, and hosts kept in the pool
+CONNECTIONS_PER_HOST = 4
+POOLED_HOSTS = 32
+# Requests in flight across all hosts
+MAX_CONCURRENCY = 16
+HTTP_RETRIES = 2
+HTTP_BACKOFF = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+USER_AGENT = "BrainTumorDetection/1.0 (+patient-corner)"
+# Request latencies kept per host for the metrics
+LATENCY_WINDOW = 100
+
+
+class HttpClient:
+    """Shared HTTP session for every outbound call
+
+    Connections are kept alive in a pool per host and the number of
+    requests in flight is bounded. Connection failures and 429/5xx answers
+    are retried with exponential backoff; a read timeout is not, since a
+    server that is slow to answer rarely gets faster. GET responses can be
+    cached in memory for a per-call number of seconds.
+    """
+
+    def __init__(self, timeout=HTTP_TIMEOUT, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF,
+                 connections_per_host=CONNECTIONS_PER_HOST, max_concurrency=MAX_CONCURRENCY):
+        self.timeout = timeout
+        retry = Retry(total=retries, connect=retries, read=0, status=retries, backoff_factor=backoff,
+                      status_forcelist=RETRY_STATUSES, allowed_methods=["GET", "HEAD"], raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=POOLED_HOSTS, pool_maxsize=connections_per_host,
+                              pool_block=True, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # (url, headers) -> (response, expires_at)
+        self._cache = {}
+        self._latencies = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, headers=None, timeout=None, cache_ttl=0):
+        """GET through the shared pool; with cache_ttl a 200 answer is reused for that many seconds
+
+        Raises requests.RequestException like requests.get does.
+        """
+        key = (url, tuple(sorted((headers or {}).items())))
+        if cache_ttl:
+            with self._lock:
+                cached = self._cache.get(key)
+            if cached and cached[1] > time.time():
+                return cached[0]
+
+        host = urlparse(url).netloc
+        start = time.perf_counter()
+        try:
+            with self._slots:
+                response = self.session.get(url, headers=headers, timeout=timeout or self.timeout)
+        except requests.RequestException:
+            with self._lock:
+                self._errors[host] = self._errors.get(host, 0) + 1
+            raise
+        finally:
+            with self._lock:
+                self._latencies.setdefault(host, deque(maxlen=LATENCY_WINDOW)).append((time.perf_counter() - start) * 1000)
+
+        if cache_ttl and response.status_code == 200:
+            with self._lock:
+                self._cache[key] = (response, time.time() + cache_ttl)
+        return response
+
+    def latency_stats(self):
+        """{host: (p50_ms, p95_ms, requests, errors)} over the recent requests to each host"""
+        with self._lock:
+            windows = {host: sorted(latencies) for host, latencies in self._latencies.items()}
+            errors = dict(self._errors)
+        return {
+            host: (window[len(window) // 2], window[min(len(window) - 1, int(len(window) * 0.95))], len(window), errors.get(host, 0))
+            for host, window in windows.items()
+        }
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_client():
+    """The process-wide HttpClient, so every caller shares one set of pools"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = HttpClient()
+        return _shared
+
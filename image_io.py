@@ -0,0 +1,68 @@
+import resource
+import sys
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+# Reduction factor -> OpenCV flag that decodes straight to the smaller size
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def buffer_view(uploaded_file):
+    """uint8 view over an upload's bytes without copying them"""
+    if hasattr(uploaded_file, "getbuffer"):
+        return np.frombuffer(uploaded_file.getbuffer(), dtype=np.uint8)
+    return np.frombuffer(memoryview(uploaded_file.read()), dtype=np.uint8)
+
+
+def image_size(uploaded_file):
+    """(width, height) read from the image header only"""
+    uploaded_file.seek(0)
+    with Image.open(uploaded_file) as img:
+        size = img.size
+    uploaded_file.seek(0)
+    return size
+
+
+def preview_reduction(width, max_width=800):
+    """Largest decode reduction that still leaves at least max_width pixels"""
+    factor = 1
+    for candidate in sorted(REDUCED_DECODE_FLAGS):
+        if width / candidate >= max_width:
+            factor = candidate
+    return factor
+
+
+def decode_image(data, reduction=1):
+    """Decode an encoded image buffer, optionally at 1/2, 1/4 or 1/8 resolution"""
+    img = cv2.imdecode(data, REDUCED_DECODE_FLAGS[reduction])
+    if img is None:
+        raise ValueError("Could not decode the uploaded image")
+    return img
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+if __name__ == "__main__":
+    # Report peak RSS for decoding one upload: python image_io.py scan.png
+    with open(sys.argv[1], "rb") as f:
+        from io import BytesIO
+        upload = BytesIO(f.read())
+    before = peak_rss_mb()
+    width, height = image_size(upload)
+    full = decode_image(buffer_view(upload))
+    preview = decode_image(buffer_view(upload), preview_reduction(width))
+    print(f"{width}x{height}: full {full.nbytes / 1e6:.1f} MB, preview {preview.shape[1]}x{preview.shape[0]}, "
+          f"peak RSS {before:.1f} -> {peak_rss_mb():.1f} MB")
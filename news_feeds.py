@@ -0,0 +1,234 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import feedparser
+import requests
+
+from http_client import shared_client
+
+
+FEED_TIMEOUT = 5.0
+FEED_TTL = 15 * 60
+# A feed whose last fetch failed is retried after this long instead of a full TTL
+FEED_RETRY_DELAY = 60
+MAX_ENTRIES = 20
+FEED_DB_PATH = "feeds.db"
+# Fetch latencies kept per feed for the status metrics
+LATENCY_WINDOW = 50
+
+
+# Stand-in for a first fetch that is still running
+PENDING_RECORD = {"entries": [], "fetched_at": None, "failed_at": None, "etag": None, "modified": None, "status": None,
+                  "error": "The feed did not respond in time", "latency_ms": None}
+
+
+def normalize_entries(parsed, limit=MAX_ENTRIES):
+    """Plain dicts with the fields the news cards show"""
+    return [
+        {
+            "title": entry.get("title", "No Title"),
+            "link": entry.get("link", "#"),
+            "description": entry.get("description", entry.get("summary", "No description available")),
+        }
+        for entry in parsed.entries[:limit]
+    ]
+
+
+class FeedStore:
+    """Normalized feed entries and their freshness metadata, persisted in SQLite"""
+
+    def __init__(self, db_path=FEED_DB_PATH):
+        self.db_path = db_path
+        conn = sqlite3.connect(db_path)
+        with conn:
+            # The table is only a cache: an older layout is dropped and refetched
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(feeds)")]
+            if columns and "failed_at" not in columns:
+                conn.execute("DROP TABLE feeds")
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS feeds (
+                url TEXT PRIMARY KEY,
+                language TEXT,
+                entries TEXT NOT NULL,
+                fetched_at REAL,
+                failed_at REAL,
+                etag TEXT,
+                modified TEXT,
+                status INTEGER,
+                error TEXT,
+                latency_ms REAL
+            )''')
+        conn.close()
+
+    def load(self, language=None):
+        """{url: record} for every stored feed, or only those of one language"""
+        conn = sqlite3.connect(self.db_path)
+        query = "SELECT url, language, entries, fetched_at, failed_at, etag, modified, status, error, latency_ms FROM feeds"
+        rows = conn.execute(query + " WHERE language = ?", (language,)).fetchall() if language else conn.execute(query).fetchall()
+        conn.close()
+        return {
+            url: {"language": lang, "entries": json.loads(entries), "fetched_at": fetched_at, "failed_at": failed_at, "etag": etag,
+                  "modified": modified, "status": status, "error": error, "latency_ms": latency_ms}
+            for url, lang, entries, fetched_at, failed_at, etag, modified, status, error, latency_ms in rows
+        }
+
+    def save(self, url, record):
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO feeds VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, record.get("language"), json.dumps(record["entries"], ensure_ascii=False), record["fetched_at"],
+                 record.get("failed_at"), record["etag"], record["modified"], record.get("status"), record.get("error"), record.get("latency_ms")),
+            )
+        conn.close()
+
+
+class FeedAggregator:
+    """Fetches RSS feeds concurrently and caches their parsed entries
+
+    Each feed is cached for ttl seconds. A stale feed is revalidated with
+    a conditional GET (ETag / Last-Modified), so an unchanged feed costs
+    one 304 and no parsing. A feed that fails or times out keeps serving
+    its last good entries and is retried after retry_delay. fetched_at is
+    the time of the last successful fetch, failed_at that of the last failure.
+    """
+
+    def __init__(self, ttl=FEED_TTL, timeout=FEED_TIMEOUT, max_workers=8, session=None, store=None, languages=None,
+                 retry_delay=FEED_RETRY_DELAY):
+        self.ttl = ttl
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.session = session or shared_client()
+        self.store = store
+        # url -> language, recorded with each stored feed
+        self.languages = languages or {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="feeds")
+        # Entries survive restarts when a store is given
+        self._cache = store.load() if store else {}
+        self._latencies = {}
+        # Feeds with a fetch queued or running, so none is fetched twice at once
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def cached(self, url):
+        """Cache record for a feed: entries, fetched_at, failed_at, etag, modified, error"""
+        with self._lock:
+            return self._cache.get(url)
+
+    def is_fresh(self, url):
+        """True when the feed needs no fetch yet: fetched within ttl, or failed within retry_delay"""
+        record = self.cached(url)
+        if record is None:
+            return False
+        now = time.time()
+        if record["failed_at"] and record["failed_at"] > (record["fetched_at"] or 0):
+            return now - record["failed_at"] < self.retry_delay
+        return record["fetched_at"] is not None and now - record["fetched_at"] < self.ttl
+
+    def fetch(self, url):
+        """Fetch one feed now, revalidating against what is cached"""
+        previous = self.cached(url) or {"entries": [], "fetched_at": None, "failed_at": None, "etag": None, "modified": None}
+        headers = {}
+        if previous["etag"]:
+            headers["If-None-Match"] = previous["etag"]
+        if previous["modified"]:
+            headers["If-Modified-Since"] = previous["modified"]
+
+        record = dict(previous, error=None, language=self.languages.get(url))
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code != 304:
+                response.raise_for_status()
+                record["entries"] = normalize_entries(feedparser.parse(response.content))
+                record["etag"] = response.headers.get("ETag")
+                record["modified"] = response.headers.get("Last-Modified")
+            record["status"] = response.status_code
+            record["fetched_at"] = time.time()
+        except (requests.RequestException, ValueError) as e:
+            record["error"] = str(e)
+            record["status"] = None
+            record["failed_at"] = time.time()
+        record["latency_ms"] = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._cache[url] = record
+            self._latencies.setdefault(url, deque(maxlen=LATENCY_WINDOW)).append(record["latency_ms"])
+        if self.store:
+            self.store.save(url, record)
+        return record
+
+    def refresh(self, urls, force=False):
+        """Fetch every stale feed in parallel; returns once all finish or the timeout passes"""
+        stale = [url for url in urls if force or not self.is_fresh(url)]
+        with self._lock:
+            stale = [url for url in stale if url not in self._in_flight]
+            self._in_flight.update(stale)
+        futures = [self._pool.submit(self._fetch_tracked, url) for url in stale]
+        # Requests time out on their own; this bounds the total wait for slow bodies
+        wait(futures, timeout=self.timeout * 2)
+
+    def _fetch_tracked(self, url):
+        try:
+            return self.fetch(url)
+        finally:
+            with self._lock:
+                self._in_flight.discard(url)
+
+    def get(self, urls):
+        """{url: cache record} for the given feeds, fetching stale ones concurrently first
+
+        A feed never fetched before that misses the wait gets an empty
+        record with an error, so callers can always read "entries".
+        """
+        self.refresh(urls)
+        return {url: self.cached(url) or dict(PENDING_RECORD, language=self.languages.get(url)) for url in urls}
+
+    def latency_stats(self):
+        """{url: (last_ms, p50_ms, p95_ms, samples)} over the recent fetches of each feed"""
+        with self._lock:
+            windows = {url: (latencies[-1], sorted(latencies)) for url, latencies in self._latencies.items()}
+        return {
+            url: (last, window[len(window) // 2], window[min(len(window) - 1, int(len(window) * 0.95))], len(window))
+            for url, (last, window) in windows.items()
+        }
+
+
+class FeedRefresher:
+    """Keeps an aggregator's feeds fresh from a background thread
+
+    read() never touches the network: it returns whatever is cached, stale
+    or not, and wakes the thread to revalidate anything past its TTL
+    (stale-while-revalidate).
+    """
+
+    def __init__(self, aggregator, feeds_by_language, interval=None):
+        self.aggregator = aggregator
+        self.urls = [url for urls in feeds_by_language.values() for url in urls]
+        aggregator.languages.update({url: language for language, urls in feeds_by_language.items() for url in urls})
+        self.interval = interval or aggregator.ttl
+        self.last_run = None
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="feed-refresher")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            self.aggregator.refresh(self.urls)
+            self.last_run = time.time()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def read(self, urls):
+        """{url: record or None} from memory; stale feeds are refreshed in the background"""
+        records = {url: self.aggregator.cached(url) for url in urls}
+        if any(record is None or not self.aggregator.is_fresh(url) for url, record in records.items()):
+            self._wake.set()
+        return records
+
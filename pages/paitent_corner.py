@@ -1,24 +1,48 @@
 import streamlit as st
-import requests
 import pandas as pd
-import feedparser
-from bs4 import BeautifulSoup
-import base64
 import time
 from streamlit_lottie import st_lottie
 import json
+from news_feeds import FeedAggregator, FeedRefresher, FeedStore
+from assets import AssetManager
+from http_client import shared_client
+from tpa_directory import TpaScraper
+from hospital_directory import load_directory
+from static_assets import stylesheet_tag
+from semantic_index import MIN_BOOK_SCORE, MODEL_ERRORS, shared_semantic_index
+
+# Animations and icons are served from memory, backed by the local asset_cache directory
+@st.cache_resource
+def asset_manager():
+    return AssetManager()
 
 # Function to load and display Lottie animations
 def load_lottieurl(url):
-    r = requests.get(url)
-    if r.status_code != 200:
-        return None
-    return r.json()
+    return asset_manager().lottie(url)
+
+# Load several animations; on a cold cache the missing ones download in parallel
+def load_lottieurls(*urls):
+    return asset_manager().lottie_many(urls)
 
 # Function to get base64 encoded image
 def get_base64_from_url(url):
-    response = requests.get(url)
-    return base64.b64encode(response.content).decode("utf-8")
+    return asset_manager().base64(url)
+
+# One background refresher per server process; feeds persist in feeds.db across restarts
+@st.cache_resource
+def feed_refresher():
+    feeds_by_language = {language: [feed["url"] for feed in feeds] for language, feeds in news_feeds.items()}
+    return FeedRefresher(FeedAggregator(store=FeedStore()), feeds_by_language).start()
+
+# The IRDAI TPA list is scraped in the background and stored in tpa.db
+@st.cache_resource
+def tpa_scraper():
+    return TpaScraper().start()
+
+# Hospitals are loaded from data/hospitals.json and indexed once per server process
+@st.cache_resource
+def hospital_directory():
+    return load_directory()
 
 # Set page config with a favicon
 st.set_page_config(
@@ -29,182 +53,17 @@ st.set_page_config(
 )
 
 # Add custom CSS for animations and styling
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Roboto:wght@300;400;700&display=swap');
-    
-    html, body, [class*="css"] {
-        font-family: 'Roboto', sans-serif;
-    }
-    
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 10px;
-    }
-    
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        white-space: pre-wrap;
-        background-color: #f0f2f6;
-        border-radius: 6px 6px 0px 0px;
-        gap: 1px;
-        padding-top: 10px;
-        padding-bottom: 10px;
-    }
-    
-    .stTabs [aria-selected="true"] {
-        background-color: #4285F4;
-        color: white;
-    }
-    
-    .card {
-        border-radius: 10px;
-        padding: 20px;
-        box-shadow: 0 6px 10px rgba(0,0,0,0.08);
-        transition: all 0.3s ease;
-        margin-bottom: 20px;
-        background-color: white;
-    }
-    
-    .card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 10px 20px rgba(0,0,0,0.12);
-    }
-    
-    .hospital-card {
-        border-left: 5px solid #4285F4;
-    }
-    
-    .news-card {
-        border-left: 5px solid #0F9D58;
-    }
-    
-    .book-card {
-        border-left: 5px solid #F4B400;
-    }
-    
-    .button-container {
-        display: flex;
-        flex-wrap: wrap;
-        gap: 10px;
-        margin: 20px 0;
-    }
-    
-    .custom-button {
-        padding: 12px 24px;
-        border-radius: 8px;
-        background-color: #4285F4;
-        color: white;
-        text-align: center;
-        transition: all 0.3s ease;
-        cursor: pointer;
-        border: none;
-        font-weight: 500;
-        width: calc(33.33% - 10px);
-        min-width: 200px;
-    }
-    
-    .custom-button:hover {
-        background-color: #3367D6;
-        transform: translateY(-2px);
-    }
-    
-    .sidebar-icon {
-        margin-right: 10px;
-        vertical-align: middle;
-    }
-    
-    .fade-in {
-        animation: fadeIn 1s ease-in;
-    }
-    
-    @keyframes fadeIn {
-        0% { opacity: 0; }
-        100% { opacity: 1; }
-    }
-    
-    .slide-in {
-        animation: slideIn 0.5s ease-out;
-    }
-    
-    @keyframes slideIn {
-        0% { transform: translateX(-20px); opacity: 0; }
-        100% { transform: translateX(0); opacity: 1; }
-    }
-    
-    .pulse {
-        animation: pulse 2s infinite;
-    }
-    
-    @keyframes pulse {
-        0% { transform: scale(1); }
-        50% { transform: scale(1.05); }
-        100% { transform: scale(1); }
-    }
-    
-    .symptom-tag {
-        display: inline-block;
-        background-color: #f1f3f4;
-        padding: 5px 10px;
-        border-radius: 20px;
-        margin-right: 5px;
-        margin-bottom: 5px;
-        font-size: 0.9em;
-        border: 1px solid #dadce0;
-    }
-    
-    .header-container {
-        display: flex;
-        align-items: center;
-        padding: 10px;
-        background-color: #f0f8ff;
-        border-radius: 10px;
-        margin-bottom: 20px;
-    }
-    
-    .logo-container {
-        margin-right: 20px;
-    }
-    
-    .header-text {
-        flex-grow: 1;
-    }
-    
-    .specialty-tag {
-        display: inline-block;
-        background-color: #e6f2ff;
-        padding: 5px 10px;
-        border-radius: 20px;
-        margin-right: 5px;
-        margin-bottom: 5px;
-        font-size: 0.9em;
-        border: 1px solid #b8daff;
-    }
-    
-    /* Custom loader */
-    .loader {
-        border: 4px solid #f3f3f3;
-        border-top: 4px solid #3498db;
-        border-radius: 50%;
-        width: 30px;
-        height: 30px;
-        animation: spin 2s linear infinite;
-        margin: 20px auto;
-    }
-    
-    @keyframes spin {
-        0% { transform: rotate(0deg); }
-        100% { transform: rotate(360deg); }
-    }
-</style>
-""", unsafe_allow_html=True)
+st.markdown(stylesheet_tag("patient_corner"), unsafe_allow_html=True)
 
 # Load animations
-lottie_medical = load_lottieurl("https://assets3.lottiefiles.com/packages/lf20_5njp3vgg.json")
-lottie_games = load_lottieurl("https://assets1.lottiefiles.com/packages/lf20_xedpyc2z.json")
-lottie_news = load_lottieurl("https://assets3.lottiefiles.com/packages/lf20_qp1q7mct.json")
-lottie_books = load_lottieurl("https://assets9.lottiefiles.com/packages/lf20_v7KhZ2.json")
-lottie_hospital = load_lottieurl("https://assets3.lottiefiles.com/packages/lf20_q4h7dqj6.json")
-lottie_brain = load_lottieurl("https://assets5.lottiefiles.com/packages/lf20_hgxntv6m.json")
+lottie_medical, lottie_games, lottie_news, lottie_books, lottie_hospital, lottie_brain = load_lottieurls(
+    "https://assets3.lottiefiles.com/packages/lf20_5njp3vgg.json",
+    "https://assets1.lottiefiles.com/packages/lf20_xedpyc2z.json",
+    "https://assets3.lottiefiles.com/packages/lf20_qp1q7mct.json",
+    "https://assets9.lottiefiles.com/packages/lf20_v7KhZ2.json",
+    "https://assets3.lottiefiles.com/packages/lf20_q4h7dqj6.json",
+    "https://assets5.lottiefiles.com/packages/lf20_hgxntv6m.json",
+)
 
 # Define logos
 logos = {
@@ -286,520 +145,9 @@ news_feeds = {
     ]
 }
 
-# Define hospital data
-hospitals = [
-    
-    {
-        "name": "All India Institute of Medical Sciences (AIIMS)",
-        "city": "New Delhi",
-        "state": "Delhi",
-        "division": "North",
-        "address": "Sri Aurobindo Marg, Ansari Nagar, New Delhi, Delhi 110029",
-        "phone": "011-2658 8500",
-        "specialties": ["Neurology", "Oncology", "Cardiology"],
-        "website": "https://www.aiims.edu"
-    },
-    {
-        "name": "Tata Memorial Hospital",
-        "city": "Mumbai",
-        "state": "Maharashtra",
-        "division": "West",
-        "address": "Dr. E Borges Road, Parel, Mumbai, Maharashtra 400012",
-        "phone": "022-2417 7000",
-        "specialties": ["Cancer Treatment", "Neurosurgery", "Research"],
-        "website": "https://tmc.gov.in"
-    },
-    {
-        "name": "Apollo Hospitals",
-        "city": "Chennai",
-        "state": "Tamil Nadu",
-        "division": "South",
-        "address": "21, Greams Lane, Off Greams Road, Chennai, Tamil Nadu 600006",
-        "phone": "044-2829 3333",
-        "specialties": ["Neurosurgery", "Oncology", "Cardiology"],
-        "website": "https://www.apollohospitals.com"
-    },
-    {
-        "name": "Fortis Memorial Research Institute",
-        "city": "Gurugram",
-        "state": "Haryana",
-        "division": "North",
-        "address": "Sector 44, Opposite HUDA City Centre, Gurugram, Haryana 122002",
-        "phone": "0124-4921 000",
-        "specialties": ["Neuroscience", "Cancer Care", "Cardiac Sciences"],
-        "website": "https://www.fortishealthcare.com"
-    },
-    {
-        "name": "Manipal Hospitals",
-        "city": "Bangalore",
-        "state": "Karnataka",
-        "division": "South",
-        "address": "98, HAL Old Airport Road, Bangalore, Karnataka 560017",
-        "phone": "080-2502 4444",
-        "specialties": ["Neurology", "Oncology", "Multi-specialty"],
-        "website": "https://www.manipalhospitals.com"
-    },
-    {
-        "name": "Max Super Specialty Hospital",
-        "city": "Saket",
-        "state": "Delhi",
-        "division": "North",
-        "address": "Press Enclave Road, Saket, New Delhi, Delhi 110017",
-        "phone": "011-2651 5050",
-        "specialties": ["Cardiology", "Neuro Sciences", "Orthopaedics"],
-        "website": "https://www.maxhealthcare.in"
-    },
-    {
-        "name": "Medanta - The Medicity",
-        "city": "Gurugram",
-        "state": "Haryana",
-        "division": "North",
-        "address": "Sector 38, Gurgaon, Haryana 122001",
-        "phone": "0124-4141414",
-        "specialties": ["Cardiology", "Neurosurgery", "Kidney Transplant"],
-        "website": "https://www.medanta.org"
-    },
-    {
-        "name": "CK Birla Hospital",
-        "city": "Gurugram",
-        "state": "Haryana",
-        "division": "North",
-        "address": "Near Huda City Centre, Sector 51, Gurugram, Haryana 122018",
-        "phone": "0124-4606600",
-        "specialties": ["Obstetrics", "Gynaecology", "Paediatrics"],
-        "website": "https://www.ckbhospital.com"
-    },
-    {
-        "name": "Kokilaben Dhirubhai Ambani Hospital",
-        "city": "Mumbai",
-        "state": "Maharashtra",
-        "division": "West",
-        "address": "Four Bungalows, Andheri West, Mumbai, Maharashtra 400053",
-        "phone": "022-4269 6969",
-        "specialties": ["Cancer Care", "Cardiology", "Neurosurgery"],
-        "website": "https://www.kokilabenhospital.com"
-    },
-    {
-        "name": "Christian Medical College",
-        "city": "Vellore",
-        "state": "Tamil Nadu",
-        "division": "South",
-        "address": "Ida Scudder Road, Vellore, Tamil Nadu 632004",
-        "phone": "0416-2281000",
-        "specialties": ["Cancer Treatment", "Cardiology", "Orthopaedics"],
-        "website": "https://www.cmch-vellore.edu"
-    },
-    
-    {
-        "name": "National Institute of Mental Health and Neurosciences (NIMHANS)",
-        "city": "Bangalore",
-        "state": "Karnataka",
-        "division": "South",
-        "address": "Hosur Road, Bangalore, Karnataka 560029",
-        "phone": "080-2699 5000",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Stereotactic Surgery", "Neuro-oncology"],
-        "website": "https://www.nimhans.ac.in"
-    },
-    {
-        "name": "Jaslok Hospital and Research Centre",
-        "city": "Mumbai",
-        "state": "Maharashtra",
-        "division": "West",
-        "address": "15, Dr. G Deshmukh Marg, Mumbai, Maharashtra 400026",
-        "phone": "022-6657 3333",
-        "specialties": ["Stereotactic Surgery", "Functional Neurosurgery", "Brain Tumor Surgery", "DBS Therapy"],
-        "website": "https://www.jaslokhospital.net"
-    },
-    {
-        "name": "Narayana Health (Narayana Hrudayalaya)",
-        "city": "Bangalore",
-        "state": "Karnataka",
-        "division": "South",
-        "address": "258/A, Bommasandra Industrial Area, Anekal Taluk, Bangalore, Karnataka 560099",
-        "phone": "080-7122 2200",
-        "specialties": ["Brain Tumor Surgery", "Stereotactic Radiosurgery", "Gamma Knife Surgery", "Neurorehabilitation"],
-        "website": "https://www.narayanahealth.org"
-    },
-    {
-        "name": "Aster Medcity",
-        "city": "Kochi",
-        "state": "Kerala",
-        "division": "South",
-        "address": "Kuttisahib Road, Near Kothad Bridge, South Chittoor, Cheranalloor, Kochi, Kerala 682027",
-        "phone": "0484-6699 999",
-        "specialties": ["Advanced Neurosurgery", "Brain Tumor Surgery", "Minimally Invasive Surgery", "Neuro-oncology"],
-        "website": "https://www.astermedcity.com"
-    },
-    {
-        "name": "Indraprastha Apollo Hospital",
-        "city": "New Delhi",
-        "state": "Delhi",
-        "division": "North",
-        "address": "Sarita Vihar, Delhi Mathura Road, New Delhi, Delhi 110076",
-        "phone": "011-7179 1090",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Spine Surgery", "Gamma Knife Radiosurgery"],
-        "website": "https://www.apollohospitals.com"
-    },
-    {
-        "name": "Fortis Flt. Lt. Rajan Dhall Hospital",
-        "city": "New Delhi",
-        "state": "Delhi",
-        "division": "North",
-        "address": "Sector B, Pocket A-1, Aruna Asaf Ali Marg, Vasant Kunj, New Delhi, Delhi 110070",
-        "phone": "011-4277 6222",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Minimally Invasive Neurosurgery", "Neuro-oncology"],
-        "website": "https://www.fortishealthcare.com"
-    },
-    {
-        "name": "Bombay Hospital and Medical Research Centre",
-        "city": "Mumbai",
-        "state": "Maharashtra",
-        "division": "West",
-        "address": "12, New Marine Lines, Mumbai, Maharashtra 400020",
-        "phone": "022-2206 7676",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Skull Base Surgery", "Pediatric Neurosurgery"],
-        "website": "https://www.bombayhospital.com"
-    },
-    {
-        "name": "Sir Ganga Ram Hospital",
-        "city": "New Delhi",
-        "state": "Delhi",
-        "division": "North",
-        "address": "Rajinder Nagar, New Delhi, Delhi 110060",
-        "phone": "011-2575 0000",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Stereotactic Surgery", "Neuro-critical Care"],
-        "website": "https://www.sgrh.com"
-    },
-    {
-        "name": "Ruby Hall Clinic",
-        "city": "Pune",
-        "state": "Maharashtra",
-        "division": "West",
-        "address": "40, Sassoon Road, Pune, Maharashtra 411001",
-        "phone": "020-2612 6700",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Endoscopic Surgery", "Neuro-rehabilitation"],
-        "website": "https://www.rubyhall.com"
-    },
-    {
-        "name": "Global Hospital",
-        "city": "Chennai",
-        "state": "Tamil Nadu",
-        "division": "South",
-        "address": "439, Cheran Nagar, Perumbakkam, Chennai, Tamil Nadu 600100",
-        "phone": "044-4444 1000",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Stereotactic Radiosurgery", "Multi-organ Transplant"],
-        "website": "https://www.globalhospitalsindia.com"
-    },
-    {
-        "name": "Institute of Neurosciences Kolkata",
-        "city": "Kolkata",
-        "state": "West Bengal",
-        "division": "East",
-        "address": "185, AJC Bose Road, Kolkata, West Bengal 700017",
-        "phone": "033-2287 2321",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Epilepsy Surgery", "Neuro-interventional Procedures"],
-        "website": "https://www.instituteofneurosciences.net"
-    },
-    {
-        "name": "Neurological Surgery Centre, King George Medical University",
-        "city": "Lucknow",
-        "state": "Uttar Pradesh",
-        "division": "North",
-        "address": "Chowk, Lucknow, Uttar Pradesh 226003",
-        "phone": "0522-2257540",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Pediatric Neurosurgery", "Neuro-trauma"],
-        "website": "https://www.kgmcindia.edu"
-    },
-    {
-        "name": "BGS Gleneagles Global Hospital",
-        "city": "Bangalore",
-        "state": "Karnataka",
-        "division": "South",
-        "address": "67, Uttarahalli Road, Kengeri, Bangalore, Karnataka 560060",
-        "phone": "080-6121 4444",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Robotic Surgery", "Minimally Invasive Procedures"],
-        "website": "https://www.bgsglobalhospitals.com"
-    },
-    
-   
-    {
-        "name": "P.D. Hinduja Hospital & Medical Research Centre",
-        "city": "Mumbai",
-        "state": "Maharashtra",
-        "division": "West",
-        "address": "Veer Savarkar Marg, Mahim, Mumbai, Maharashtra 400016",
-        "phone": "022-2444 9199",
-        "specialties": ["Neurosurgery", "Cerebrovascular Surgery", "Skull Base Surgery", "Gamma Knife Radiosurgery"],
-        "website": "https://www.hindujahospital.com"
-    },
-    {
-        "name": "Lilavati Hospital & Research Centre",
-        "city": "Mumbai",
-        "state": "Maharashtra",
-        "division": "West",
-        "address": "A-791, Bandra Reclamation, Bandra West, Mumbai, Maharashtra 400050",
-        "phone": "022-2675 1000",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Spine Surgery", "Neuro-critical Care"],
-        "website": "https://www.lilavatihospital.com"
-    },
-    {
-        "name": "Wockhardt Hospital",
-        "city": "Mumbai",
-        "state": "Maharashtra",
-        "division": "West",
-        "address": "1877, Dr Anand Rao Nair Road, Near Agripada Police Station, Mumbai Central, Mumbai, Maharashtra 400011",
-        "phone": "022-2659 9000",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Minimally Invasive Surgery", "Neuro-rehabilitation"],
-        "website": "https://www.wockhardthospitals.com"
-    },
-    {
-        "name": "Hiranandani Hospital",
-        "city": "Mumbai",
-        "state": "Maharashtra",
-        "division": "West",
-        "address": "Hillside Avenue, Hiranandani Gardens, Powai, Mumbai, Maharashtra 400076",
-        "phone": "022-2576 3300",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Endoscopic Surgery", "Pediatric Neurosurgery"],
-        "website": "https://www.hiranandanihospital.org"
-    },
-    {
-        "name": "Marengo CIMS Hospital",
-        "city": "Ahmedabad",
-        "state": "Gujarat",
-        "division": "West",
-        "address": "Nr. Shukan Mall, Off Science City Road, Sola, Ahmedabad, Gujarat 380060",
-        "phone": "079-3010 1010",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Stereotactic Surgery", "Neuro-oncology"],
-        "website": "https://www.cims.org"
-    },
-    {
-        "name": "Vikram Hospital",
-        "city": "Bangalore",
-        "state": "Karnataka",
-        "division": "South",
-        "address": "No.70/1, Millers Road, Vasanth Nagar, Bangalore, Karnataka 560052",
-        "phone": "080-2227 7979",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Functional Neurosurgery", "Neuro-interventional Procedures"],
-        "website": "https://www.vikramhospital.com"
-    },
-    {
-        "name": "Columbia Asia Hospital",
-        "city": "Bangalore",
-        "state": "Karnataka",
-        "division": "South",
-        "address": "Kirloskar Business Park, Bellary Road, Hebbal, Bangalore, Karnataka 560024",
-        "phone": "080-4962 8888",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Minimally Invasive Neurosurgery", "Neuro-critical Care"],
-        "website": "https://www.columbiaasia.com"
-    },
-    {
-        "name": "Sakra World Hospital",
-        "city": "Bangalore",
-        "state": "Karnataka",
-        "division": "South",
-        "address": "Sy No 52/2, Devarabeesanahalli, Varthur Hobli, Outer Ring Road, Bangalore, Karnataka 560103",
-        "phone": "080-4969 4969",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Robotic Surgery", "Stereotactic Radiosurgery"],
-        "website": "https://www.sakraworldhospital.com"
-    },
-    {
-        "name": "Fortis Hospital Bannerghatta Road",
-        "city": "Bangalore",
-        "state": "Karnataka",
-        "division": "South",
-        "address": "154/9, Opposite IIM-B, Bannerghatta Road, Bangalore, Karnataka 560076",
-        "phone": "080-6621 4444",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Spine Surgery", "Neuro-oncology"],
-        "website": "https://www.fortishealthcare.com"
-    },
-    {
-        "name": "Sterling Hospital",
-        "city": "Ahmedabad",
-        "state": "Gujarat",
-        "division": "West",
-        "address": "Off Gurukul Road, Behind Drive-in Cinema, Memnagar, Ahmedabad, Gujarat 380052",
-        "phone": "079-6677 0000",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Endovascular Surgery", "Neuro-rehabilitation"],
-        "website": "https://www.sterlinghospitals.com"
-    },
-    {
-        "name": "Shalby Hospital",
-        "city": "Ahmedabad",
-        "state": "Gujarat",
-        "division": "West",
-        "address": "SG Highway, Near Kiran Motors, Gota, Ahmedabad, Gujarat 382481",
-        "phone": "079-4040 4040",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Minimally Invasive Surgery", "Neuro-critical Care"],
-        "website": "https://www.shalbyhospitals.org"
-    },
-    {
-        "name": "Yashoda Hospitals",
-        "city": "Hyderabad",
-        "state": "Telangana",
-        "division": "South",
-        "address": "Behind Hari Hara Kala Bhavan, S.P. Road, Secunderabad, Telangana 500003",
-        "phone": "040-2378 5678",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Stereotactic Surgery", "Pediatric Neurosurgery"],
-        "website": "https://www.yashodahospitals.com"
-    },
-    {
-        "name": "KIMS Hospital",
-        "city": "Hyderabad",
-        "state": "Telangana",
-        "division": "South",
-        "address": "1-8-31/1, Minister Rd, Krishna Nagar Colony, Begumpet, Hyderabad, Telangana 500003",
-        "phone": "040-4488 5000",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Gamma Knife Surgery", "Neuro-interventional Procedures"],
-        "website": "https://www.kimshospitals.com"
-    },
-    {
-        "name": "Continental Hospitals",
-        "city": "Hyderabad",
-        "state": "Telangana",
-        "division": "South",
-        "address": "IT Park Rd, Nanakram Guda, Gachibowli, Hyderabad, Telangana 500032",
-        "phone": "040-6737 0000",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Robotic Surgery", "Advanced Neuro-oncology"],
-        "website": "https://www.continentalhospitals.com"
-    },
-    {
-        "name": "Apollo Hospitals Jubilee Hills",
-        "city": "Hyderabad",
-        "state": "Telangana",
-        "division": "South",
-        "address": "Road No. 72, Opp. Bharatiya Vidya Bhavan, Film Nagar, Jubilee Hills, Hyderabad, Telangana 500033",
-        "phone": "040-2360 7777",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Stereotactic Radiosurgery", "Functional Neurosurgery"],
-        "website": "https://www.apollohospitals.com"
-    },
-    {
-        "name": "Breach Candy Hospital Trust",
-        "city": "Mumbai",
-        "state": "Maharashtra",
-        "division": "West",
-        "address": "60-A, Bhulabhai Desai Road, Breach Candy, Mumbai, Maharashtra 400026",
-        "phone": "022-2367 8888",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Skull Base Surgery", "Neuro-critical Care"],
-        "website": "https://www.breachcandyhospital.org"
-    },
-    {
-        "name": "Artemis Hospital",
-        "city": "Gurugram",
-        "state": "Haryana",
-        "division": "North",
-        "address": "Sector 51, Golf Course Extension Road, Gurugram, Haryana 122001",
-        "phone": "0124-451 1111",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Minimally Invasive Surgery", "Neuro-rehabilitation"],
-        "website": "https://www.artemishospital.com"
-    },
-    {
-        "name": "Paras Hospital",
-        "city": "Gurugram",
-        "state": "Haryana",
-        "division": "North",
-        "address": "C-1, Sushant Lok Phase-I, Sector-43, Gurugram, Haryana 122002",
-        "phone": "0124-458 5858",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Stereotactic Surgery", "Pediatric Neurosurgery"],
-        "website": "https://www.parashospitals.com"
-    },
-    {
-        "name": "BLK Super Speciality Hospital",
-        "city": "New Delhi",
-        "state": "Delhi",
-        "division": "North",
-        "address": "Pusa Road, Rajinder Nagar, New Delhi, Delhi 110005",
-        "phone": "011-3040 3040",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Gamma Knife Surgery", "Neuro-interventional Procedures"],
-        "website": "https://www.blkhospital.com"
-    },
-    {
-        "name": "Venkateshwar Hospital",
-        "city": "New Delhi",
-        "state": "Delhi",
-        "division": "North",
-        "address": "Sector 18A, Dwarka, New Delhi, Delhi 110075",
-        "phone": "011-4040 4040",
-        "specialties": ["Neurosurgery", "Brain Tumor Surgery", "Endoscopic Surgery", "Neuro-critical Care"],
-        "website": "https://www.venkateshwarhospital.com"
-    }
-]
-
-# Define books data
-
-books = [
-    {
-        "title": "Orientation to Caregiving  ",
-        "author": "MPH1 Michael Rabow, Susan Folkman",
-        "description": "Comprehensive guide covering brain tumor basics, treatment options, and care strategies.",
-        "link": "https://braintumorcenter.ucsf.edu/sites/default/files/2022-04/3rd%20EditionCaregiver.pdf",
-        "language": "English",
-        "cover": "https://cdn-icons-png.flaticon.com/512/3997/3997873.png"
-    },
-    {
-        "title": "Understanding Brain Tumors",
-        "author": "National Cancer Institute",
-        "description": "Patient guide to brain tumor diagnosis, treatment, and recovery.",
-        "link": "https://www.cancer.gov/types/brain",
-        "language": "English",
-        "cover": "https://cdn-icons-png.flaticon.com/512/3997/3997714.png"
-    },
-    {
-        "title": "Brain Tumor Handbook",
-        "author": "American Brain Tumor Association",
-        "description": "Educational resource for patients and families dealing with brain tumors.",
-        "link": "https://www.abta.org/about-brain-tumors/brain-tumor-education/",
-        "language": "English",
-        "cover": "https://cdn-icons-png.flaticon.com/512/3376/3376599.png"
-    },
-    {
-        "title": "मस्तिष्क ट्यूमरच्या उपचारांचा मार्गदर्शक",
-        "author": "भारत सरकार",
-        "description": "मस्तिष्क ट्यूमर आणि उपचारावरील मार्गदर्शन.",
-        "link": "https://www.healzone.co.in/blog-details/brain-tumor-treatment-in-india-a-comprehensive-guide",
-        "language": "Marathi",
-        "cover": "https://cdn-icons-png.flaticon.com/512/3997/3997757.png"
-    },
-    {
-        "title": "मस्तिष्क कर्करोगासंबंधी माहिती",
-        "author": "मनोविकार संस्था",
-        "description": "मस्तिष्क कर्करोगावर संशोधन आणि त्याचे उपचार.",
-        "link": "hhttps://marathivishwakosh.org/4221/",
-        "language": "Marathi",
-        "cover": "https://cdn-icons-png.flaticon.com/512/3997/3997809.png"
-    },
-    {
-        "title": "ब्रेन ट्यूमरच्या लक्षणांची ओळख",
-        "author": "आंतरराष्ट्रीय कर्करोग संस्था",
-        "description": "ब्रेन ट्यूमरच्या लक्षणांची आणि त्यांच्या उपचारांची माहिती.",
-        "link": "https://my.clevelandclinic.org/health/diseases/6149-brain-cancer-brain-tumor",
-        "language": "Marathi",
-        "cover": "https://cdn-icons-png.flaticon.com/512/3997/3997794.png"
-    },
-    {
-        "title": "ब्रेन ट्यूमर: लक्षण और उपचार",
-        "author": "आयुष मंत्रालय",
-        "description": "ब्रेन ट्यूमर की पहचान और उपचार के तरीके.",
-        "link": "https://www.mayoclinic.org/diseases-conditions/brain-tumor/symptoms-causes/syc-20350084",
-        "language": "Hindi",
-        "cover": "https://cdn-icons-png.flaticon.com/512/3997/3997801.png"
-    },
-    {
-        "title": "ब्रेन ट्यूमर का गाइड",
-        "author": "नेशनल कैंसर संस्थान",
-        "description": "ब्रेन ट्यूमर के लक्षण, निदान और उपचार की जानकारी.",
-        "link": "https://www.maxhealthcare.in/blogs/hi/brain-tumors-symptoms-and-types",
-        "language": "Hindi",
-        "cover": "https://cdn-icons-png.flaticon.com/512/3376/3376589.png"
-    },
-    {
-        "title": "ब्रेन ट्यूमर: उपचार और देखभाल",
-        "author": "आधिकारिक चिकित्सा पद्धति",
-        "description": "ब्रेन ट्यूमर के उपचार और देखभाल से संबंधित महत्वपूर्ण जानकारी.",
-        "link": "https://www.radiologyinfo.org/en/info/thera-brain",
-        "language": "Hindi",
-        "cover": "https://cdn-icons-png.flaticon.com/512/3997/3997838.png"
-    }
-]
+# Books are listed in data/books.json
+with open("data/books.json", encoding="utf-8") as f:
+    books = json.load(f)
 
 # Define brain tumor symptoms for animated display
 brain_tumor_symptoms = [
@@ -888,44 +236,34 @@ elif selected_option == "Policies":
     # Policy section with animated loading
     with st.container():
         st.markdown('<div class="card">', unsafe_allow_html=True)
-        with st.spinner("Fetching the latest policies..."):
-            try:
-                response = requests.get("https://irdai.gov.in/list-of-tpas")
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                policies = soup.find_all('table')
-                if policies:
-                    data = []
-                    for row in policies[0].find_all('tr'):
-                        cols = row.find_all('td')
-                        if cols:
-                            data.append([col.get_text(strip=True) for col in cols])
-                    
-                    if data:
-                        st.success("Policies loaded successfully!")
-                        df = pd.DataFrame(data[1:], columns=data[0])
-                        st.dataframe(df, use_container_width=True)
-                    else:
-                        st.warning("No data found in the table.")
-                else:
-                    st.warning("No policies found on the website.")
-            except Exception as e:
-                st.error(f"Error fetching policies: {e}")
-                
-                # Provide sample data in case of error
-                st.markdown("""
-                ### Sample Policy Information
-                
-                Here are some common insurance policies for healthcare:
-                
-                1. Health Insurance
-                2. Critical Illness Cover
-                3. Hospital Cash Benefits
-                4. Accident Insurance
-                5. Senior Citizen Health Insurance
-                
-                Please check the official IRDAI website for actual policy details.
-                """)
+        df, tpa_meta = tpa_scraper().table()
+        if df is not None:
+            st.dataframe(df, use_container_width=True)
+            refreshed = f"Last refreshed {time.strftime('%d %b %Y %H:%M', time.localtime(tpa_meta['fetched_at']))}"
+            if tpa_meta["changed_at"]:
+                refreshed += f", list last changed {time.strftime('%d %b %Y', time.localtime(tpa_meta['changed_at']))}"
+            st.caption(refreshed)
+            if tpa_meta["error"]:
+                st.warning(f"The latest refresh failed, showing the stored list: {tpa_meta['error']}")
+        elif tpa_meta["fetched_at"] is None:
+            st.info("Fetching the latest policies from IRDAI... reload the page in a few seconds.")
+        else:
+            st.error(f"Error fetching policies: {tpa_meta['error']}")
+            
+            # Provide sample data in case of error
+            st.markdown("""
+            ### Sample Policy Information
+            
+            Here are some common insurance policies for healthcare:
+            
+            1. Health Insurance
+            2. Critical Illness Cover
+            3. Hospital Cash Benefits
+            4. Accident Insurance
+            5. Senior Citizen Health Insurance
+            
+            Please check the official IRDAI website for actual policy details.
+            """)
         st.markdown('</div>', unsafe_allow_html=True)
 
 elif selected_option == "News":
@@ -945,14 +283,12 @@ elif selected_option == "News":
         value="English"
     )
     
-    # Progress bar for loading effect
-    progress_bar = st.progress(0)
-    for i in range(100):
-        time.sleep(0.01)
-        progress_bar.progress(i + 1)
-    st.success("News loaded successfully!")
-    
     if language in news_feeds:
+        # Read from memory only; stale feeds are revalidated by the background refresher
+        refresher = feed_refresher()
+        feed_urls = [feed["url"] for feed in news_feeds[language]]
+        feed_results = refresher.read(feed_urls)
+        
         sources = [feed["name"] for feed in news_feeds[language]]
         tabs = st.tabs(sources)
         
@@ -965,28 +301,31 @@ elif selected_option == "News":
                 </div>
                 """, unsafe_allow_html=True)
                 
-                try:
-                    feed = feedparser.parse(feed_info["url"])
-                    if feed.entries:
-                        for entry in feed.entries[:5]:
-                            title = entry.get('title', 'No Title')
-                            link = entry.get('link', '#')
-                            description = entry.get('description', 
-                                                 entry.get('summary', 'No description available'))
-                            
-                            st.markdown(f"""
-                                <div class="card news-card fade-in">
-                                    <h4><a href='{link}' target='_blank'>{title}</a></h4>
-                                    <p>{description}</p>
-                                    <div style="text-align: right">
-                                        <a href="{link}" target="_blank" style="text-decoration: none; color: #4285F4;">Read More →</a>
-                                    </div>
+                feed = feed_results[feed_info["url"]]
+                if feed is None:
+                    st.info(f"Fetching news from {feed_info['name']}; it will appear in a few seconds.")
+                    continue
+                if feed["fetched_at"] is not None:
+                    st.caption(f"Updated {int((time.time() - feed['fetched_at']) // 60)} min ago")
+                if feed["entries"]:
+                    for entry in feed["entries"][:5]:
+                        title = entry['title']
+                        link = entry['link']
+                        description = entry['description']
+                        
+                        st.markdown(f"""
+                            <div class="card news-card fade-in">
+                                <h4><a href='{link}' target='_blank'>{title}</a></h4>
+                                <p>{description}</p>
+                                <div style="text-align: right">
+                                    <a href="{link}" target="_blank" style="text-decoration: none; color: #4285F4;">Read More →</a>
                                 </div>
-                            """, unsafe_allow_html=True)
-                    else:
-                        st.warning(f"No news articles found from {feed_info['name']}")
-                except Exception as e:
-                    st.error(f"Error fetching news from {feed_info['name']}: {str(e)}")
+                            </div>
+                        """, unsafe_allow_html=True)
+                elif not feed["error"]:
+                    st.warning(f"No news articles found from {feed_info['name']}")
+                else:
+                    st.error(f"Error fetching news from {feed_info['name']}: {feed['error']}")
                     # Show sample news in case of error
                     st.markdown(f"""
                         <div class="card news-card fade-in">
@@ -1005,6 +344,25 @@ elif selected_option == "News":
                             </div>
                         </div>
                     """, unsafe_allow_html=True)
+        
+        # Fetch latency per feed, measured by the refresher
+        latency_stats = refresher.aggregator.latency_stats()
+        with st.expander("Feed status"):
+            for feed_info in news_feeds[language]:
+                stats = latency_stats.get(feed_info["url"])
+                if stats:
+                    last_ms, p50_ms, p95_ms, samples = stats
+                    st.write(f"**{feed_info['name']}:** last {last_ms:.0f} ms, p50 {p50_ms:.0f} ms, p95 {p95_ms:.0f} ms over {samples} fetches")
+                else:
+                    st.write(f"**{feed_info['name']}:** not fetched since the server started")
+            st.caption("Outbound requests by host")
+            st.dataframe(
+                pd.DataFrame(
+                    [(host, p50_ms, p95_ms, count, errors) for host, (p50_ms, p95_ms, count, errors) in shared_client().latency_stats().items()],
+                    columns=["Host", "p50 ms", "p95 ms", "Requests", "Errors"],
+                ),
+                use_container_width=True,
+            )
 
 elif selected_option == "Books":
     # Header with animation
@@ -1020,10 +378,27 @@ elif selected_option == "Books":
     language_options = ["All", "English", "Marathi", "Hindi"]
     selected_language = st.select_slider("Filter by Language:", options=language_options, value="All")
     
+    book_query = st.text_input("Search books by topic:", placeholder="e.g. caring for a family member after surgery")
+    
     # Filter books
     filtered_books = books
+    if book_query:
+        # Semantic book search, shared with the chatbot; None until the index is built, and the model loads on the first search
+        index = shared_semantic_index()
+        hits = None
+        if index:
+            try:
+                hits = index.search(book_query, k=len(books), source="books", min_score=MIN_BOOK_SCORE)
+            except MODEL_ERRORS:
+                hits = None
+        if hits is not None:
+            # Closest descriptions first, whatever language they are written in
+            filtered_books = [books[document["key"]] for document, _ in hits]
+        else:
+            words = book_query.lower().split()
+            filtered_books = [book for book in books if all(word in (book["title"] + " " + book["description"]).lower() for word in words)]
     if selected_language != "All":
-        filtered_books = [book for book in books if book["language"] == selected_language]
+        filtered_books = [book for book in filtered_books if book["language"] == selected_language]
     
     # Display books in an attractive card layout
     cols = st.columns(3)
@@ -1161,30 +536,61 @@ elif selected_option == "Brain Tumor Symptoms & Remedies":
 elif selected_option == "Hospitals":
     st.header("Hospitals Directory")
     
+    directory = hospital_directory()
+    
     # Add filtering options
     st.subheader("Filter Hospitals")
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     
     with col1:
         # Filter by division
-        all_divisions = list(set(hospital["division"] for hospital in hospitals))
-        selected_division = st.selectbox("Select Division:", ["All"] + all_divisions)
+        selected_division = st.selectbox("Select Division:", ["All"] + directory.divisions)
     
     with col2:
         # Filter by state
-        all_states = list(set(hospital["state"] for hospital in hospitals))
-        selected_state = st.selectbox("Select State:", ["All"] + all_states)
-
+        selected_state = st.selectbox("Select State:", ["All"] + directory.states)
+    
+    with col3:
+        # Filter by specialty
+        selected_specialty = st.selectbox("Select Specialty:", ["All"] + directory.specialties)
+    
+    search_query = st.text_input("Search by hospital name or city:", placeholder="e.g. apollo, mum")
+    
+    # Optional ranking by distance from the user's location
+    with st.expander("Sort by distance from my location"):
+        sort_by_distance = st.checkbox("Show nearest hospitals first")
+        col1, col2 = st.columns(2)
+        with col1:
+            user_lat = st.number_input("Latitude", min_value=-90.0, max_value=90.0, value=19.0760, format="%.4f")
+        with col2:
+            user_lon = st.number_input("Longitude", min_value=-180.0, max_value=180.0, value=72.8777, format="%.4f")
+        nearest_count = st.slider("Hospitals to show", min_value=5, max_value=50, value=10, step=5)
+    
     # Filter hospitals based on selection
-    filtered_hospitals = hospitals
-    if selected_division != "All":
-        filtered_hospitals = [h for h in filtered_hospitals if h["division"] == selected_division]
-    if selected_state != "All":
-        filtered_hospitals = [h for h in filtered_hospitals if h["state"] == selected_state]
+    filtered_ids = directory.filter(
+        state=selected_state if selected_state != "All" else None,
+        division=selected_division if selected_division != "All" else None,
+        specialty=selected_specialty if selected_specialty != "All" else None,
+        query=search_query,
+    )
+    if sort_by_distance:
+        # A limit lets large result sets be ranked from the spatial grid, nearest cells first
+        ranked = directory.nearest(user_lat, user_lon, filtered_ids, limit=nearest_count)
+        st.caption(f"Nearest {len(ranked)} of {len(filtered_ids)} matching hospitals")
+    else:
+        ranked = [(i, None) for i in filtered_ids]
+        st.caption(f"{len(ranked)} of {len(directory.hospitals)} hospitals")
+    
+    if not ranked:
+        st.info("No hospitals match these filters.")
 
     # Display hospitals
-    for hospital in filtered_hospitals:
-        with st.expander(f"{hospital['name']} - {hospital['city']}"):
+    for hospital_id, distance_km in ranked:
+        hospital = directory.hospitals[hospital_id]
+        label = f"{hospital['name']} - {hospital['city']}"
+        if distance_km is not None:
+            label += f" ({distance_km:.0f} km)"
+        with st.expander(label):
             col1, col2 = st.columns([2, 1])
             
             with col1:
@@ -0,0 +1,60 @@
+import time
+
+import cv2
+import numpy as np
+
+
+BOX_COLOR = (0, 255, 0)
+LABEL_COLOR = (255, 255, 255)
+
+
+def draw_detections(img, boxes, class_names=None):
+    """Draw every box and its label onto a single copy of the image"""
+    annotated = img.copy()
+    for box in boxes:
+        x1, y1, x2, y2 = int(box["x1"]), int(box["y1"]), int(box["x2"]), int(box["y2"])
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), BOX_COLOR, 2)
+
+        name = class_names.get(int(box["class_id"]), "tumor") if class_names else "tumor"
+        label = f"{name} {box['confidence']:.2f} | Area: {box['area']:.1f}"
+        cv2.putText(annotated, label, (x1, max(y1 - 10, 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, LABEL_COLOR, 2)
+    return annotated
+
+
+class RenderedImage:
+    """Annotated image that encodes to each format at most once"""
+
+    __slots__ = ("image", "timings", "_encoded")
+
+    def __init__(self, image, timings=None):
+        self.image = image
+        self.timings = timings if timings is not None else {}
+        self._encoded = {}
+
+    @classmethod
+    def from_encoded(cls, data, ext=".png", timings=None):
+        """Rebuild a result from stored bytes, keeping them as the cached encoding"""
+        rendered = cls(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR), timings)
+        rendered._encoded[ext] = data
+        return rendered
+
+    def encode(self, ext=".png"):
+        """Encoded bytes for the given extension, cached after the first call"""
+        data = self._encoded.get(ext)
+        if data is None:
+            start = time.perf_counter()
+            ok, buffer = cv2.imencode(ext, self.image)
+            if not ok:
+                raise ValueError(f"Could not encode image as {ext}")
+            data = buffer.tobytes()
+            self._encoded[ext] = data
+            self.timings[f"encode {ext.lstrip('.')}"] = time.perf_counter() - start
+        return data
+
+    @property
+    def png(self):
+        return self.encode(".png")
+
+    @property
+    def jpeg(self):
+        return self.encode(".jpg")
@@ -0,0 +1,200 @@
+import argparse
+import base64
+import glob
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from database import connect
+from dedup import collect_garbage
+
+
+ARCHIVE_DIR = "archive"
+ARCHIVE_PATTERN = "detections-{month}.jsonl.gz"
+
+
+def incremental_vacuum_enabled(conn):
+    return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def enable_incremental_vacuum(conn):
+    """Switch an existing database to incremental auto-vacuum
+
+    Needs one full, blocking VACUUM, so it runs from the command line
+    (`python retention.py enable-incremental-vacuum`), never from the app.
+    Returns True when the database was converted.
+    """
+    if incremental_vacuum_enabled(conn):
+        return False
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+def compact(conn, pages_per_step=500, pause=0.05):
+    """Return free pages to the OS a few hundred at a time so the app is never blocked for long"""
+    freed = 0
+    while True:
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free_pages:
+            return freed
+        # executescript steps the pragma to completion; execute() would free a single page
+        conn.executescript(f"PRAGMA incremental_vacuum({pages_per_step})")
+        freed += min(free_pages, pages_per_step)
+        time.sleep(pause)
+
+
+def _encode_value(value):
+    if isinstance(value, bytes):
+        return {"__b64__": base64.b64encode(value).decode("ascii")}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and "__b64__" in value:
+        return base64.b64decode(value["__b64__"])
+    return value
+
+
+def archive_path(month, archive_dir=ARCHIVE_DIR):
+    return os.path.join(archive_dir, ARCHIVE_PATTERN.format(month=month))
+
+
+def _retention_condition(max_age_days, max_rows):
+    conditions, params = [], []
+    if max_age_days is not None:
+        conditions.append("detection_time < ?")
+        params.append(datetime.now() - timedelta(days=max_age_days))
+    if max_rows is not None:
+        # Everything not among the newest max_rows records
+        conditions.append("detection_time <= (SELECT detection_time FROM detections ORDER BY detection_time DESC LIMIT 1 OFFSET ?)")
+        params.append(max_rows)
+    return " OR ".join(conditions), params
+
+
+def archive_detections(max_age_days=None, max_rows=None, archive_dir=ARCHIVE_DIR, chunk_size=500, db_path=None):
+    """Move detections outside the retention policy into per-month compressed archives
+
+    Rows are written (and fsynced) to the archive before they are deleted,
+    so a crash can at worst leave a row in both places; read_archive
+    drops such duplicates by id.
+    """
+    if max_age_days is None and max_rows is None:
+        return 0
+    condition, params = _retention_condition(max_age_days, max_rows)
+    os.makedirs(archive_dir, exist_ok=True)
+    conn = connect(db_path)
+    archived = 0
+
+    while True:
+        # Archives are self-contained: shared images are copied into every record that uses them
+        cursor = conn.execute(f'''
+        SELECT *, (SELECT data FROM images WHERE hash = detections.image_hash) AS stored_image
+        FROM detections WHERE {condition} ORDER BY id LIMIT ?
+        ''', params + [chunk_size])
+        columns = [column[0] for column in cursor.description]
+        rows = cursor.fetchall()
+        if not rows:
+            break
+
+        by_month = {}
+        for row in rows:
+            record = dict(zip(columns, row))
+            stored_image = record.pop("stored_image")
+            if record["processed_image"] is None:
+                record["processed_image"] = stored_image
+            month = str(record.get("detection_time") or "unknown")[:7]
+            by_month.setdefault(month, []).append(record)
+
+        # Appending opens a new gzip member; readers see the members as one stream
+        for month, records in by_month.items():
+            with open(archive_path(month, archive_dir), "ab") as raw, gzip.GzipFile(fileobj=raw, mode="ab") as archive:
+                for record in records:
+                    line = json.dumps({key: _encode_value(value) for key, value in record.items()}, default=str)
+                    archive.write(line.encode("utf-8") + b"\n")
+                archive.flush()
+                raw.flush()
+                os.fsync(raw.fileno())
+
+        ids = [row[columns.index("id")] for row in rows]
+        with conn:
+            conn.executemany("DELETE FROM detections WHERE id = ?", ((record_id,) for record_id in ids))
+        archived += len(rows)
+
+    conn.close()
+    return archived
+
+
+def list_archives(archive_dir=ARCHIVE_DIR):
+    """Months that have an archive file, oldest first"""
+    prefix, suffix = ARCHIVE_PATTERN.split("{month}")
+    paths = sorted(glob.glob(os.path.join(archive_dir, ARCHIVE_PATTERN.format(month="*"))))
+    return [os.path.basename(path)[len(prefix):-len(suffix)] for path in paths]
+
+
+def read_archive(month, archive_dir=ARCHIVE_DIR):
+    """Yield archived detection records for a month as dicts, BLOBs restored to bytes"""
+    seen = set()
+    with gzip.open(archive_path(month, archive_dir), "rt", encoding="utf-8") as archive:
+        for line in archive:
+            record = {key: _decode_value(value) for key, value in json.loads(line).items()}
+            if record["id"] in seen:
+                continue
+            seen.add(record["id"])
+            yield record
+
+
+def run_retention(max_age_days=None, max_rows=None, archive_dir=ARCHIVE_DIR, db_path=None):
+    """Archive out-of-policy rows, then compact the freed pages incrementally
+
+    Returns (archived, freed pages). freed is None when the database is not
+    yet in incremental auto-vacuum mode; SQLite still reuses the free pages.
+    """
+    archived = archive_detections(max_age_days, max_rows, archive_dir, db_path=db_path)
+    conn = connect(db_path)
+    with conn:
+        collect_garbage(conn)
+    freed = compact(conn) if incremental_vacuum_enabled(conn) else None
+    conn.close()
+    return archived, freed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detection retention, archival and compaction")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run = subparsers.add_parser("run", help="Archive old detections and compact the database")
+    run.add_argument("--max-age-days", type=int)
+    run.add_argument("--max-rows", type=int)
+    run.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    run.add_argument("--db")
+    read = subparsers.add_parser("read", help="Print records from a monthly archive")
+    read.add_argument("month", help="YYYY-MM")
+    read.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    subparsers.add_parser("list", help="List archived months").add_argument("--archive-dir", default=ARCHIVE_DIR)
+    subparsers.add_parser("enable-incremental-vacuum",
+                          help="One-time full VACUUM so later runs can compact incrementally (stop the app first)").add_argument("--db")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        archived, freed = run_retention(args.max_age_days, args.max_rows, args.archive_dir, args.db)
+        if freed is None:
+            print(f"Archived {archived} detections; run `python retention.py enable-incremental-vacuum` once to compact")
+        else:
+            print(f"Archived {archived} detections, freed {freed} pages")
+    elif args.command == "enable-incremental-vacuum":
+        conn = connect(args.db)
+        converted = enable_incremental_vacuum(conn)
+        conn.close()
+        print("Converted to incremental auto-vacuum" if converted else "Already using incremental auto-vacuum")
+    elif args.command == "read":
+        for record in read_archive(args.month, args.archive_dir):
+            summary = {key: (f"<{len(value)} bytes>" if isinstance(value, bytes) else value) for key, value in record.items()}
+            print(json.dumps(summary, default=str))
+    else:
+        print("\n".join(list_archives(args.archive_dir)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import re
+
+
+# External-content FTS5 index over the searchable text of each detection.
+# Triggers keep it in sync with every insert, update and delete on detections.
+SEARCH_SCHEMA = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS detections_fts USING fts5(
+    patient_name, severity, recommendation, report_text,
+    content='detections', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS detections_fts_insert AFTER INSERT ON detections BEGIN
+    INSERT INTO detections_fts (rowid, patient_name, severity, recommendation, report_text)
+    VALUES (new.id, new.patient_name, new.severity, new.recommendation, new.report_text);
+END;
+CREATE TRIGGER IF NOT EXISTS detections_fts_delete AFTER DELETE ON detections BEGIN
+    INSERT INTO detections_fts (detections_fts, rowid, patient_name, severity, recommendation, report_text)
+    VALUES ('delete', old.id, old.patient_name, old.severity, old.recommendation, old.report_text);
+END;
+CREATE TRIGGER IF NOT EXISTS detections_fts_update
+AFTER UPDATE OF patient_name, severity, recommendation, report_text ON detections BEGIN
+    INSERT INTO detections_fts (detections_fts, rowid, patient_name, severity, recommendation, report_text)
+    VALUES ('delete', old.id, old.patient_name, old.severity, old.recommendation, old.report_text);
+    INSERT INTO detections_fts (rowid, patient_name, severity, recommendation, report_text)
+    VALUES (new.id, new.patient_name, new.severity, new.recommendation, new.report_text);
+END;
+'''
+
+# Search box filters: age>60, age<=30, severity:high, name:pat
+FILTER_PATTERN = re.compile(r"^(age)(>=|<=|>|<|=)(\d+)$|^(severity|name|recommendation|report):(.+)$", re.IGNORECASE)
+FILTER_COLUMNS = {"severity": "severity", "name": "patient_name", "recommendation": "recommendation", "report": "report_text"}
+
+# Above this many matches bm25 ranking is skipped: every hit would have to be scored,
+# and for broad terms ("high", "follow-up") relevance barely separates them anyway
+RANK_CUTOFF = 2000
+
+
+def create_search_index(conn):
+    """Create the FTS index and its triggers, backfilling existing rows the first time"""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'detections_fts'").fetchone()
+    conn.executescript(SEARCH_SCHEMA)
+    if not exists:
+        conn.execute("INSERT INTO detections_fts (detections_fts) VALUES ('rebuild')")
+
+
+def _fts_term(word, prefix=False):
+    # Quote each word so FTS syntax characters are matched literally
+    if word.endswith("*"):
+        word, prefix = word.rstrip("*"), True
+    return '"' + word.replace('"', '""') + '"' + ("*" if prefix else "")
+
+
+def parse_search_query(text):
+    """Split a search box string into an FTS5 MATCH expression and SQL age filters"""
+    terms = []
+    age_filters = []
+    for token in text.split():
+        match = FILTER_PATTERN.match(token)
+        if match and match.group(1):
+            age_filters.append((match.group(2), int(match.group(3))))
+        elif match:
+            column = FILTER_COLUMNS[match.group(4).lower()]
+            # name:pat finds any name with a word starting with "pat"
+            terms.append(f"{column} : {_fts_term(match.group(5), prefix=column == 'patient_name')}")
+        else:
+            word = token.strip()
+            if word:
+                terms.append(_fts_term(word))
+    return " AND ".join(terms), age_filters
+
+
+def _match_count_below(conn, match_expression, limit):
+    # Probing for the limit-th hit walks at most `limit` doclist entries
+    return conn.execute(
+        "SELECT rowid FROM detections_fts WHERE detections_fts MATCH ? LIMIT 1 OFFSET ?",
+        (match_expression, limit),
+    ).fetchone() is None
+
+
+def search_detections(conn, text, page=0, page_size=20):
+    """One page of detections matching the search, ranked by relevance
+
+    Very broad searches are returned newest first instead. Returns
+    (rows, has_more); rows hold id, patient_name, patient_age, severity,
+    detection_time and a highlighted snippet.
+    """
+    match_expression, age_filters = parse_search_query(text)
+    conditions, params = [], []
+    if match_expression:
+        conditions.append("detections_fts MATCH ?")
+        params.append(match_expression)
+    for operator, value in age_filters:
+        conditions.append(f"d.patient_age {operator} ?")
+        params.append(value)
+    if not conditions:
+        return [], False
+
+    if match_expression and _match_count_below(conn, match_expression, RANK_CUTOFF):
+        query = f'''
+        SELECT d.id, d.patient_name, d.patient_age, d.severity, d.detection_time,
+               snippet(detections_fts, -1, '**', '**', '…', 12)
+        FROM detections_fts JOIN detections d ON d.id = detections_fts.rowid
+        WHERE {" AND ".join(conditions)}
+        ORDER BY bm25(detections_fts) LIMIT ? OFFSET ?
+        '''
+    elif match_expression:
+        # Broad match: stream the FTS doclist newest-first and stop at the page boundary
+        query = f'''
+        SELECT d.id, d.patient_name, d.patient_age, d.severity, d.detection_time,
+               snippet(detections_fts, -1, '**', '**', '…', 12)
+        FROM detections_fts JOIN detections d ON d.id = detections_fts.rowid
+        WHERE {" AND ".join(conditions)}
+        ORDER BY detections_fts.rowid DESC LIMIT ? OFFSET ?
+        '''
+    else:
+        # Filter-only searches have nothing to rank; newest first
+        query = f'''
+        SELECT d.id, d.patient_name, d.patient_age, d.severity, d.detection_time, d.recommendation
+        FROM detections d WHERE {" AND ".join(conditions)}
+        ORDER BY d.id DESC LIMIT ? OFFSET ?
+        '''
+    # Fetch one extra row to know whether another page exists without counting every match
+    rows = conn.execute(query, params + [page_size + 1, page * page_size]).fetchall()
+    return rows[:page_size], len(rows) > page_size
@@ -0,0 +1,271 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+
+SEMANTIC_INDEX_DIR = "semantic_index"
+MANIFEST = "manifest.json"
+# Small multilingual model (384 dimensions) so Hindi and Marathi book descriptions
+# share a space with English questions; runs on CPU
+EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+EMBED_BATCH_SIZE = 64
+# Cosine similarity below which a chatbot match is treated as no answer
+MIN_ANSWER_SCORE = 0.45
+# Books below this similarity are left out of topic search results
+MIN_BOOK_SCORE = 0.3
+# Rows converted to float32 at a time when scoring the float16 matrix
+SCORE_CHUNK_ROWS = 8192
+# Raised when the model can't be loaded: sentence-transformers missing, or the
+# model not in the local Hugging Face cache with no network to download it
+MODEL_ERRORS = (ImportError, OSError)
+# After a failed model load, queries fail fast for this long before trying again
+MODEL_RETRY_DELAY = 5 * 60
+# How often a missing or out-of-date index is looked for again
+INDEX_RECHECK_INTERVAL = 60
+# Matrices up to this size get a float32 working copy on the first query:
+# float16 -> float32 conversion costs about ten times the matrix-vector product
+SCORING_COPY_BYTES = 256 * 1024 * 1024
+
+CORPUS_FILES = {
+    "chatbot": "data/chatbot_answers.json",
+    "faq": "data/faq.json",
+    "books": "data/books.json",
+}
+
+
+def load_corpus(files=CORPUS_FILES):
+    """Documents to embed: chatbot answers, FAQ entries and book descriptions"""
+    documents = []
+    with open(files["chatbot"], encoding="utf-8") as f:
+        for answer in json.load(f):
+            documents.append({"source": "chatbot", "key": answer["id"], "title": answer["title"],
+                              "text": answer["title"] + ". " + answer["text"], "answer": answer["text"]})
+    with open(files["faq"], encoding="utf-8") as f:
+        for i, faq in enumerate(json.load(f)):
+            documents.append({"source": "faq", "key": i, "title": faq["question"], "text": faq["question"] + " " + faq["answer"],
+                              "answer": faq["answer"]})
+    with open(files["books"], encoding="utf-8") as f:
+        for i, book in enumerate(json.load(f)):
+            documents.append({"source": "books", "key": i, "title": book["title"].strip(),
+                              "text": f"{book['title'].strip()}. {book['description']}", "answer": book["description"],
+                              "language": book["language"]})
+    return documents
+
+
+def corpus_hash(documents, model_name):
+    payload = json.dumps([model_name, documents], sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def load_model(model_name=EMBEDDING_MODEL):
+    # Imported here: the package (and torch) is only needed once a semantic query is made
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name, device="cpu")
+
+
+def build_semantic_index(documents, index_dir=SEMANTIC_INDEX_DIR, model=None, model_name=EMBEDDING_MODEL):
+    """Batch-embed documents into a unit-length float16 matrix written as embeddings.npy"""
+    model = model or load_model(model_name)
+    embeddings = model.encode([document["text"] for document in documents], batch_size=EMBED_BATCH_SIZE,
+                              normalize_embeddings=True, convert_to_numpy=True)
+    parent = os.path.dirname(os.path.abspath(index_dir))
+    os.makedirs(parent, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(dir=parent)
+    np.save(os.path.join(temp_dir, "embeddings.npy"), embeddings.astype(np.float16))
+    with open(os.path.join(temp_dir, "documents.json"), "w", encoding="utf-8") as f:
+        json.dump(documents, f, ensure_ascii=False)
+    with open(os.path.join(temp_dir, MANIFEST), "w") as f:
+        json.dump({"model": model_name, "dimensions": int(embeddings.shape[1]), "documents": len(documents),
+                   "corpus_hash": corpus_hash(documents, model_name)}, f)
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.replace(temp_dir, index_dir)
+    return model
+
+
+def top_k_cosine(embeddings, query, k, rows=None):
+    """(indices, scores) of the k rows most similar to a unit-length query, best first
+
+    A float16 memory map is scored in float32 chunks, so no full-size copy
+    is made. rows restricts scoring to those indices.
+    """
+    query = np.asarray(query, dtype=np.float32)
+    if rows is not None:
+        rows = np.asarray(rows, dtype=np.int64)
+        scores = np.asarray(embeddings[rows], dtype=np.float32) @ query
+    else:
+        scores = np.empty(len(embeddings), dtype=np.float32)
+        for start in range(0, len(embeddings), SCORE_CHUNK_ROWS):
+            chunk = embeddings[start:start + SCORE_CHUNK_ROWS]
+            scores[start:start + len(chunk)] = np.asarray(chunk, dtype=np.float32) @ query
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.int64), scores[:0]
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best], kind="stable")]
+    return (rows[best] if rows is not None else best), scores[best]
+
+
+class SemanticIndex:
+    """Embedded documents memory-mapped from disk; the model loads on the first query"""
+
+    def __init__(self, index_dir=SEMANTIC_INDEX_DIR, model=None):
+        with open(os.path.join(index_dir, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        with open(os.path.join(index_dir, "documents.json"), encoding="utf-8") as f:
+            self.documents = json.load(f)
+        self.embeddings = np.load(os.path.join(index_dir, "embeddings.npy"), mmap_mode="r")
+        self._scoring = None
+        self._model = model
+        self._model_error = None
+        self._model_lock = threading.Lock()
+        self._rows_by_source = {}
+        for row, document in enumerate(self.documents):
+            self._rows_by_source.setdefault(document["source"], []).append(row)
+
+    @property
+    def model(self):
+        with self._model_lock:
+            if self._model is None:
+                if self._model_error and time.time() - self._model_error[1] < MODEL_RETRY_DELAY:
+                    raise self._model_error[0].with_traceback(None)
+                try:
+                    self._model = load_model(self.manifest["model"])
+                except MODEL_ERRORS as e:
+                    self._model_error = (e, time.time())
+                    raise
+            return self._model
+
+    def scoring_matrix(self):
+        """float32 copy of the embeddings when it fits SCORING_COPY_BYTES, else the float16 memory map"""
+        if self._scoring is None:
+            if self.embeddings.size * 4 <= SCORING_COPY_BYTES:
+                self._scoring = np.asarray(self.embeddings, dtype=np.float32)
+            else:
+                self._scoring = self.embeddings
+        return self._scoring
+
+    def embed(self, text):
+        return self.model.encode([text], normalize_embeddings=True, convert_to_numpy=True)[0]
+
+    def search(self, query, k=5, source=None, min_score=None):
+        """[(document, cosine score)] best first, optionally from one source only"""
+        rows = self._rows_by_source.get(source, []) if source else None
+        if rows is not None and not rows:
+            return []
+        indices, scores = top_k_cosine(self.scoring_matrix(), self.embed(query), k, rows)
+        return [(self.documents[i], float(score)) for i, score in zip(indices, scores)
+                if min_score is None or score >= min_score]
+
+
+def load_or_build_semantic_index(index_dir=SEMANTIC_INDEX_DIR, model_name=EMBEDDING_MODEL):
+    """The index for the current corpus files, embedding them first when they changed"""
+    documents = load_corpus()
+    try:
+        with open(os.path.join(index_dir, MANIFEST)) as f:
+            current = json.load(f)["corpus_hash"] == corpus_hash(documents, model_name)
+    except (FileNotFoundError, ValueError, KeyError):
+        current = False
+    model = None
+    if not current:
+        model = build_semantic_index(documents, index_dir, model_name=model_name)
+    return SemanticIndex(index_dir, model)
+
+
+def load_semantic_index(index_dir=SEMANTIC_INDEX_DIR, model_name=EMBEDDING_MODEL):
+    """The index built for the current corpus files, or None when it is missing or out of date
+
+    Never embeds anything: the index is built ahead of time with
+    `python semantic_index.py build`.
+    """
+    try:
+        with open(os.path.join(index_dir, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if manifest.get("corpus_hash") != corpus_hash(load_corpus(), model_name):
+        return None
+    return SemanticIndex(index_dir)
+
+
+_shared = None
+_shared_checked_at = None
+_shared_lock = threading.Lock()
+
+
+def shared_semantic_index():
+    """The process-wide index, so every page shares one model; None until a current index has been built"""
+    global _shared, _shared_checked_at
+    with _shared_lock:
+        if _shared is None and (_shared_checked_at is None or time.time() - _shared_checked_at >= INDEX_RECHECK_INTERVAL):
+            _shared = load_semantic_index()
+            _shared_checked_at = time.time()
+        return _shared
+
+
+def benchmark(rows=10000, dimensions=384, queries=200):
+    """Time top-k search over a synthetic float16 memory map, plus query embedding when the model is installed"""
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((rows, dimensions)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    path = os.path.join(tempfile.mkdtemp(), "embeddings.npy")
+    np.save(path, embeddings.astype(np.float16))
+    mapped = np.load(path, mmap_mode="r")
+
+    targets = rng.integers(0, rows, queries)
+    start = time.perf_counter()
+    scoring = np.asarray(mapped, dtype=np.float32)
+    print(f"{rows:,} x {dimensions} float16 memmap ({mapped.nbytes / 1e6:.1f} MB), "
+          f"float32 working copy made in {(time.perf_counter() - start) * 1000:.1f} ms")
+    for label, matrix in (("chunked from the memmap", mapped), ("working copy", scoring)):
+        timings = []
+        for target in targets:
+            query = embeddings[target] + rng.standard_normal(dimensions).astype(np.float32) * 0.01
+            start = time.perf_counter()
+            indices, _ = top_k_cosine(matrix, query / np.linalg.norm(query), 5)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert indices[0] == target
+        timings.sort()
+        print(f"top-5 search, {label}: p50 {timings[len(timings) // 2]:.2f} ms, p95 {timings[int(len(timings) * 0.95)]:.2f} ms")
+
+    try:
+        model = load_model()
+    except ImportError:
+        print("sentence-transformers is not installed; skipping query embedding timings")
+        return
+    model.encode(["warm up"], normalize_embeddings=True)
+    timings = []
+    for question in ["what are the warning signs", "how do doctors find a tumour", "किताबें ब्रेन ट्यूमर देखभाल"] * 20:
+        start = time.perf_counter()
+        model.encode([question], normalize_embeddings=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"query embedding ({EMBEDDING_MODEL}): p50 {timings[len(timings) // 2]:.1f} ms, p95 {timings[int(len(timings) * 0.95)]:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline semantic index over FAQ, chatbot answers and books")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("build", help="Embed the corpus files into the index directory (run at deploy time)")
+    query = subparsers.add_parser("query", help="Show the closest documents for a question")
+    query.add_argument("question")
+    query.add_argument("--source", choices=sorted(CORPUS_FILES))
+    bench = subparsers.add_parser("benchmark", help="Time vectorized top-k search")
+    bench.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_semantic_index(load_corpus())
+        print(f"Embedded {len(load_corpus())} documents into {SEMANTIC_INDEX_DIR}/")
+    elif args.command == "query":
+        for document, score in load_or_build_semantic_index().search(args.question, source=args.source):
+            print(f"{score:.3f}  [{document['source']}] {document['title']}")
+    else:
+        benchmark(args.rows)
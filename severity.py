@@ -0,0 +1,124 @@
+import argparse
+import sqlite3
+import struct
+import time
+
+import numpy as np
+
+from detection_results import boxes_from_row
+
+
+# Upper bounds (percent of brain area occupied by tumor) for each severity level.
+# Anything at or above the last bound is High Severity.
+SEVERITY_THRESHOLDS = (1.0, 5.0)
+SEVERITY_LABELS = ("Low Severity", "Moderate Severity", "High Severity")
+SEVERITY_RECOMMENDATIONS = (
+    "Regular follow-up recommended in 6 months",
+    "Follow-up within 3 months recommended",
+    "Immediate medical consultation advised",
+)
+
+
+def tumor_percentages(boxes_per_scan, brain_areas):
+    """Percentage of brain area covered by tumor boxes, for many scans at once"""
+    counts = np.fromiter((len(boxes) for boxes in boxes_per_scan), dtype=np.int64, count=len(boxes_per_scan))
+    if counts.sum():
+        areas = np.concatenate([boxes["area"] for boxes in boxes_per_scan if len(boxes)]).astype(np.float64)
+    else:
+        areas = np.zeros(0, dtype=np.float64)
+    scan_index = np.repeat(np.arange(len(counts)), counts)
+    total_areas = np.bincount(scan_index, weights=areas, minlength=len(counts))
+    brain_areas = np.asarray(brain_areas, dtype=np.float64)
+    return np.divide(total_areas * 100, brain_areas, out=np.zeros_like(total_areas), where=brain_areas > 0)
+
+
+def severity_levels(percentages, thresholds=SEVERITY_THRESHOLDS):
+    """Map tumor percentages onto severity level indices (0 = low)"""
+    return np.searchsorted(np.asarray(thresholds, dtype=np.float64), percentages, side="right")
+
+
+def assess_severity_batch(boxes_per_scan, brain_areas, thresholds=SEVERITY_THRESHOLDS):
+    """Assess severity for many scans in one vectorized pass"""
+    levels = severity_levels(tumor_percentages(boxes_per_scan, brain_areas), thresholds)
+    labels = np.asarray(SEVERITY_LABELS, dtype=object)[levels]
+    recommendations = np.asarray(SEVERITY_RECOMMENDATIONS, dtype=object)[levels]
+    return labels.tolist(), recommendations.tolist()
+
+
+def png_pixel_count(header):
+    """Read width x height from the first 24 bytes of a PNG without decoding it"""
+    if not header or len(header) < 24 or header[:8] != b"\x89PNG\r\n\x1a\n":
+        return None
+    width, height = struct.unpack(">II", header[16:24])
+    return width * height
+
+
+def rescore_detections(db_path="tumor_detection.db", thresholds=SEVERITY_THRESHOLDS, chunk_size=10000):
+    """Recompute severity and recommendation for every stored detection, chunk by chunk
+
+    Rows whose brain area is neither stored nor recoverable from the PNG
+    header are left untouched. Returns (updated, skipped).
+    """
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    last_id = 0
+    updated = 0
+    skipped = 0
+
+    while True:
+        # Only the PNG header is read from the stored image, never the full BLOB
+        rows = cursor.execute('''
+        SELECT id, tumor_boxes, tumor_lengths, brain_area,
+               ifnull(substr(processed_image, 1, 24), (SELECT substr(data, 1, 24) FROM images WHERE hash = image_hash))
+        FROM detections WHERE id > ? ORDER BY id LIMIT ?
+        ''', (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+
+        last_id = rows[-1][0]
+        brain_areas = [row[3] if row[3] else png_pixel_count(row[4]) for row in rows]
+        # Without a brain area the tumor percentage would read as 0% and the row as Low Severity
+        scored = [(row, brain_area) for row, brain_area in zip(rows, brain_areas) if brain_area]
+        skipped += len(rows) - len(scored)
+        if not scored:
+            continue
+
+        ids = [row[0] for row, _ in scored]
+        boxes_per_scan = [boxes_from_row(row[1], row[2]) for row, _ in scored]
+        brain_areas = [brain_area for _, brain_area in scored]
+        labels, recommendations = assess_severity_batch(boxes_per_scan, brain_areas, thresholds)
+
+        cursor.executemany(
+            "UPDATE detections SET severity = ?, recommendation = ?, brain_area = ? WHERE id = ?",
+            zip(labels, recommendations, brain_areas, ids),
+        )
+        conn.commit()
+        updated += len(ids)
+
+    conn.close()
+    return updated, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tumor severity maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rescore = subparsers.add_parser("rescore", help="Recompute severity for all historical detections")
+    rescore.add_argument("--db", default="tumor_detection.db")
+    rescore.add_argument("--thresholds", default=",".join(str(t) for t in SEVERITY_THRESHOLDS),
+                         help="Comma-separated percentage bounds between severity levels")
+    rescore.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    thresholds = tuple(float(t) for t in args.thresholds.split(","))
+    if len(thresholds) != len(SEVERITY_LABELS) - 1:
+        parser.error(f"expected {len(SEVERITY_LABELS) - 1} thresholds")
+
+    start = time.perf_counter()
+    updated, skipped = rescore_detections(args.db, thresholds, args.chunk_size)
+    print(f"Re-scored {updated} detections in {time.perf_counter() - start:.2f}s")
+    if skipped:
+        print(f"Skipped {skipped} detections with no stored brain area and no readable PNG header")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from database import connect
+
+
+SNAPSHOT_DIR = "snapshots"
+MANIFEST = "manifest.json"
+
+# Every detection column except processed_image; low-cardinality labels are dictionary-encoded
+SNAPSHOT_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("patient_id", pa.int64()),
+    ("patient_name", pa.string()),
+    ("patient_age", pa.int32()),
+    ("patient_gender", pa.dictionary(pa.int8(), pa.string())),
+    ("tumor_count", pa.int32()),
+    ("tumor_boxes", pa.binary()),
+    ("brain_area", pa.int64()),
+    ("detection_time", pa.timestamp("us")),
+    ("severity", pa.dictionary(pa.int8(), pa.string())),
+    ("recommendation", pa.string()),
+    ("report_text", pa.string()),
+])
+
+# Rows with no detection_time land in this partition
+UNKNOWN_MONTH = "unknown"
+# `export --every` default; readers treat snapshots older than twice this as stale
+EXPORT_INTERVAL = 300
+
+
+def partition_path(month, snapshot_dir=SNAPSHOT_DIR):
+    return os.path.join(snapshot_dir, f"month={month}", "part.arrow")
+
+
+def read_manifest(snapshot_dir=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"exported_at": None, "partitions": {}}
+
+
+def snapshot_is_current(manifest, max_age=2 * EXPORT_INTERVAL, now=None):
+    """True when the manifest's export is recent enough to stand in for the live database"""
+    if not manifest["exported_at"]:
+        return False
+    age = ((now or datetime.now()) - datetime.fromisoformat(manifest["exported_at"])).total_seconds()
+    return 0 <= age <= max_age
+
+
+def _month_signatures(conn):
+    # count and max(id) catch inserts and deletes; the id-weighted checksum over
+    # severity, tumor count and brain area catches in-place updates such as a rescore
+    rows = conn.execute('''
+    SELECT ifnull(substr(detection_time, 1, 7), ?), COUNT(*), MAX(id),
+           SUM((id % 65536) * (ifnull(unicode(severity), 0) + 256 * ifnull(tumor_count, 0)) + ifnull(brain_area, 0) % 65536)
+    FROM detections GROUP BY 1
+    ''', (UNKNOWN_MONTH,)).fetchall()
+    return {month: [count, max_id, checksum] for month, count, max_id, checksum in rows}
+
+
+def _month_table(conn, month, chunk_size=50000):
+    columns = SNAPSHOT_SCHEMA.names
+    if month == UNKNOWN_MONTH:
+        cursor = conn.execute(f"SELECT {', '.join(columns)} FROM detections WHERE detection_time IS NULL ORDER BY id")
+    else:
+        # Range bounds keep the scan on idx_detections_time
+        cursor = conn.execute(
+            f"SELECT {', '.join(columns)} FROM detections WHERE detection_time >= ? AND detection_time < ? ORDER BY id",
+            (month, month + "\uffff"),
+        )
+    batches = []
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        values = list(zip(*rows))
+        arrays = [pa.array(values[i], type=pa.string() if field.type == pa.timestamp("us") else field.type).cast(field.type)
+                  for i, field in enumerate(SNAPSHOT_SCHEMA)]
+        batches.append(pa.RecordBatch.from_arrays(arrays, schema=SNAPSHOT_SCHEMA))
+    return pa.Table.from_batches(batches, schema=SNAPSHOT_SCHEMA)
+
+
+def write_partition(table, path):
+    """Write an uncompressed Arrow IPC file atomically so readers can memory-map it"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with pa.OSFile(temp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(temp_path, path)
+
+
+def export_snapshot(snapshot_dir=SNAPSHOT_DIR, db_path=None):
+    """Bring the monthly Arrow partitions up to date with the database
+
+    Only months whose signature changed are rewritten.
+    Returns the list of months written.
+    """
+    manifest = read_manifest(snapshot_dir)
+    conn = connect(db_path)
+    signatures = _month_signatures(conn)
+
+    written = []
+    for month, signature in sorted(signatures.items()):
+        if manifest["partitions"].get(month) == signature and os.path.exists(partition_path(month, snapshot_dir)):
+            continue
+        write_partition(_month_table(conn, month), partition_path(month, snapshot_dir))
+        written.append(month)
+    conn.close()
+
+    # Months that were archived or cleared out of the database
+    for month in set(manifest["partitions"]) - set(signatures):
+        shutil.rmtree(os.path.dirname(partition_path(month, snapshot_dir)), ignore_errors=True)
+
+    manifest = {"exported_at": datetime.now().isoformat(timespec="seconds"), "partitions": signatures}
+    temp_path = os.path.join(snapshot_dir, MANIFEST + ".tmp")
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with open(temp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, os.path.join(snapshot_dir, MANIFEST))
+    return written
+
+
+def load_snapshot(snapshot_dir=SNAPSHOT_DIR, columns=None):
+    """All partitions as one Arrow table backed by memory maps (no copy into the heap)
+
+    Returns (table, month_rows) where month_rows maps each partition to its
+    row count, or (None, {}) when no snapshot has been exported yet.
+    """
+    tables, month_rows = [], {}
+    for month in sorted(read_manifest(snapshot_dir)["partitions"]):
+        with pa.memory_map(partition_path(month, snapshot_dir)) as source:
+            table = pa.ipc.open_file(source).read_all()
+        tables.append(table.select(columns) if columns else table)
+        month_rows[month] = table.num_rows
+    if not tables:
+        return None, {}
+    return pa.concat_tables(tables), month_rows
+
+
+def snapshot_stats(table, month_rows):
+    """Same aggregates as DetectionStore.stats, computed over a snapshot table"""
+    if table is None or table.num_rows == 0:
+        return {"total": 0, "avg_tumor_count": 0.0, "severity_counts": {}, "monthly_counts": {}, "tumor_count_counts": {}}
+    severity = pc.value_counts(table["severity"])
+    tumor_counts = pc.value_counts(table["tumor_count"])
+    # Partitions are monthly, so per-month counts need no scan
+    monthly = {month: rows for month, rows in month_rows.items() if month != UNKNOWN_MONTH}
+    return {
+        "total": table.num_rows,
+        "avg_tumor_count": pc.mean(table["tumor_count"]).as_py() or 0.0,
+        "severity_counts": dict(zip(severity.field("values").to_pylist(), severity.field("counts").to_pylist())),
+        "monthly_counts": monthly,
+        "tumor_count_counts": dict(zip(tumor_counts.field("values").to_pylist(), tumor_counts.field("counts").to_pylist())),
+    }
+
+
+def benchmark_stats(rows=10000000):
+    """Time snapshot_stats over synthetic memory-mapped partitions"""
+    snapshot_dir = tempfile.mkdtemp()
+    rng = np.random.default_rng(0)
+    severities = pa.array(["Low Severity", "Moderate Severity", "High Severity"])
+    start_time = datetime(2020, 1, 1)
+    months_count = 60
+    per_month = rows // months_count
+    partitions = {}
+    for m in range(months_count):
+        month_start = start_time + timedelta(days=31 * m)
+        month = month_start.strftime("%Y-%m")
+        ids = np.arange(m * per_month, (m + 1) * per_month, dtype=np.int64)
+        columns = {
+            "id": pa.array(ids),
+            "tumor_count": pa.array(rng.integers(0, 6, per_month, dtype=np.int32)),
+            "severity": pa.DictionaryArray.from_arrays(pa.array(rng.integers(0, 3, per_month, dtype=np.int8)), severities),
+            "detection_time": pa.array(np.full(per_month, np.datetime64(month_start, "us"))),
+        }
+        table = pa.table({name: columns.get(name, pa.nulls(per_month, field.type)) for name, field in zip(SNAPSHOT_SCHEMA.names, SNAPSHOT_SCHEMA)},
+                         schema=SNAPSHOT_SCHEMA)
+        write_partition(table, partition_path(month, snapshot_dir))
+        partitions[month] = [per_month, int(ids[-1]), None]
+    with open(os.path.join(snapshot_dir, MANIFEST), "w") as f:
+        json.dump({"exported_at": None, "partitions": partitions}, f)
+
+    start = time.perf_counter()
+    table, month_rows = load_snapshot(snapshot_dir, ["tumor_count", "severity"])
+    loaded = time.perf_counter()
+    stats = snapshot_stats(table, month_rows)
+    done = time.perf_counter()
+    print(f"{stats['total']:,} rows: load {(loaded - start) * 1000:.1f} ms, aggregates {(done - loaded) * 1000:.1f} ms")
+    shutil.rmtree(snapshot_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar snapshots of detection history for analytics")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser("export", help="Refresh the Arrow snapshot from the database")
+    export.add_argument("--snapshot-dir", default=SNAPSHOT_DIR)
+    export.add_argument("--db")
+    export.add_argument("--every", type=int, help=f"Keep running and refresh every N seconds (readers expect {EXPORT_INTERVAL})")
+    bench = subparsers.add_parser("benchmark", help="Time dashboard aggregates over synthetic partitions")
+    bench.add_argument("--rows", type=int, default=10000000)
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        benchmark_stats(args.rows)
+        return
+    while True:
+        start = time.perf_counter()
+        written = export_snapshot(args.snapshot_dir, args.db)
+        print(f"Exported {len(written)} changed partitions in {time.perf_counter() - start:.2f}s")
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
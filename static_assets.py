@@ -0,0 +1,146 @@
+import argparse
+import hashlib
+import os
+import re
+from functools import lru_cache
+from importlib.metadata import PackageNotFoundError, version
+from io import BytesIO
+
+
+# Streamlit serves this directory at app/static/ when server.enableStaticServing is on.
+# From 1.65 the static route sends the guessed Content-Type (text/css); older
+# releases send text/plain with nosniff, which browsers won't apply as a stylesheet.
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_URL = "app/static"
+
+# Page backgrounds bundled as static/img/<name>.jpg. Stylesheets use them as
+# var(--bg-<name>, url("../img/<name>.jpg")), so until a copy is bundled the
+# remote original is substituted through the custom property.
+BACKGROUNDS = {
+    "home-ward": "https://media.istockphoto.com/id/1254631358/photo/hospital-covid-ward-with-a-medical-ventilators-monitor.jpg?s=1024x1024&w=is&k=20&c=QArkgUL94PZDSnMs1pAxQsbJ3QF-Sx-zFZNxSosMv8c=",
+    "home-brain": "https://images.unsplash.com/photo-1583911860205-72f8ac8ddcbe?q=80&w=2070",
+    "detection": "https://images.unsplash.com/photo-1512678080530-7760d81faba6?q=80&w=1474&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D",
+    "history": "https://plus.unsplash.com/premium_photo-1661767897334-bbfbdfdc4d1a?q=80&w=1470&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D",
+}
+BACKGROUND_MAX_WIDTH = 1920
+BACKGROUND_QUALITY = 72
+
+# First Streamlit release whose static route serves .css as text/css
+CSS_SERVING_VERSION = (1, 65)
+
+# path -> (mtime, version hash)
+_versions = {}
+# stylesheet name -> (mtime, text for inlining)
+_sheet_text = {}
+# stylesheet name -> (mtime, background names it uses)
+_sheet_backgrounds = {}
+
+
+def asset_version(path):
+    """Short content hash of a static file, recomputed only when the file changes"""
+    full_path = os.path.join(STATIC_DIR, path)
+    mtime = os.path.getmtime(full_path)
+    cached = _versions.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(full_path, "rb") as f:
+            cached = (mtime, hashlib.blake2b(f.read(), digest_size=6).hexdigest())
+        _versions[path] = cached
+    return cached[1]
+
+
+def asset_url(path):
+    """URL of a static file; the version query changes with its content so browsers can keep it cached"""
+    return f"{STATIC_URL}/{path}?v={asset_version(path)}"
+
+
+def _backgrounds_used(name):
+    path = os.path.join(STATIC_DIR, "css", name + ".css")
+    mtime = os.path.getmtime(path)
+    cached = _sheet_backgrounds.get(name)
+    if cached is None or cached[0] != mtime:
+        with open(path, encoding="utf-8") as f:
+            cached = (mtime, sorted(set(re.findall(r"var\(--bg-([a-z0-9-]+)", f.read()))))
+        _sheet_backgrounds[name] = cached
+    return cached[1]
+
+
+@lru_cache(maxsize=None)
+def static_css_served():
+    """Whether the installed Streamlit sends static .css files with a stylesheet Content-Type"""
+    try:
+        release = tuple(int(part) for part in re.findall(r"\d+", version("streamlit"))[:2])
+    except PackageNotFoundError:
+        return False
+    return release >= CSS_SERVING_VERSION
+
+
+def inline_stylesheet(name):
+    """static/css/<name>.css with image URLs made relative to the page, read again only when it changes"""
+    path = os.path.join(STATIC_DIR, "css", name + ".css")
+    mtime = os.path.getmtime(path)
+    cached = _sheet_text.get(name)
+    if cached is None or cached[0] != mtime:
+        with open(path, encoding="utf-8") as f:
+            cached = (mtime, f.read().replace('url("../img/', f'url("{STATIC_URL}/img/'))
+        _sheet_text[name] = cached
+    return cached[1]
+
+
+def stylesheet_tag(name):
+    """Markup for static/css/<name>.css, for st.markdown(..., unsafe_allow_html=True)
+
+    A link tag, a few hundred bytes per rerun instead of the whole
+    stylesheet, which the browser fetches once per version. Streamlit
+    releases that serve .css as text/plain get the stylesheet inline.
+    """
+    if static_css_served():
+        tag = f'<link rel="stylesheet" href="{asset_url(f"css/{name}.css")}">'
+    else:
+        tag = f"<style>{inline_stylesheet(name)}</style>"
+    missing = [background for background in _backgrounds_used(name)
+               if not os.path.exists(os.path.join(STATIC_DIR, "img", background + ".jpg"))]
+    if missing:
+        tag += "<style>:root{" + "".join(f"--bg-{background}:url('{BACKGROUNDS[background]}');" for background in missing) + "}</style>"
+    return tag
+
+
+def bundle_backgrounds(max_width=BACKGROUND_MAX_WIDTH, quality=BACKGROUND_QUALITY):
+    """Download the page backgrounds and store them as compressed progressive JPEGs in static/img"""
+    from PIL import Image
+
+    from http_client import shared_client
+
+    os.makedirs(os.path.join(STATIC_DIR, "img"), exist_ok=True)
+    for name, url in BACKGROUNDS.items():
+        response = shared_client().get(url)
+        response.raise_for_status()
+        image = Image.open(BytesIO(response.content)).convert("RGB")
+        if image.width > max_width:
+            image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+        path = os.path.join(STATIC_DIR, "img", name + ".jpg")
+        image.save(path, "JPEG", quality=quality, optimize=True, progressive=True)
+        print(f"{name}: {len(response.content) / 1e3:.0f} kB -> {os.path.getsize(path) / 1e3:.0f} kB ({image.width}x{image.height})")
+
+
+def payload_report():
+    """Bytes each page sends per rerun for its styles: inline stylesheet vs link tag"""
+    for css_file in sorted(os.listdir(os.path.join(STATIC_DIR, "css"))):
+        name = css_file[:-len(".css")]
+        inline = len(open(os.path.join(STATIC_DIR, "css", css_file), "rb").read()) + len("<style></style>")
+        linked = len(f'<link rel="stylesheet" href="{asset_url(f"css/{css_file}")}">'.encode("utf-8"))
+        print(f"{name:16} inline {inline:>6} bytes, linked {linked:>4} bytes ({1 - linked / inline:.0%} smaller)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Static stylesheets and page backgrounds")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backgrounds = subparsers.add_parser("backgrounds", help="Download and compress the page backgrounds into static/img")
+    backgrounds.add_argument("--max-width", type=int, default=BACKGROUND_MAX_WIDTH)
+    backgrounds.add_argument("--quality", type=int, default=BACKGROUND_QUALITY)
+    subparsers.add_parser("payload", help="Compare per-rerun style payloads")
+    args = parser.parse_args()
+
+    if args.command == "backgrounds":
+        bundle_backgrounds(args.max_width, args.quality)
+    else:
+        payload_report()
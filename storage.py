@@ -0,0 +1,393 @@
+import csv
+import io
+import os
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+
+from database import DB_PATH, DETECTION_COLUMNS, connect, content_addressed, get_or_create_patient, initialize_database, insert_detections, normalize_name
+from dedup import PHASH_BAND_BITS, PHASH_BANDS, PHASH_MAX_DISTANCE, collect_garbage, find_scan, hamming_distance, phash_bands
+
+
+# Set to a postgresql:// URL to share detections between app replicas
+STORE_URL_ENV = "DETECTION_STORE_URL"
+
+
+class DetectionStore(ABC):
+    """Persistence interface for detections
+
+    Records passed to insert/insert_many are tuples in DETECTION_COLUMNS
+    order (see database.detection_record). Processed images are stored once
+    per content hash and joined back in by query. query and stats return
+    plain Python structures so callers never depend on the backend's driver.
+    """
+
+    backend = None
+
+    @abstractmethod
+    def initialize(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def register_patient(self, name, date_of_birth=None, gender=None):
+        """Patient id for this name and date of birth, creating the patient if new; ValueError for a blank name"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def insert(self, record):
+        """Insert one detection and return its id"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def insert_many(self, records):
+        """Insert many detections in a single transaction and return the count"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def query(self, start_date=None, end_date=None, severity=None, patient_id=None, limit=None, offset=0, include_images=True):
+        """Detections as dicts, newest first, filtered and paginated"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def stats(self):
+        """Aggregates: total, avg_tumor_count, severity_counts, monthly_counts, tumor_count_counts"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def find_duplicate(self, scan_hash, scan_phash, patient_id):
+        """The patient's first detection of the same scan as a dict with an "exact" flag, or None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _query_clauses(start_date, end_date, severity, patient_id, placeholder):
+    conditions, params = [], []
+    if start_date is not None:
+        conditions.append(f"detection_time >= {placeholder}")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append(f"detection_time < {placeholder}")
+        params.append(end_date)
+    if severity is not None:
+        conditions.append(f"severity = {placeholder}")
+        params.append(severity)
+    if patient_id is not None:
+        conditions.append(f"patient_id = {placeholder}")
+        params.append(patient_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+
+def _selected_columns(include_images):
+    columns = ("id",) + DETECTION_COLUMNS
+    return columns if include_images else tuple(c for c in columns if c != "processed_image")
+
+
+def _select_list(columns):
+    # Older rows still hold their image inline; newer ones reference the images table
+    return ", ".join("coalesce(d.processed_image, i.data)" if c == "processed_image" else f"d.{c}" for c in columns)
+
+
+DETECTIONS_WITH_IMAGES = "detections d LEFT JOIN images i ON i.hash = d.image_hash"
+
+
+def _stats_from_rows(total, avg_tumor_count, severity_rows, monthly_rows, count_rows):
+    return {
+        "total": total or 0,
+        "avg_tumor_count": float(avg_tumor_count or 0.0),
+        "severity_counts": dict(severity_rows),
+        "monthly_counts": dict(monthly_rows),
+        "tumor_count_counts": dict(count_rows),
+    }
+
+
+class SQLiteDetectionStore(DetectionStore):
+    """Detections in the local SQLite file (the default)"""
+
+    backend = "sqlite"
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or DB_PATH
+
+    def initialize(self):
+        initialize_database(self.db_path)
+
+    def register_patient(self, name, date_of_birth=None, gender=None):
+        conn = connect(self.db_path)
+        with conn:
+            patient_id = get_or_create_patient(conn, name, date_of_birth, gender)
+        conn.close()
+        return patient_id
+
+    def insert(self, record):
+        conn = connect(self.db_path)
+        # The detections_fts triggers index the new row in the same transaction
+        with conn:
+            record_id = insert_detections(conn, [record])
+        conn.close()
+        return record_id
+
+    def insert_many(self, records):
+        records = list(records)
+        conn = connect(self.db_path)
+        with conn:
+            insert_detections(conn, records)
+        conn.close()
+        return len(records)
+
+    def query(self, start_date=None, end_date=None, severity=None, patient_id=None, limit=None, offset=0, include_images=True):
+        columns = _selected_columns(include_images)
+        where, params = _query_clauses(start_date, end_date, severity, patient_id, "?")
+        sql = f"SELECT {_select_list(columns)} FROM {DETECTIONS_WITH_IMAGES} {where} ORDER BY d.detection_time DESC, d.id DESC LIMIT ? OFFSET ?"
+        conn = connect(self.db_path)
+        rows = conn.execute(sql, params + [-1 if limit is None else limit, offset]).fetchall()
+        conn.close()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def stats(self):
+        conn = connect(self.db_path)
+        total, avg_count = conn.execute("SELECT COUNT(*), AVG(tumor_count) FROM detections").fetchone()
+        result = _stats_from_rows(
+            total, avg_count,
+            conn.execute("SELECT severity, COUNT(*) FROM detections GROUP BY severity").fetchall(),
+            conn.execute("SELECT substr(detection_time, 1, 7), COUNT(*) FROM detections GROUP BY 1 ORDER BY 1").fetchall(),
+            conn.execute("SELECT tumor_count, COUNT(*) FROM detections GROUP BY tumor_count ORDER BY 1").fetchall(),
+        )
+        conn.close()
+        return result
+
+    def find_duplicate(self, scan_hash, scan_phash, patient_id):
+        columns = _selected_columns(True)
+        conn = connect(self.db_path)
+        match = find_scan(conn, scan_hash, scan_phash, patient_id)
+        row = match and conn.execute(f"SELECT {_select_list(columns)} FROM {DETECTIONS_WITH_IMAGES} WHERE d.id = ?", (match[0],)).fetchone()
+        conn.close()
+        return dict(zip(columns, row), exact=match[1]) if match else None
+
+    def clear(self):
+        conn = connect(self.db_path)
+        with conn:
+            conn.execute("DELETE FROM detections")
+            collect_garbage(conn)
+        conn.close()
+
+
+def _plain_row(columns, row):
+    # bytea arrives as memoryview; hand callers bytes like the SQLite store does
+    return {c: bytes(v) if isinstance(v, memoryview) else v for c, v in zip(columns, row)}
+
+
+POSTGRES_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS patients (
+    id BIGSERIAL PRIMARY KEY,
+    name TEXT NOT NULL,
+    normalized_name TEXT NOT NULL,
+    date_of_birth DATE,
+    gender TEXT,
+    created_at TIMESTAMP
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_patients_identity
+ON patients (normalized_name, coalesce(date_of_birth, '0001-01-01'::date));
+CREATE TABLE IF NOT EXISTS detections (
+    id BIGSERIAL PRIMARY KEY,
+    patient_id BIGINT REFERENCES patients(id),
+    patient_name TEXT,
+    patient_age INTEGER,
+    patient_gender TEXT,
+    tumor_count INTEGER,
+    tumor_boxes BYTEA,
+    brain_area INTEGER,
+    detection_time TIMESTAMP,
+    processed_image BYTEA,
+    severity TEXT,
+    recommendation TEXT,
+    report_text TEXT,
+    image_hash TEXT,
+    scan_hash TEXT,
+    scan_phash BIGINT,
+    duplicate_of BIGINT
+);
+CREATE INDEX IF NOT EXISTS idx_detections_time ON detections (detection_time);
+CREATE INDEX IF NOT EXISTS idx_detections_patient ON detections (patient_id, detection_time);
+CREATE INDEX IF NOT EXISTS idx_detections_image_hash ON detections (image_hash);
+CREATE TABLE IF NOT EXISTS images (
+    hash TEXT PRIMARY KEY,
+    data BYTEA NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scans (
+    hash TEXT PRIMARY KEY,
+    phash BIGINT NOT NULL,
+    detection_id BIGINT NOT NULL
+);
+CREATE OR REPLACE FUNCTION record_scan() RETURNS trigger AS $$
+BEGIN
+    IF NEW.scan_hash IS NOT NULL THEN
+        INSERT INTO scans (hash, phash, detection_id) VALUES (NEW.scan_hash, NEW.scan_phash, NEW.id) ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS detections_record_scan ON detections;
+CREATE TRIGGER detections_record_scan AFTER INSERT ON detections FOR EACH ROW EXECUTE FUNCTION record_scan();
+''' + "".join(
+    f"CREATE INDEX IF NOT EXISTS idx_scans_phash_band{band} ON scans (((phash >> {band * PHASH_BAND_BITS}) & 65535));\n"
+    for band in range(PHASH_BANDS)
+)
+
+
+class PostgresDetectionStore(DetectionStore):
+    """Detections in PostgreSQL, shared by every app replica
+
+    Connections come from a thread-safe pool; insert_many streams rows
+    through COPY instead of individual INSERTs.
+    """
+
+    backend = "postgresql"
+
+    def __init__(self, dsn, min_connections=1, max_connections=10):
+        from psycopg2.pool import ThreadedConnectionPool
+
+        self._pool = ThreadedConnectionPool(min_connections, max_connections, dsn)
+
+    @contextmanager
+    def _connection(self):
+        conn = self._pool.getconn()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._pool.putconn(conn)
+
+    def initialize(self):
+        with self._connection() as conn, conn.cursor() as cursor:
+            cursor.execute(POSTGRES_SCHEMA)
+
+    def register_patient(self, name, date_of_birth=None, gender=None):
+        normalized = normalize_name(name)
+        if not normalized:
+            raise ValueError("Patient name is required")
+        with self._connection() as conn, conn.cursor() as cursor:
+            cursor.execute('''
+            INSERT INTO patients (name, normalized_name, date_of_birth, gender, created_at)
+            VALUES (%s, %s, %s, %s, %s) ON CONFLICT DO NOTHING
+            ''', (name.strip(), normalized, date_of_birth, gender, datetime.now()))
+            cursor.execute(
+                "SELECT id FROM patients WHERE normalized_name = %s AND coalesce(date_of_birth, '0001-01-01'::date) = coalesce(%s::date, '0001-01-01'::date)",
+                (normalized, date_of_birth),
+            )
+            return cursor.fetchone()[0]
+
+    def _store_images(self, cursor, images):
+        from psycopg2 import Binary
+
+        cursor.executemany(
+            "INSERT INTO images (hash, data) VALUES (%s, %s) ON CONFLICT DO NOTHING",
+            [(image_hash, Binary(data)) for image_hash, data in images.items()],
+        )
+
+    def insert(self, record):
+        from psycopg2 import Binary
+
+        (record,), images = content_addressed([record])
+        values = [Binary(value) if isinstance(value, bytes) else value for value in record]
+        with self._connection() as conn, conn.cursor() as cursor:
+            self._store_images(cursor, images)
+            cursor.execute(
+                f"INSERT INTO detections ({', '.join(DETECTION_COLUMNS)}) VALUES ({', '.join(['%s'] * len(DETECTION_COLUMNS))}) RETURNING id",
+                values,
+            )
+            return cursor.fetchone()[0]
+
+    def insert_many(self, records):
+        records, images = content_addressed(records)
+        # CSV COPY: bytea goes in hex form, NULL is spelled \N so empty strings survive
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        count = 0
+        for record in records:
+            writer.writerow([
+                "\\N" if value is None
+                else "\\x" + value.hex() if isinstance(value, bytes)
+                else value.isoformat() if isinstance(value, datetime)
+                else value
+                for value in record
+            ])
+            count += 1
+        buffer.seek(0)
+        with self._connection() as conn, conn.cursor() as cursor:
+            self._store_images(cursor, images)
+            cursor.copy_expert(
+                f"COPY detections ({', '.join(DETECTION_COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer,
+            )
+        return count
+
+    def query(self, start_date=None, end_date=None, severity=None, patient_id=None, limit=None, offset=0, include_images=True):
+        columns = _selected_columns(include_images)
+        where, params = _query_clauses(start_date, end_date, severity, patient_id, "%s")
+        sql = f"SELECT {_select_list(columns)} FROM {DETECTIONS_WITH_IMAGES} {where} ORDER BY d.detection_time DESC, d.id DESC LIMIT %s OFFSET %s"
+        with self._connection() as conn, conn.cursor() as cursor:
+            cursor.execute(sql, params + [limit, offset])
+            rows = cursor.fetchall()
+        return [_plain_row(columns, row) for row in rows]
+
+    def stats(self):
+        with self._connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*), AVG(tumor_count) FROM detections")
+            total, avg_count = cursor.fetchone()
+            cursor.execute("SELECT severity, COUNT(*) FROM detections GROUP BY severity")
+            severity_rows = cursor.fetchall()
+            cursor.execute("SELECT to_char(detection_time, 'YYYY-MM'), COUNT(*) FROM detections GROUP BY 1 ORDER BY 1")
+            monthly_rows = cursor.fetchall()
+            cursor.execute("SELECT tumor_count, COUNT(*) FROM detections GROUP BY tumor_count ORDER BY 1")
+            count_rows = cursor.fetchall()
+        return _stats_from_rows(total, avg_count, severity_rows, monthly_rows, count_rows)
+
+    def find_duplicate(self, scan_hash, scan_phash, patient_id):
+        columns = _selected_columns(True)
+        select = f"SELECT {_select_list(columns)} FROM {DETECTIONS_WITH_IMAGES} WHERE d.id = %s AND d.patient_id = %s"
+        with self._connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT detection_id FROM scans WHERE hash = %s", (scan_hash,))
+            match = cursor.fetchone()
+            if match:
+                cursor.execute(select, (match[0], patient_id))
+                row = cursor.fetchone()
+                if row:
+                    return dict(_plain_row(columns, row), exact=True)
+            cursor.execute(" UNION ".join(
+                f"SELECT phash, detection_id FROM scans WHERE ((phash >> {band * PHASH_BAND_BITS}) & 65535) = %s"
+                for band in range(PHASH_BANDS)
+            ), phash_bands(scan_phash))
+            candidates = sorted((hamming_distance(scan_phash, phash), detection_id) for phash, detection_id in cursor.fetchall())
+            for distance, detection_id in candidates:
+                if distance > PHASH_MAX_DISTANCE:
+                    break
+                cursor.execute(select, (detection_id, patient_id))
+                row = cursor.fetchone()
+                if row:
+                    return dict(_plain_row(columns, row), exact=False)
+        return None
+
+    def clear(self):
+        with self._connection() as conn, conn.cursor() as cursor:
+            cursor.execute("DELETE FROM detections")
+            cursor.execute("DELETE FROM images")
+            cursor.execute("DELETE FROM scans")
+
+    def close(self):
+        self._pool.closeall()
+
+
+def get_store(url=None):
+    """Store for a URL (or $DETECTION_STORE_URL); SQLite when neither is set"""
+    url = url or os.getenv(STORE_URL_ENV)
+    if url and url.startswith(("postgresql://", "postgres://")):
+        return PostgresDetectionStore(url)
+    if url and url.startswith("sqlite:///"):
+        return SQLiteDetectionStore(url[len("sqlite:///"):])
+    return SQLiteDetectionStore()
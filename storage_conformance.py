@@ -0,0 +1,84 @@
+import os
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+from database import detection_record
+from detection_results import make_boxes
+from storage import get_store
+
+
+def _record(patient_id, name, age, tumors, severity, detection_time, **scan):
+    boxes = make_boxes([[10 + i, 10, 40 + i, 50] for i in range(tumors)], [0.9] * tumors, [0] * tumors)
+    return detection_record(patient_id, name, age, "Other", boxes, b"\x89PNG" + bytes(range(256)), severity,
+                            "Regular follow-up recommended in 6 months", 4000, f"Report for {name}", detection_time, **scan)
+
+
+def check_store(store):
+    """Run every interface check against an empty store; raises AssertionError on the first failure"""
+    store.initialize()
+    store.clear()
+    base = datetime(2024, 1, 15, 9, 30)
+
+    # Patients: same normalized name and date of birth resolve to one id
+    alice = store.register_patient("Alice  Martin", date(1970, 5, 1), "Female")
+    assert store.register_patient("alice martin", date(1970, 5, 1)) == alice
+    assert store.register_patient("Alice Martin", date(1980, 5, 1)) != alice
+    bob = store.register_patient("Bob", None, "Male")
+    assert store.register_patient("BOB") == bob
+
+    # Single insert round-trips every column, BLOBs included
+    phash = -0x3C3C3C3C3C3C3C3D
+    record = _record(alice, "Alice Martin", 54, 2, "High Severity", base, scan_hash="scan-a", scan_phash=phash)
+    record_id = store.insert(record)
+    rows = store.query()
+    assert len(rows) == 1 and rows[0]["id"] == record_id
+    for column, value in zip(("patient_id", "patient_name", "patient_age", "tumor_count", "tumor_boxes", "processed_image", "severity", "report_text"),
+                             (alice, "Alice Martin", 54, 2, record[5], record[8], "High Severity", "Report for Alice Martin")):
+        assert rows[0][column] == value, column
+    assert "processed_image" not in store.query(include_images=False)[0]
+
+    # Duplicate scans: exact by scan hash, near by perceptual hash distance, only within one patient
+    duplicate = store.find_duplicate("scan-a", phash, alice)
+    assert duplicate["id"] == record_id and duplicate["exact"] and duplicate["processed_image"] == record[8]
+    near = store.find_duplicate("scan-b", phash ^ 0b1011, alice)
+    assert near["id"] == record_id and not near["exact"]
+    assert store.find_duplicate("scan-c", phash ^ 0xF0F0, alice) is None
+    assert store.find_duplicate("scan-a", phash, bob) is None and store.find_duplicate("scan-b", phash ^ 0b1011, bob) is None
+
+    # Bulk insert; every record shares one processed image, stored once and joined back on read
+    severities = ["Low Severity", "Moderate Severity", "High Severity"]
+    records = [_record(bob if i % 2 else alice, "Bob" if i % 2 else "Alice Martin", 30 + i, i % 4, severities[i % 3],
+                       base + timedelta(days=i + 1)) for i in range(60)]
+    assert store.insert_many(records) == 60
+
+    # Filters and pagination, newest first
+    rows = store.query(limit=10)
+    assert len(rows) == 10
+    assert [str(row["detection_time"]) for row in rows] == sorted((str(row["detection_time"]) for row in rows), reverse=True)
+    page_ids = [row["id"] for page in range(7) for row in store.query(limit=10, offset=page * 10)]
+    assert len(page_ids) == 61 and len(set(page_ids)) == 61
+    assert all(row["severity"] == "Low Severity" for row in store.query(severity="Low Severity"))
+    assert len(store.query(severity="Low Severity")) == 20
+    assert len(store.query(patient_id=bob)) == 30
+    assert len(store.query(start_date=base + timedelta(days=10), end_date=base + timedelta(days=20))) == 10
+
+    # Aggregates
+    stats = store.stats()
+    assert stats["total"] == 61
+    assert stats["severity_counts"] == {"Low Severity": 20, "Moderate Severity": 20, "High Severity": 21}
+    assert sum(stats["monthly_counts"].values()) == 61 and min(stats["monthly_counts"]) == "2024-01"
+    assert sum(stats["tumor_count_counts"].values()) == 61
+    assert abs(stats["avg_tumor_count"] - (2 + sum(i % 4 for i in range(60))) / 61) < 1e-9
+
+    store.clear()
+    assert store.query() == [] and store.stats()["total"] == 0
+
+
+if __name__ == "__main__":
+    # python storage_conformance.py [postgresql://user@host/db] -- defaults to a scratch SQLite file
+    url = sys.argv[1] if len(sys.argv) > 1 else "sqlite:///" + os.path.join(tempfile.mkdtemp(), "conformance.db")
+    store = get_store(url)
+    check_store(store)
+    store.close()
+    print(f"{store.backend}: all storage checks passed")
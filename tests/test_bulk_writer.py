@@ -0,0 +1,70 @@
+import sqlite3
+import time
+
+import pytest
+
+from database import BulkDetectionWriter, benchmark_bulk_insert, detection_record, initialize_database
+from detection_results import make_boxes
+
+
+def _record(i):
+    boxes = make_boxes([[10, 10, 50, 50]], [0.9], [0])
+    return detection_record(None, f"Synthetic Patient {i}", 40, "Other", boxes, b"\x89PNG" + bytes(64),
+                            "Low Severity", "Regular follow-up recommended in 6 months")
+
+
+def _count(db_path):
+    conn = sqlite3.connect(db_path)
+    count = conn.execute("SELECT COUNT(*) FROM detections").fetchone()[0]
+    conn.close()
+    return count
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "detections.db")
+    initialize_database(path)
+    return path
+
+
+def test_flushes_on_batch_size_and_close(db_path):
+    with BulkDetectionWriter(db_path, batch_size=100, max_delay=60) as writer:
+        for i in range(250):
+            writer.add(_record(i))
+        assert _count(db_path) == 200
+    assert _count(db_path) == 250 and writer.rows_written == 250
+
+
+def test_flushes_after_max_delay(db_path):
+    with BulkDetectionWriter(db_path, batch_size=1000, max_delay=0.2) as writer:
+        writer.add(_record(0))
+        deadline = time.time() + 5
+        while writer.rows_written == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        assert _count(db_path) == 1
+
+
+def test_background_failure_keeps_rows_and_thread(db_path):
+    other = sqlite3.connect(db_path)
+    with BulkDetectionWriter(db_path, batch_size=1000, max_delay=0.2) as writer:
+        other.execute("ALTER TABLE detections RENAME TO detections_away")
+        writer.add(_record(0))
+        time.sleep(0.8)
+        assert writer.rows_written == 0
+        other.execute("ALTER TABLE detections_away RENAME TO detections")
+        deadline = time.time() + 5
+        while writer.rows_written == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        assert writer.rows_written == 1, "the flush thread should retry after a failed write"
+        # The earlier failure is still reported to the caller once
+        with pytest.raises(sqlite3.OperationalError):
+            writer.flush()
+        writer.add(_record(1))
+    other.close()
+    assert _count(db_path) == 2
+
+
+def test_benchmark_inserts_synthetic_detections(capsys):
+    benchmark_bulk_insert(rows=5000, batch_size=1000)
+    out = capsys.readouterr().out
+    assert out.startswith("5000 rows:") and "rows/sec" in out
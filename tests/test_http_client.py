@@ -0,0 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from http_client import CONNECTIONS_PER_HOST, HttpClient
+
+
+@pytest.fixture
+def stand_in(stand_in_server):
+    """Base URL of a keep-alive stand-in; /flaky answers 503 twice, every other path 200"""
+    connections = set()
+    hits = {"flaky": 0, "cached": 0}
+
+    class StandIn(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            connections.add(self.client_address)
+            status = 200
+            if self.path == "/flaky":
+                hits["flaky"] += 1
+                status = 503 if hits["flaky"] < 3 else 200
+            elif self.path == "/cached":
+                hits["cached"] += 1
+            self.send_response(status)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    return stand_in_server(StandIn), connections, hits
+
+
+def test_connections_are_reused(stand_in):
+    base, connections, hits = stand_in
+    client = HttpClient(timeout=2.0)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = list(pool.map(lambda i: client.get(f"{base}/item{i}").status_code, range(200)))
+    assert statuses == [200] * 200
+    assert len(connections) <= CONNECTIONS_PER_HOST, f"{len(connections)} connections for 200 requests"
+
+
+def test_unavailable_answers_are_retried(stand_in):
+    base, connections, hits = stand_in
+    client = HttpClient(timeout=2.0, backoff=0.05)
+    assert client.get(f"{base}/flaky").status_code == 200 and hits["flaky"] == 3
+
+
+def test_response_cache(stand_in):
+    base, connections, hits = stand_in
+    client = HttpClient(timeout=2.0)
+    for _ in range(5):
+        client.get(f"{base}/cached", cache_ttl=60)
+    assert hits["cached"] == 1
+
+
+def test_latency_stats_per_host(stand_in):
+    base, connections, hits = stand_in
+    client = HttpClient(timeout=2.0)
+    for i in range(10):
+        client.get(f"{base}/item{i}")
+    p50, p95, count, errors = client.latency_stats()[base[len("http://"):]]
+    assert count == 10 and errors == 0 and 0 < p50 <= p95
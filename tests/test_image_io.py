@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+from io import BytesIO
+
+import cv2
+import numpy as np
+
+from image_io import buffer_view, decode_image, image_size, preview_reduction
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _png(width, height):
+    # Noise barely compresses, so the upload is about as large as the decoded image
+    rng = np.random.default_rng(0)
+    ok, encoded = cv2.imencode(".png", rng.integers(0, 255, (height, width, 3), dtype=np.uint8))
+    assert ok
+    return encoded.tobytes()
+
+
+def test_buffer_view_shares_the_upload_buffer():
+    upload = BytesIO(_png(64, 48))
+    data = buffer_view(upload)
+    data[0] ^= 0xFF
+    assert upload.getvalue()[0] == data[0]
+
+
+def test_reduced_decode_for_previews():
+    upload = BytesIO(_png(3200, 1600))
+    assert image_size(upload) == (3200, 1600)
+    reduction = preview_reduction(3200)
+    assert reduction == 4
+    data = buffer_view(upload)
+    assert decode_image(data).shape == (1600, 3200, 3)
+    assert decode_image(data, reduction).shape == (400, 800, 3)
+
+
+# Run in a fresh interpreter so the peak is not the test runner's own
+PEAK_RSS_SCRIPT = """
+import sys
+from io import BytesIO
+from image_io import buffer_view, decode_image, image_size, peak_rss_mb, preview_reduction
+
+upload = BytesIO()
+with open(sys.argv[1], "rb") as f:
+    for chunk in iter(lambda: f.read(1 << 20), b""):
+        upload.write(chunk)
+before = peak_rss_mb()
+width, height = image_size(upload)
+data = buffer_view(upload)
+full = decode_image(data)
+preview = decode_image(data, preview_reduction(width))
+print(len(upload.getbuffer()), full.nbytes, preview.nbytes, peak_rss_mb() - before)
+"""
+
+
+def test_peak_rss_per_upload(tmp_path):
+    path = tmp_path / "scan.png"
+    path.write_bytes(_png(4000, 4000))
+    output = subprocess.run([sys.executable, "-c", PEAK_RSS_SCRIPT, str(path)], check=True, capture_output=True,
+                            text=True, cwd=REPO_ROOT).stdout.split()
+    upload_bytes, full_bytes, preview_bytes = (int(value) for value in output[:3])
+    growth_mb = float(output[3])
+    # One full-resolution array, the preview and OpenCV's working copy of the encoded bytes;
+    # copying the upload into a bytearray and then an array would add two more uploads
+    bound_mb = (upload_bytes + full_bytes + preview_bytes) / 2 ** 20 + 16
+    assert growth_mb < bound_mb, f"peak RSS grew {growth_mb:.1f} MB, bound {bound_mb:.1f} MB"
@@ -0,0 +1,100 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from news_feeds import FeedAggregator, FeedRefresher, FeedStore
+
+RSS = b"""<?xml version="1.0"?><rss version="2.0"><channel><title>Local</title>
+<item><title>First</title><link>http://example.com/1</link><description>One</description></item>
+<item><title>Second</title><link>http://example.com/2</link><description>Two</description></item>
+</channel></rss>"""
+
+
+@pytest.fixture
+def feeds(stand_in_server):
+    """Base URL of a stand-in serving /feed* with an ETag, /slow after 3 s and /broken with a 404"""
+    hits = {"ok": 0, "not_modified": 0, "broken": 0}
+
+    class StandIn(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/slow":
+                time.sleep(3)
+            if self.path == "/broken":
+                hits["broken"] += 1
+                time.sleep(0.2)
+                self.send_response(404)
+                self.end_headers()
+                return
+            if self.headers.get("If-None-Match") == '"v1"':
+                hits["not_modified"] += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            hits["ok"] += 1
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Type", "application/rss+xml")
+            self.end_headers()
+            self.wfile.write(RSS)
+
+        def log_message(self, *args):
+            pass
+
+    return stand_in_server(StandIn), hits
+
+
+def test_parallel_fetch_with_timeout_and_revalidation(feeds):
+    base, hits = feeds
+    urls = [f"{base}/feed{i}" for i in range(6)] + [f"{base}/slow"]
+    aggregator = FeedAggregator(ttl=0, timeout=1.0)
+    start = time.perf_counter()
+    results = aggregator.get(urls)
+    elapsed = time.perf_counter() - start
+    assert all(len(results[url]["entries"]) == 2 for url in urls[:-1])
+    assert results[urls[-1]]["entries"] == [] and results[urls[-1]]["error"], "the slow feed should time out"
+    assert elapsed < 2.5, f"feeds were not fetched in parallel ({elapsed:.2f}s)"
+    aggregator.get(urls[:-1])
+    assert hits["not_modified"] == 6, "stale feeds should be revalidated with If-None-Match"
+
+
+def test_failed_feed_is_retried_after_retry_delay(feeds):
+    base, hits = feeds
+    url = f"{base}/broken"
+    aggregator = FeedAggregator(ttl=600, retry_delay=0.3, timeout=1.0)
+    record = aggregator.get([url])[url]
+    assert record["error"] and record["fetched_at"] is None and record["failed_at"]
+    assert aggregator.is_fresh(url)
+    time.sleep(0.4)
+    assert not aggregator.is_fresh(url)
+    aggregator.get([url])
+    assert hits["broken"] == 2
+
+
+def test_feed_in_flight_is_not_fetched_again(feeds):
+    base, hits = feeds
+    url = f"{base}/broken"
+    aggregator = FeedAggregator(ttl=0, timeout=1.0)
+    threads = [threading.Thread(target=aggregator.refresh, args=([url],)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert hits["broken"] == 1
+
+
+def test_refresher_serves_from_memory_and_persists(feeds, tmp_path):
+    base, hits = feeds
+    urls = [f"{base}/feed{i}" for i in range(3)]
+    store = FeedStore(str(tmp_path / "feeds.db"))
+    refresher = FeedRefresher(FeedAggregator(ttl=60, timeout=1.0, store=store), {"English": urls}).start()
+    cold = refresher.read(urls)
+    deadline = time.time() + 5
+    while refresher.last_run is None and time.time() < deadline:
+        time.sleep(0.05)
+    warm = refresher.read(urls)
+    assert all(record is None for record in cold.values()) and all(record["entries"] for record in warm.values())
+    restarted = FeedAggregator(store=store)
+    assert restarted.cached(urls[0])["entries"] == warm[urls[0]]["entries"]
+    assert store.load("English").keys() == set(urls)
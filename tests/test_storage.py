@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+from storage import get_store
+from storage_conformance import check_store
+
+# A scratch database the suite may clear, e.g. postgresql://postgres@localhost/conformance
+POSTGRES_URL_ENV = "TEST_POSTGRES_URL"
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        store = get_store("sqlite:///" + str(tmp_path / "conformance.db"))
+    else:
+        url = os.getenv(POSTGRES_URL_ENV)
+        if not url:
+            pytest.skip(f"set {POSTGRES_URL_ENV} to run against PostgreSQL")
+        psycopg2 = pytest.importorskip("psycopg2")
+        try:
+            store = get_store(url)
+        except psycopg2.OperationalError as e:
+            pytest.skip(f"PostgreSQL is not reachable: {e}")
+    yield store
+    store.close()
+
+
+def test_conformance(store):
+    check_store(store)
@@ -0,0 +1,228 @@
+import argparse
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import lxml.etree
+import lxml.html
+import pandas as pd
+import requests
+
+from http_client import shared_client
+
+
+TPA_URL = "https://irdai.gov.in/list-of-tpas"
+TPA_DB_PATH = "tpa.db"
+# The list changes a few times a year; once every six hours is plenty
+TPA_REFRESH_INTERVAL = 6 * 3600
+# After a failed scrape, try again sooner than the full interval
+TPA_RETRY_INTERVAL = 15 * 60
+
+
+def parse_tpa_table(content):
+    """(header, rows) of the first table on the page, or (None, []) when there is none
+
+    lxml builds the tree in C and the XPath walks only the table, instead
+    of html.parser building and searching the whole page in Python.
+    """
+    tables = lxml.html.fromstring(content).xpath("//table")
+    if not tables:
+        return None, []
+    header, rows = None, []
+    for tr in tables[0].xpath(".//tr"):
+        headings = tr.xpath("./th")
+        cells = tr.xpath("./td")
+        if headings and not cells and header is None:
+            header = [" ".join(th.text_content().split()) for th in headings]
+        elif cells:
+            rows.append([" ".join(td.text_content().split()) for td in cells])
+    # Pages that mark the header up as an ordinary row
+    if header is None and rows:
+        header = rows.pop(0)
+    return header, rows
+
+
+def table_hash(header, rows):
+    return hashlib.blake2b(json.dumps([header, rows], ensure_ascii=False).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class TpaStore:
+    """Last scraped TPA table, one SQLite row per table row, with refresh metadata"""
+
+    def __init__(self, db_path=TPA_DB_PATH):
+        self.db_path = db_path
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.executescript('''
+            CREATE TABLE IF NOT EXISTS tpa_rows (
+                cells TEXT PRIMARY KEY,
+                position INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS tpa_meta (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                header TEXT,
+                content_hash TEXT,
+                fetched_at REAL,
+                changed_at REAL,
+                added INTEGER,
+                removed INTEGER,
+                error TEXT
+            );
+            INSERT OR IGNORE INTO tpa_meta (id) VALUES (1);
+            ''')
+        conn.close()
+
+    def meta(self):
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute(
+            "SELECT header, content_hash, fetched_at, changed_at, added, removed, error FROM tpa_meta WHERE id = 1"
+        ).fetchone()
+        conn.close()
+        header, content_hash, fetched_at, changed_at, added, removed, error = row
+        return {"header": json.loads(header) if header else None, "content_hash": content_hash, "fetched_at": fetched_at,
+                "changed_at": changed_at, "added": added, "removed": removed, "error": error}
+
+    def rows(self):
+        conn = sqlite3.connect(self.db_path)
+        rows = [json.loads(cells) for (cells,) in conn.execute("SELECT cells FROM tpa_rows ORDER BY position")]
+        conn.close()
+        return rows
+
+    def save(self, header, rows, fetched_at):
+        """Apply a fresh scrape; returns True when the table changed
+
+        An unchanged table only touches fetched_at. A changed one inserts
+        and deletes just the rows that differ.
+        """
+        content_hash = table_hash(header, rows)
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            changed = conn.execute("SELECT content_hash FROM tpa_meta WHERE id = 1").fetchone()[0] != content_hash
+            if not changed:
+                conn.execute("UPDATE tpa_meta SET fetched_at = ?, error = NULL WHERE id = 1", (fetched_at,))
+        if not changed:
+            conn.close()
+            return False
+        with conn:
+            new = {json.dumps(row, ensure_ascii=False): position for position, row in enumerate(rows)}
+            old = {cells for (cells,) in conn.execute("SELECT cells FROM tpa_rows")}
+            removed = old - new.keys()
+            conn.executemany("DELETE FROM tpa_rows WHERE cells = ?", ((cells,) for cells in removed))
+            conn.executemany("INSERT OR REPLACE INTO tpa_rows (cells, position) VALUES (?, ?)", new.items())
+            conn.execute(
+                "UPDATE tpa_meta SET header = ?, content_hash = ?, fetched_at = ?, changed_at = ?, added = ?, removed = ?, error = NULL WHERE id = 1",
+                (json.dumps(header, ensure_ascii=False), content_hash, fetched_at, fetched_at, len(new.keys() - old), len(removed)),
+            )
+        conn.close()
+        return True
+
+    def save_error(self, error, fetched_at):
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute("UPDATE tpa_meta SET fetched_at = ?, error = ? WHERE id = 1", (fetched_at, error))
+        conn.close()
+
+
+class TpaScraper:
+    """Scrapes the IRDAI TPA list on a background thread and serves the stored copy
+
+    table() never touches the network; the DataFrame is rebuilt only when
+    the stored table changes.
+    """
+
+    def __init__(self, store=None, client=None, url=TPA_URL, interval=TPA_REFRESH_INTERVAL, retry_interval=TPA_RETRY_INTERVAL):
+        self.store = store or TpaStore()
+        self.client = client or shared_client()
+        self.url = url
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self._frame = (None, None)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="tpa-scraper")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            meta = self.store.meta()
+            # A restart within the interval reuses what is stored
+            wait = self.retry_interval if meta["error"] else self.interval
+            if meta["fetched_at"] is None or time.time() - meta["fetched_at"] >= wait:
+                self.refresh()
+                meta = self.store.meta()
+            time.sleep(self.retry_interval if meta["error"] else self.interval)
+
+    def refresh(self):
+        """Scrape now; returns True when the table changed"""
+        try:
+            response = self.client.get(self.url)
+            response.raise_for_status()
+            header, rows = parse_tpa_table(response.content)
+        # lxml raises ParserError, not ValueError, for an empty or non-HTML body
+        except (requests.RequestException, ValueError, lxml.etree.ParserError) as e:
+            self.store.save_error(str(e), time.time())
+            return False
+        if header is None:
+            self.store.save_error("No table found on the page", time.time())
+            return False
+        return self.store.save(header, rows, time.time())
+
+    def table(self):
+        """(DataFrame or None, meta) from the local copy"""
+        meta = self.store.meta()
+        with self._lock:
+            content_hash, frame = self._frame
+        if meta["header"] is None:
+            return None, meta
+        if content_hash != meta["content_hash"]:
+            width = len(meta["header"])
+            # Rows with a different number of cells are padded or cut to the header
+            rows = [(row + [""] * width)[:width] for row in self.store.rows()]
+            frame = pd.DataFrame(rows, columns=meta["header"])
+            with self._lock:
+                self._frame = (meta["content_hash"], frame)
+        return frame, meta
+
+
+def benchmark_parse(rows=500, repeat=20):
+    """Compare the old BeautifulSoup html.parser walk with parse_tpa_table on a synthetic page"""
+    from bs4 import BeautifulSoup
+
+    body = "".join(f"<tr><td>{i}</td><td>TPA {i} Private Limited</td><td>Mumbai</td><td>{i:05d}</td></tr>" for i in range(rows))
+    page = ("<html><head>" + "<script>var x = 1;</script>" * 200 + "</head><body>" + "<div><p>navigation</p></div>" * 500 +
+            f"<table><tr><td>No</td><td>Name</td><td>City</td><td>Code</td></tr>{body}</table></body></html>").encode("utf-8")
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        soup = BeautifulSoup(page, "html.parser")
+        old = [[col.get_text(strip=True) for col in row.find_all("td")] for row in soup.find_all("table")[0].find_all("tr")]
+    old_ms = (time.perf_counter() - start) * 1000 / repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        header, new = parse_tpa_table(page)
+    new_ms = (time.perf_counter() - start) * 1000 / repeat
+    assert [header] + new == old
+    print(f"{rows} rows, {len(page) / 1e3:.0f} kB page: html.parser {old_ms:.1f} ms, lxml {new_ms:.1f} ms ({old_ms / new_ms:.0f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IRDAI TPA list scraper")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("refresh", help="Scrape the list now").add_argument("--db", default=TPA_DB_PATH)
+    subparsers.add_parser("benchmark", help="Compare parsers on a synthetic page").add_argument("--rows", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        benchmark_parse(args.rows)
+    else:
+        scraper = TpaScraper(TpaStore(args.db))
+        changed = scraper.refresh()
+        frame, meta = scraper.table()
+        if meta["error"]:
+            print(f"Refresh failed: {meta['error']}")
+        print(f"{0 if frame is None else len(frame)} TPAs stored; {'changed' if changed else 'unchanged'} "
+              f"(+{meta['added'] or 0} / -{meta['removed'] or 0} at the last change)")
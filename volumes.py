@@ -0,0 +1,150 @@
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+DICOM_EXTENSIONS = (".dcm",)
+NIFTI_EXTENSIONS = (".nii", ".nii.gz")
+
+
+def is_volume_upload(name):
+    """True for files that belong to a DICOM series or NIfTI volume"""
+    return name.lower().endswith(DICOM_EXTENSIONS + NIFTI_EXTENSIONS)
+
+
+def window_to_uint8(slices, center, width):
+    """Apply an intensity window to a stack of slices and scale to 8-bit in one pass"""
+    low = center - width / 2.0
+    scaled = (np.asarray(slices, dtype=np.float32) - low) * (255.0 / max(width, 1e-6))
+    np.clip(scaled, 0, 255, out=scaled)
+    return scaled.astype(np.uint8)
+
+
+class Volume(ABC):
+    """Stack of slices decoded on demand; subclasses implement read_slices"""
+
+    def __init__(self):
+        self.window = None
+        self.spacing = (1.0, 1.0, 1.0)
+
+    def __len__(self):
+        return self.num_slices
+
+    @abstractmethod
+    def read_slices(self, start, stop):
+        """Raw float32 slices [start, stop) as an (n, rows, cols) array"""
+
+    def auto_window(self, samples=16):
+        """Window from intensity percentiles of a few evenly spaced slices"""
+        indices = np.unique(np.linspace(0, self.num_slices - 1, min(samples, self.num_slices)).astype(int))
+        sample = np.concatenate([self.read_slices(i, i + 1).ravel() for i in indices])
+        low, high = np.percentile(sample, [0.5, 99.5])
+        return (low + high) / 2.0, max(high - low, 1.0)
+
+    def slice_image(self, index):
+        """Single windowed slice as a BGR uint8 image"""
+        return next(iter_slice_batches(self, 1, index, index + 1))[1][0]
+
+    def close(self):
+        pass
+
+
+class NiftiVolume(Volume):
+    """NIfTI volume read slice by slice from a memory-mapped file"""
+
+    def __init__(self, path, temporary=False):
+        import nibabel as nib
+
+        super().__init__()
+        self.path = path
+        self.temporary = temporary
+        self._img = nib.load(path, mmap=True)
+        self._data = self._img.dataobj
+        self.num_slices = self._img.shape[2]
+        self.spacing = tuple(float(z) for z in self._img.header.get_zooms()[:3])
+        self.window = self.auto_window()
+
+    def read_slices(self, start, stop):
+        # Only the requested slab is pulled from disk; 4D series use their first frame
+        index = (slice(None), slice(None), slice(start, stop)) + (0,) * (len(self._img.shape) - 3)
+        slab = np.asarray(self._data[index], dtype=np.float32)
+        # (x, y, z) -> (z, rows, cols) in radiological display orientation
+        return slab.transpose(2, 1, 0)[:, ::-1, :]
+
+    def close(self):
+        if self.temporary and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class DicomSeries(Volume):
+    """DICOM series whose pixel data is decoded one slice at a time"""
+
+    def __init__(self, sources):
+        import pydicom
+
+        super().__init__()
+        self._pydicom = pydicom
+        headers = []
+        for source in sources:
+            if hasattr(source, "seek"):
+                source.seek(0)
+            headers.append((pydicom.dcmread(source, stop_before_pixels=True), source))
+        headers.sort(key=lambda item: self._slice_position(item[0]))
+
+        self._sources = [source for _, source in headers]
+        self.num_slices = len(self._sources)
+        first = headers[0][0]
+        self._slope = float(getattr(first, "RescaleSlope", 1.0))
+        self._intercept = float(getattr(first, "RescaleIntercept", 0.0))
+        row_spacing, col_spacing = (float(v) for v in getattr(first, "PixelSpacing", (1.0, 1.0)))
+        self.spacing = (col_spacing, row_spacing, float(getattr(first, "SliceThickness", 1.0) or 1.0))
+
+        center, width = getattr(first, "WindowCenter", None), getattr(first, "WindowWidth", None)
+        if center is not None and width is not None:
+            # Multi-valued window tags list several presets; use the first
+            center = center[0] if isinstance(center, self._pydicom.multival.MultiValue) else center
+            width = width[0] if isinstance(width, self._pydicom.multival.MultiValue) else width
+            self.window = (float(center), float(width))
+        else:
+            self.window = self.auto_window()
+
+    @staticmethod
+    def _slice_position(header):
+        position = getattr(header, "ImagePositionPatient", None)
+        if position is not None:
+            return float(position[2])
+        return float(getattr(header, "InstanceNumber", 0))
+
+    def read_slices(self, start, stop):
+        slices = []
+        for source in self._sources[start:stop]:
+            if hasattr(source, "seek"):
+                source.seek(0)
+            slices.append(self._pydicom.dcmread(source).pixel_array)
+        return np.stack(slices).astype(np.float32) * self._slope + self._intercept
+
+
+def iter_slice_batches(volume, batch_size=8, start=0, stop=None):
+    """Yield (first_index, BGR uint8 batch) without materializing the whole volume"""
+    stop = len(volume) if stop is None else stop
+    center, width = volume.window
+    for batch_start in range(start, stop, batch_size):
+        raw = volume.read_slices(batch_start, min(batch_start + batch_size, stop))
+        gray = window_to_uint8(raw, center, width)
+        yield batch_start, np.repeat(gray[..., None], 3, axis=3)
+
+
+def open_volume(uploaded_files):
+    """Open uploaded DICOM files or a single NIfTI file as a lazily decoded volume"""
+    nifti = [f for f in uploaded_files if f.name.lower().endswith(NIFTI_EXTENSIONS)]
+    if nifti:
+        # NIfTI needs a real file to memory-map; spool the upload to disk once
+        suffix = ".nii.gz" if nifti[0].name.lower().endswith(".gz") else ".nii"
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+            nifti[0].seek(0)
+            shutil.copyfileobj(nifti[0], tmp)
+        return NiftiVolume(tmp.name, temporary=True)
+    return DicomSeries([f for f in uploaded_files if f.name.lower().endswith(DICOM_EXTENSIONS)])